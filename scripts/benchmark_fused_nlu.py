@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+融合NLU基准测试
+对比三次LLM调用路径（意图识别 + LLM实体提取 + 槽位提取）与融合NLU模式（一次调用）的延迟和token用量
+
+用法:
+    python scripts/benchmark_fused_nlu.py                 # 使用模拟LLM（按token数估算延迟）
+    python scripts/benchmark_fused_nlu.py --live          # 使用配置中的真实LLM和数据库中的意图
+    python scripts/benchmark_fused_nlu.py --rounds 20 --prefill-ms 0.2 --decode-ms 25
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Dict, List
+
+from src.config.settings import settings
+from src.core.nlu_engine import NLUEngine
+from src.models.intent import Intent
+from src.utils.request_context import request_scope
+
+
+# 模拟模式下使用的意图、槽位定义和测试语句
+SIMULATED_INTENTS = [
+    {
+        'intent_name': 'book_flight',
+        'description': '预订机票',
+        'examples': ['我想订一张明天去上海的机票', '帮我买机票', '订从北京到广州的航班'],
+        'slots': [
+            {'slot_name': 'departure_city', 'slot_type': 'TEXT', 'is_required': True, 'description': '出发城市'},
+            {'slot_name': 'arrival_city', 'slot_type': 'TEXT', 'is_required': True, 'description': '到达城市'},
+            {'slot_name': 'departure_date', 'slot_type': 'DATE', 'is_required': True, 'description': '出发日期'},
+        ]
+    },
+    {
+        'intent_name': 'book_train',
+        'description': '预订火车票',
+        'examples': ['订一张去杭州的火车票', '买高铁票'],
+        'slots': [
+            {'slot_name': 'departure_city', 'slot_type': 'TEXT', 'is_required': True, 'description': '出发城市'},
+            {'slot_name': 'arrival_city', 'slot_type': 'TEXT', 'is_required': True, 'description': '到达城市'},
+        ]
+    },
+    {
+        'intent_name': 'check_balance',
+        'description': '查询账户余额',
+        'examples': ['查一下我的余额', '银行卡里还有多少钱'],
+        'slots': [
+            {'slot_name': 'account_type', 'slot_type': 'TEXT', 'is_required': False, 'description': '账户类型'},
+        ]
+    },
+]
+
+SIMULATED_CASES = [
+    {
+        'text': '帮我订明天从北京到上海的机票',
+        'intent': 'book_flight',
+        'entities': [{'entity': 'CITY', 'value': '北京', 'text': '北京', 'start': 5, 'end': 7, 'confidence': 0.9},
+                     {'entity': 'CITY', 'value': '上海', 'text': '上海', 'start': 8, 'end': 10, 'confidence': 0.9}],
+        'slots': {'departure_city': '北京', 'arrival_city': '上海', 'departure_date': '明天'}
+    },
+    {
+        'text': '我要买一张去杭州的火车票',
+        'intent': 'book_train',
+        'entities': [{'entity': 'CITY', 'value': '杭州', 'text': '杭州', 'start': 6, 'end': 8, 'confidence': 0.9}],
+        'slots': {'arrival_city': '杭州'}
+    },
+    {
+        'text': '查询一下储蓄卡余额',
+        'intent': 'check_balance',
+        'entities': [],
+        'slots': {'account_type': '储蓄卡'}
+    },
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（中文约每2个字符1个token）"""
+    return max(1, len(text) // 2)
+
+
+class SimulatedLLM:
+    """模拟LLM：按提示词类型返回固定结果，延迟 = 基础延迟 + prefill + decode"""
+
+    def __init__(self, base_ms: float, prefill_ms: float, decode_ms: float):
+        self.base_ms = base_ms
+        self.prefill_ms = prefill_ms
+        self.decode_ms = decode_ms
+        self.current_case: Dict[str, Any] = SIMULATED_CASES[0]
+        self.usage_stats = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def _respond(self, prompt: str) -> str:
+        case = self.current_case
+        slots = {
+            name: {'value': value, 'confidence': 0.9, 'source': 'text', 'original_text': value}
+            for name, value in case['slots'].items()
+        }
+        if '"slots"' in prompt and '"entities"' in prompt:
+            return json.dumps({
+                'intent': case['intent'], 'confidence': 0.93, 'reasoning': '模拟融合结果',
+                'alternatives': [], 'entities': case['entities'], 'slots': slots
+            }, ensure_ascii=False)
+        if '提取相关实体信息' in prompt:
+            return json.dumps(case['entities'], ensure_ascii=False)
+        if '提取指定的槽位信息' in prompt:
+            return json.dumps(slots, ensure_ascii=False)
+        return json.dumps({
+            'intent': case['intent'], 'confidence': 0.93, 'reasoning': '模拟意图结果', 'alternatives': []
+        }, ensure_ascii=False)
+
+    async def acall(self, prompt: str, **kwargs: Any) -> str:
+        content = self._respond(prompt)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        self.usage_stats['calls'] += 1
+        self.usage_stats['prompt_tokens'] += prompt_tokens
+        self.usage_stats['completion_tokens'] += completion_tokens
+
+        latency_ms = self.base_ms + prompt_tokens * self.prefill_ms + completion_tokens * self.decode_ms
+        await asyncio.sleep(latency_ms / 1000)
+        return content
+
+    async def _acall(self, prompt: str, **kwargs: Any) -> str:
+        return await self.acall(prompt, **kwargs)
+
+    def get_usage_stats(self) -> Dict[str, int]:
+        return dict(self.usage_stats)
+
+    async def cleanup(self):
+        pass
+
+
+async def build_engine(args) -> NLUEngine:
+    """构建NLU引擎：真实模式加载数据库中的意图，模拟模式使用内置意图"""
+    engine = NLUEngine()
+
+    if args.live:
+        await engine.initialize()
+        if not engine.llm:
+            raise RuntimeError("未配置LLM，无法运行真实模式基准测试")
+        return engine
+
+    for definition in SIMULATED_INTENTS:
+        intent = Intent(
+            intent_name=definition['intent_name'],
+            display_name=definition['description'],
+            description=definition['description'],
+            examples=definition['examples'],
+            is_active=True
+        )
+        engine._intent_cache[intent.intent_name] = intent
+        engine._slot_definitions_cache[intent.intent_name] = definition['slots']
+
+    engine._keywords_cache = {}
+    engine.duckling_url = None
+    engine.llm = SimulatedLLM(args.base_ms, args.prefill_ms, args.decode_ms)
+    engine._initialized = True
+    return engine
+
+
+def live_cases(engine: NLUEngine) -> List[Dict[str, Any]]:
+    """真实模式的测试语句：取每个意图的第一个示例"""
+    cases = []
+    for intent_name, intent in engine._intent_cache.items():
+        examples = intent.get_examples()
+        if examples and engine._slot_definitions_cache.get(intent_name):
+            cases.append({'text': examples[0], 'intent': intent_name})
+    return cases
+
+
+async def run_turn(engine: NLUEngine, case: Dict[str, Any], fused: bool) -> Dict[str, Any]:
+    """执行一轮意图识别 + 槽位提取，返回延迟和token用量"""
+    settings.NLU_FUSED_MODE = fused
+    if isinstance(engine.llm, SimulatedLLM):
+        engine.llm.current_case = case
+
+    usage_before = engine.llm.get_usage_stats()
+    started_at = time.perf_counter()
+
+    async with request_scope(f"bench_{'fused' if fused else 'split'}"):
+        result = await engine.recognize_intent(case['text'])
+        slot_definitions = engine._slot_definitions_cache.get(result.intent_name) \
+            or engine._slot_definitions_cache.get(case['intent'], [])
+        slots = await engine.extract_slots(case['text'], slot_definitions)
+
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    usage_after = engine.llm.get_usage_stats()
+
+    return {
+        'latency_ms': elapsed_ms,
+        'calls': usage_after['calls'] - usage_before['calls'],
+        'prompt_tokens': usage_after['prompt_tokens'] - usage_before['prompt_tokens'],
+        'completion_tokens': usage_after['completion_tokens'] - usage_before['completion_tokens'],
+        'intent': result.intent_name,
+        'slots': sorted(slots)
+    }
+
+
+def summarize(name: str, samples: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latencies = sorted(sample['latency_ms'] for sample in samples)
+    count = len(latencies)
+    return {
+        'mode': name,
+        'turns': count,
+        'latency_avg_ms': round(statistics.mean(latencies), 1),
+        'latency_p50_ms': round(latencies[count // 2], 1),
+        'latency_p95_ms': round(latencies[min(count - 1, int(count * 0.95))], 1),
+        'llm_calls_per_turn': round(sum(s['calls'] for s in samples) / count, 2),
+        'prompt_tokens_per_turn': round(sum(s['prompt_tokens'] for s in samples) / count, 1),
+        'completion_tokens_per_turn': round(sum(s['completion_tokens'] for s in samples) / count, 1)
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="融合NLU与三次调用路径的基准对比")
+    parser.add_argument('--live', action='store_true', help='使用真实LLM和数据库中的意图')
+    parser.add_argument('--rounds', type=int, default=10, help='每个测试语句的执行轮数')
+    parser.add_argument('--base-ms', type=float, default=150.0, help='模拟LLM的基础延迟(ms)')
+    parser.add_argument('--prefill-ms', type=float, default=0.15, help='模拟LLM每个提示token的延迟(ms)')
+    parser.add_argument('--decode-ms', type=float, default=20.0, help='模拟LLM每个输出token的延迟(ms)')
+    args = parser.parse_args()
+
+    original_mode = settings.NLU_FUSED_MODE
+    engine = await build_engine(args)
+
+    try:
+        cases = live_cases(engine) if args.live else SIMULATED_CASES
+        if not cases:
+            print("❌ 没有可用的测试语句（需要带示例和槽位定义的意图）")
+            return 1
+
+        print(f"🚀 融合NLU基准测试: {len(cases)}个语句 x {args.rounds}轮, "
+              f"{'真实LLM' if args.live else '模拟LLM'}")
+        print("=" * 60)
+
+        split_samples, fused_samples = [], []
+        mismatches = 0
+        for _ in range(args.rounds):
+            for case in cases:
+                split = await run_turn(engine, case, fused=False)
+                fused = await run_turn(engine, case, fused=True)
+                split_samples.append(split)
+                fused_samples.append(fused)
+                if (split['intent'], split['slots']) != (fused['intent'], fused['slots']):
+                    mismatches += 1
+
+        split_summary = summarize('three_call', split_samples)
+        fused_summary = summarize('fused', fused_samples)
+        for summary in (split_summary, fused_summary):
+            print(json.dumps(summary, ensure_ascii=False))
+
+        speedup = split_summary['latency_avg_ms'] / max(fused_summary['latency_avg_ms'], 0.001)
+        token_ratio = (
+            (fused_summary['prompt_tokens_per_turn'] + fused_summary['completion_tokens_per_turn']) /
+            max(split_summary['prompt_tokens_per_turn'] + split_summary['completion_tokens_per_turn'], 1)
+        )
+        print("=" * 60)
+        print(f"📊 平均延迟: {split_summary['latency_avg_ms']}ms -> {fused_summary['latency_avg_ms']}ms "
+              f"({speedup:.2f}x), token用量比例: {token_ratio:.2f}")
+        print(f"结果不一致的轮次: {mismatches}/{len(split_samples)}")
+        return 0
+
+    finally:
+        settings.NLU_FUSED_MODE = original_mode
+        await engine.cleanup()
+
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
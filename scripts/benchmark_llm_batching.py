@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+LLM微批调度基准测试
+在本地启动一个模拟的OpenAI兼容LLM服务（按连续批处理建模：每个解码步处理所有在途序列，
+步耗时随批大小增长，同时在途序列数有上限），分别以直连和微批调度两种方式压测 CustomLLM，
+报告吞吐量和 p50/p99 延迟。
+
+用法:
+    python scripts/benchmark_llm_batching.py
+    python scripts/benchmark_llm_batching.py --requests 2000 --rate 400 --window-ms 5 --batch-size 16 --concurrency 32
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+from src.config.settings import settings
+from src.core.nlu_engine import CustomLLM
+
+
+class MockBatchingLLMServer:
+    """模拟的连续批处理LLM服务"""
+
+    def __init__(self, slots: int, step_ms: float, per_seq_ms: float, decode_steps: int):
+        self.slots = slots
+        self.step_ms = step_ms
+        self.per_seq_ms = per_seq_ms
+        self.decode_steps = decode_steps
+        self._waiting: List[Dict[str, Any]] = []
+        self._running: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._scheduler = None
+        self.requests = 0
+        self.max_running = 0
+
+    async def start(self, host: str, port: int) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self._scheduler = asyncio.ensure_future(self._run())
+        return runner
+
+    async def stop(self):
+        if self._scheduler:
+            self._scheduler.cancel()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt = body['messages'][0]['content']
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append({'future': future, 'remaining': self.decode_steps})
+        self.requests += 1
+        self._wakeup.set()
+        await future
+
+        content = json.dumps({'intent': 'mock', 'confidence': 0.9, 'echo': prompt[-16:]}, ensure_ascii=False)
+        return web.json_response({
+            'choices': [{'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(prompt) // 2, 'completion_tokens': self.decode_steps}
+        })
+
+    async def _run(self):
+        while True:
+            if not self._waiting and not self._running:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            # 每个解码步开始前接纳等待中的请求，直到占满批处理槽位
+            while self._waiting and len(self._running) < self.slots:
+                self._running.append(self._waiting.pop(0))
+            self.max_running = max(self.max_running, len(self._running))
+
+            await asyncio.sleep((self.step_ms + self.per_seq_ms * len(self._running)) / 1000)
+
+            still_running = []
+            for sequence in self._running:
+                sequence['remaining'] -= 1
+                if sequence['remaining'] <= 0:
+                    if not sequence['future'].done():
+                        sequence['future'].set_result(None)
+                else:
+                    still_running.append(sequence)
+            self._running = still_running
+
+
+async def run_load(llm: CustomLLM, total: int, rate: float) -> Dict[str, Any]:
+    """以泊松到达的开环负载压测，返回吞吐量和延迟分布"""
+    latencies: List[float] = []
+    errors = 0
+
+    async def one_call(index: int):
+        nonlocal errors
+        started_at = time.perf_counter()
+        # 每条提示词唯一，避免被请求合并或响应缓存吸收
+        content = await llm.acall(f"请识别用户意图，编号 {index}: 帮我查一下余额", temperature=0.7)
+        if content.startswith("Error:"):
+            errors += 1
+        latencies.append((time.perf_counter() - started_at) * 1000)
+
+    started_at = time.perf_counter()
+    tasks = []
+    for index in range(total):
+        tasks.append(asyncio.ensure_future(one_call(index)))
+        await asyncio.sleep(random.expovariate(rate))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 1),
+        'latency_avg_ms': round(statistics.mean(latencies), 1),
+        'latency_p50_ms': round(latencies[count // 2], 1),
+        'latency_p99_ms': round(latencies[min(count - 1, int(count * 0.99))], 1)
+    }
+
+
+async def run_mode(name: str, batching: bool, api_url: str, args) -> Dict[str, Any]:
+    # 上游并发限制和对冲请求会改变到达模拟服务的负载，默认关闭以单独比较微批调度
+    settings.UPSTREAM_LIMITER_ENABLED = args.with_limiter
+    settings.HEDGING_ENABLED = False
+    settings.LLM_BATCHING_ENABLED = batching
+    settings.LLM_BATCH_WINDOW_MS = args.window_ms
+    settings.LLM_BATCH_MAX_SIZE = args.batch_size
+    settings.LLM_BATCH_MAX_CONCURRENCY = args.concurrency
+
+    llm = CustomLLM(api_url, "EMPTY")
+    try:
+        summary = await run_load(llm, args.requests, args.rate)
+        summary['mode'] = name
+        batching_stats = llm.get_call_stats().get('batching')
+        if batching_stats:
+            summary['avg_batch_size'] = batching_stats['avg_batch_size']
+            summary['avg_queue_wait_ms'] = batching_stats['avg_queue_wait_ms']
+        return summary
+    finally:
+        await llm.cleanup()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="LLM微批调度与直连的吞吐/延迟对比")
+    parser.add_argument('--requests', type=int, default=1000, help='每种模式的请求总数')
+    parser.add_argument('--rate', type=float, default=100.0, help='平均到达速率(请求/秒)')
+    parser.add_argument('--window-ms', type=float, default=5.0, help='微批收集窗口(ms)')
+    parser.add_argument('--batch-size', type=int, default=16, help='单批最大条数')
+    parser.add_argument('--concurrency', type=int, default=32, help='在途请求并发上限')
+    parser.add_argument('--server-slots', type=int, default=32, help='模拟服务的批处理槽位数')
+    parser.add_argument('--step-ms', type=float, default=8.0, help='模拟服务每个解码步的固定耗时(ms)')
+    parser.add_argument('--per-seq-ms', type=float, default=0.4, help='模拟服务每个解码步每条序列的耗时(ms)')
+    parser.add_argument('--decode-steps', type=int, default=12, help='每个请求的解码步数')
+    parser.add_argument('--port', type=int, default=18997, help='模拟服务端口')
+    parser.add_argument('--with-limiter', action='store_true', help='启用上游自适应并发限制')
+    args = parser.parse_args()
+
+    original = (settings.LLM_BATCHING_ENABLED, settings.LLM_BATCH_WINDOW_MS,
+                settings.LLM_BATCH_MAX_SIZE, settings.LLM_BATCH_MAX_CONCURRENCY,
+                settings.UPSTREAM_LIMITER_ENABLED, settings.HEDGING_ENABLED)
+    server = MockBatchingLLMServer(args.server_slots, args.step_ms, args.per_seq_ms, args.decode_steps)
+    runner = await server.start('127.0.0.1', args.port)
+    api_url = f"http://127.0.0.1:{args.port}/v1/chat/completions"
+
+    try:
+        print(f"🚀 LLM微批调度基准测试: {args.requests}个请求/模式, 到达速率 {args.rate}/s")
+        print(f"模拟服务: {args.server_slots}个槽位, 步耗时 {args.step_ms}ms + {args.per_seq_ms}ms/序列, "
+              f"{args.decode_steps}步/请求")
+        print("=" * 60)
+
+        direct = await run_mode('direct', False, api_url, args)
+        print(json.dumps(direct, ensure_ascii=False))
+        batched = await run_mode('batched', True, api_url, args)
+        print(json.dumps(batched, ensure_ascii=False))
+
+        print("=" * 60)
+        print(f"📊 吞吐量: {direct['throughput_rps']} -> {batched['throughput_rps']} req/s, "
+              f"p99: {direct['latency_p99_ms']} -> {batched['latency_p99_ms']} ms")
+        print(f"模拟服务最大同时在途序列数: {server.max_running}")
+        return 0
+
+    finally:
+        (settings.LLM_BATCHING_ENABLED, settings.LLM_BATCH_WINDOW_MS,
+         settings.LLM_BATCH_MAX_SIZE, settings.LLM_BATCH_MAX_CONCURRENCY,
+         settings.UPSTREAM_LIMITER_ENABLED, settings.HEDGING_ENABLED) = original
+        await server.stop()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    exit_code = asyncio.run(main())
+    sys.exit(exit_code)
@@ -12,10 +12,14 @@ from src.config.database import get_database
 from src.services.cache_service import CacheService, get_cache_service
 from src.services.intent_service import IntentService
 from src.services.slot_service import SlotService
+from src.services.enhanced_slot_service import EnhancedSlotService
 from src.services.conversation_service import ConversationService
 from src.services.function_service import FunctionService
 from src.services.ragflow_service import RagflowService
 from src.services.user_profile_service import UserProfileService, get_user_profile_service
+from src.services.service_container import (
+    ServiceContainer, get_service_container, initialize_service_container
+)
 from src.core.nlu_engine import NLUEngine
 from src.utils.logger import get_logger
 
@@ -35,17 +39,9 @@ async def get_db() -> Generator:
 
 # ============ 缓存服务依赖 ============
 
-_cache_service: Optional[CacheService] = None
-
 async def get_cache_service_dependency() -> CacheService:
-    """获取缓存服务依赖"""
-    global _cache_service
-    
-    if _cache_service is None:
-        _cache_service = CacheService()
-        await _cache_service.initialize()
-    
-    return _cache_service
+    """获取缓存服务依赖（与应用lifespan共享同一个Redis连接池）"""
+    return await get_cache_service()
 
 
 # ============ NLU引擎依赖 ============
@@ -65,42 +61,61 @@ async def get_nlu_engine() -> NLUEngine:
 
 # ============ 业务服务依赖 ============
 
+async def get_services() -> ServiceContainer:
+    """
+    获取应用级服务容器依赖
+    
+    容器通常在lifespan中构建，这里仅在未经lifespan启动（如脚本调用）时惰性初始化
+    """
+    container = get_service_container()
+    if container is None or not container.is_initialized:
+        cache_service = await get_cache_service_dependency()
+        nlu_engine = await get_nlu_engine()
+        container = await initialize_service_container(cache_service, nlu_engine)
+    
+    return container
+
+
 async def get_intent_service(
-    cache_service: CacheService = Depends(get_cache_service_dependency),
-    nlu_engine: NLUEngine = Depends(get_nlu_engine)
+    services: ServiceContainer = Depends(get_services)
 ) -> IntentService:
     """获取意图识别服务依赖"""
-    return IntentService(cache_service, nlu_engine)
+    return services.intent_service
 
 
 async def get_slot_service(
-    cache_service: CacheService = Depends(get_cache_service_dependency),
-    nlu_engine: NLUEngine = Depends(get_nlu_engine)
+    services: ServiceContainer = Depends(get_services)
 ) -> SlotService:
     """获取槽位管理服务依赖"""
-    return SlotService(cache_service, nlu_engine)
+    return services.slot_service
+
+
+async def get_enhanced_slot_service(
+    services: ServiceContainer = Depends(get_services)
+) -> EnhancedSlotService:
+    """获取增强槽位服务依赖"""
+    return services.enhanced_slot_service
 
 
 async def get_ragflow_service(
-    cache_service: CacheService = Depends(get_cache_service_dependency)
+    services: ServiceContainer = Depends(get_services)
 ) -> RagflowService:
     """获取RAGFLOW服务依赖"""
-    return RagflowService(cache_service)
+    return services.ragflow_service
 
 
 async def get_conversation_service(
-    cache_service: CacheService = Depends(get_cache_service_dependency),
-    ragflow_service: RagflowService = Depends(get_ragflow_service)
+    services: ServiceContainer = Depends(get_services)
 ) -> ConversationService:
     """获取对话管理服务依赖"""
-    return ConversationService(cache_service, ragflow_service)
+    return services.conversation_service
 
 
 async def get_function_service(
-    cache_service: CacheService = Depends(get_cache_service_dependency)
+    services: ServiceContainer = Depends(get_services)
 ) -> FunctionService:
     """获取功能调用服务依赖"""
-    return FunctionService(cache_service)
+    return services.function_service
 
 
 async def get_user_profile_service_dependency(
@@ -349,6 +364,25 @@ async def check_system_health() -> dict:
         health_status["services"]["nlu_engine"] = f"error: {str(e)}"
         health_status["status"] = "unhealthy"
     
+    # 上游并发限制器：等待队列已满说明上游过载，请求正在被快速拒绝
+    from src.utils.concurrency_limiter import get_concurrency_limiter_stats
+    limiter_stats = get_concurrency_limiter_stats()
+    health_status["upstream_limiters"] = limiter_stats
+    for upstream, stats in limiter_stats.items():
+        if stats['max_queue'] and stats['queue_depth'] >= stats['max_queue']:
+            health_status["services"][f"upstream_{upstream}"] = "overloaded"
+            if health_status["status"] == "healthy":
+                health_status["status"] = "degraded"
+    
+    # 检查服务容器
+    container = get_service_container()
+    if container and container.is_initialized:
+        health_status["services"]["service_container"] = "healthy"
+    else:
+        health_status["services"]["service_container"] = "not_initialized"
+        if health_status["status"] == "healthy":
+            health_status["status"] = "degraded"
+    
     return health_status
 
 
@@ -358,11 +392,28 @@ async def get_system_metrics() -> dict:
     """获取系统指标"""
     import psutil
     import time
+    from src.services.intent_service import get_recognition_cache_stats
+    from src.utils.db_executor import get_db_executor
+    from src.utils.request_context import get_request_memo_stats
+    from src.utils.concurrency_limiter import get_concurrency_limiter_stats
+    from src.utils.hedging import get_hedging_stats
+    from src.services.cache_service import get_cache_tier_stats
+    
+    llm_calls = None
+    if _nlu_engine is not None and _nlu_engine.llm is not None and hasattr(_nlu_engine.llm, 'get_call_stats'):
+        llm_calls = _nlu_engine.llm.get_call_stats()
     
     return {
         "cpu_percent": psutil.cpu_percent(interval=1),
         "memory_percent": psutil.virtual_memory().percent,
         "disk_percent": psutil.disk_usage('/').percent,
         "network_io": psutil.net_io_counters()._asdict(),
+        "intent_recognition_cache": get_recognition_cache_stats(),
+        "db_executor": get_db_executor().get_stats(),
+        "request_memo": get_request_memo_stats(),
+        "llm_calls": llm_calls,
+        "upstream_limiters": get_concurrency_limiter_stats(),
+        "hedging": get_hedging_stats(),
+        "cache_tiers": get_cache_tier_stats(),
         "timestamp": time.time()
     }
\ No newline at end of file
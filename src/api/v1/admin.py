@@ -15,6 +15,8 @@ from src.models.function import Function, FunctionCall, FunctionParameter
 from src.models.config import SystemConfig, FeatureFlag, RagflowConfig
 from src.models.template import PromptTemplate
 from src.models.audit import ConfigAuditLog, SecurityAuditLog, PerformanceLog
+from src.services.cache_invalidation_bus import get_cache_invalidation_bus
+from src.services.cache_invalidation_service import INTENT_CATALOG_SCOPE, get_cache_invalidation_service
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -671,14 +673,12 @@ async def clear_cache(
                 cleared_count += 1
         
         elif namespace:
-            # 清理指定命名空间的所有缓存
-            await cache_service.clear_namespace(namespace)
-            cleared_count = 1  # 简化计数
+            # 清理指定命名空间的所有缓存（SCAN增量删除，不阻塞Redis）
+            cleared_count = await cache_service.clear_cache_namespace(namespace)
         
         else:
-            # 清理所有缓存（危险操作，需要确认）
-            await cache_service.redis_client.flushall()
-            cleared_count = 1
+            # 清理本系统的所有缓存（危险操作，需要确认）；不使用FLUSHALL，避免影响共用Redis的其他应用
+            cleared_count = await cache_service.clear_cache_namespace(cache_service.default_namespace)
         
         # 记录安全审计日志
         SecurityAuditLog.create(
@@ -1247,6 +1247,25 @@ async def trigger_ragflow_health_check(
 
 # ============ 缓存刷新接口 ============
 
+# 缓存类型 -> (缓存键模板, 其他键模式（不含命名空间）, 是否影响意图目录)
+CACHE_REFRESH_RULES = {
+    'intent_config': (
+        ('intent_config', 'active_intents'),
+        ('intent_config:*',),
+        True
+    ),
+    'slot_config': (
+        ('slot_definitions', 'slot_dependencies'),
+        ('slot_config:*', 'intent_slots:*'),
+        True
+    ),
+    'function_config': (
+        ('function_definition', 'function_parameters'),
+        (),
+        False
+    ),
+}
+
 @router.post("/cache/refresh", response_model=StandardResponse[Dict[str, Any]])
 async def refresh_cache(
     refresh_data: Dict[str, Any],
@@ -1260,29 +1279,37 @@ async def refresh_cache(
         
         refresh_results = {}
         
+        bump_intent_config = False
         for cache_type in cache_types:
             try:
-                if cache_type == 'intent_config':
-                    # 清理意图配置缓存
-                    await cache_service.clear_namespace('intent')
-                    refresh_results[cache_type] = 'success'
-                
-                elif cache_type == 'slot_config':
-                    # 清理槽位配置缓存
-                    await cache_service.clear_namespace('slot')
-                    refresh_results[cache_type] = 'success'
+                refresh_rule = CACHE_REFRESH_RULES.get(cache_type)
+                if refresh_rule is None:
+                    refresh_results[cache_type] = 'unknown_type'
+                    continue
                 
-                elif cache_type == 'function_config':
-                    # 清理功能配置缓存
-                    await cache_service.clear_namespace('function')
-                    refresh_results[cache_type] = 'success'
+                template_names, extra_patterns, affects_catalog = refresh_rule
+                patterns = [
+                    pattern
+                    for template_name in template_names
+                    for pattern in cache_service.cache_strategy.get_template_key_patterns(template_name)
+                ]
+                patterns.extend(extra_patterns)
                 
-                else:
-                    refresh_results[cache_type] = 'unknown_type'
+                deleted_count = 0
+                for pattern in patterns:
+                    deleted_count += await cache_service.delete_by_pattern(pattern)
+                bump_intent_config = bump_intent_config or affects_catalog
+                refresh_results[cache_type] = {'status': 'success', 'deleted_keys': deleted_count}
                     
             except Exception as e:
                 refresh_results[cache_type] = f'error: {str(e)}'
         
+        if bump_intent_config:
+            # 活跃意图列表、识别结果和目录快照按意图配置版本号缓存，递增版本号使其在所有worker上失效
+            invalidation_service = await get_cache_invalidation_service()
+            await invalidation_service.bump_intent_config_version()
+            await get_cache_invalidation_bus().publish(cache_service.redis_client, scopes=[INTENT_CATALOG_SCOPE])
+        
         logger.info(f"缓存刷新完成: {refresh_results}")
         
         return StandardResponse(
@@ -19,8 +19,11 @@ from src.services.conversation_service import ConversationService
 from src.services.function_service import FunctionService
 from src.services.ragflow_service import RagflowService
 from src.services.cache_service import CacheService
-from src.api.dependencies import get_intent_service, get_conversation_service
+from src.services.enhanced_slot_service import EnhancedSlotService
+from src.api.dependencies import get_intent_service, get_conversation_service, get_enhanced_slot_service
+from src.utils.db_executor import run_db
 from src.utils.logger import get_logger
+from src.utils.request_context import begin_request_context, end_request_context
 from src.utils.response_transformer import get_response_transformer, ResponseType
 #from src.utils.security import verify_token
 from src.models.conversation import Conversation, IntentAmbiguity
@@ -51,7 +54,8 @@ async def chat_interact(
     request: ChatRequest,
     background_tasks: BackgroundTasks,
     intent_service: IntentService = Depends(get_intent_service),
-    conversation_service: ConversationService = Depends(get_conversation_service)
+    conversation_service: ConversationService = Depends(get_conversation_service),
+    enhanced_slot_service: EnhancedSlotService = Depends(get_enhanced_slot_service)
 ):
     """
     智能对话处理接口
@@ -68,6 +72,9 @@ async def chat_interact(
     start_time = time.time()
     request_id = f"req_{int(time.time())}_{uuid.uuid4().hex[:8]}"
     
+    # 请求级记忆：本轮对话内会话、意图、槽位的重复查询只执行一次
+    request_context_token = begin_request_context(request_id)
+    
     try:
         logger.info(f"收到对话请求: {request_id}, 用户: {request.user_id}")
         
@@ -75,6 +82,9 @@ async def chat_interact(
         sanitized_input = await _sanitize_user_input(request.input)
         
         # 2. 获取或创建会话，并加载历史对话上下文
+        # 已有会话先一次往返批量预取会话缓存、对话历史和槽位状态，后续读取直接复用
+        if request.session_id:
+            await conversation_service.prefetch_session_state(request.session_id, history_limit=10)
         session_context = await conversation_service.get_or_create_session(
             request.user_id, session_id=request.session_id, context=request.context
         )
@@ -128,7 +138,8 @@ async def chat_interact(
         else:
             # 5.2 检查是否是对缺失槽位的补充（优先级高于新意图识别）
             slot_supplement_result = await _try_handle_slot_supplement(
-                sanitized_input, session_context, conversation_service, intent_service, session_id
+                sanitized_input, session_context, conversation_service, intent_service,
+                enhanced_slot_service, session_id
             )
             
             if slot_supplement_result:
@@ -175,7 +186,8 @@ async def chat_interact(
         elif intent_result.intent is None:
             # 检查是否是确认响应
             confirmation_result = await _try_handle_confirmation_response(
-                sanitized_input, session_context, conversation_service, intent_service
+                sanitized_input, session_context, conversation_service, intent_service,
+                enhanced_slot_service
             )
             
             if confirmation_result:
@@ -188,7 +200,8 @@ async def chat_interact(
         else:
             # 明确的意图识别，检查是否是确认响应
             confirmation_result = await _try_handle_confirmation_response(
-                sanitized_input, session_context, conversation_service, intent_service
+                sanitized_input, session_context, conversation_service, intent_service,
+                enhanced_slot_service
             )
             
             if confirmation_result:
@@ -197,7 +210,7 @@ async def chat_interact(
                 # 进行槽位处理
                 response = await _handle_clear_intent(
                     intent_result, sanitized_input, session_context, 
-                    intent_service, conversation_service
+                    intent_service, conversation_service, enhanced_slot_service
                 )
         
         # 7. 记录对话历史（包含轮次信息）
@@ -229,6 +242,8 @@ async def chat_interact(
             "SERVICE_UNAVAILABLE",
             request_id=request_id
         )
+    finally:
+        end_request_context(request_context_token)
 
 
 async def _sanitize_user_input(user_input: str) -> str:
@@ -348,7 +363,8 @@ async def _handle_non_intent_input(user_input: str, session_context: Dict,
 
 async def _handle_clear_intent(intent_result, user_input: str, session_context: Dict,
                              intent_service: IntentService,
-                             conversation_service: ConversationService) -> ChatResponse:
+                             conversation_service: ConversationService,
+                             enhanced_slot_service: EnhancedSlotService) -> ChatResponse:
     """
     处理明确的意图
     
@@ -358,6 +374,7 @@ async def _handle_clear_intent(intent_result, user_input: str, session_context:
         session_context: 会话上下文
         intent_service: 意图服务
         conversation_service: 对话服务
+        enhanced_slot_service: 增强槽位服务
         
     Returns:
         ChatResponse: 意图处理响应
@@ -376,10 +393,6 @@ async def _handle_clear_intent(intent_result, user_input: str, session_context:
     # V2.2重构: 使用当前会话的槽位状态（已在主流程中查询）
     inherited_slots = session_context.get('current_slots', {})
     
-    # V2.2增强：使用统一的槽位数据服务
-    from src.services.enhanced_slot_service import get_enhanced_slot_service
-    enhanced_slot_service = await get_enhanced_slot_service()
-    
     # 提取当前输入的槽位（使用增强服务，返回统一格式）
     slot_result = await enhanced_slot_service.extract_slots(
         intent, user_input, inherited_slots, session_context
@@ -394,7 +407,7 @@ async def _handle_clear_intent(intent_result, user_input: str, session_context:
     else:
         # 槽位不完整，生成询问提示
         return await _generate_slot_prompt(
-            intent, slot_result, session_context, conversation_service
+            intent, slot_result, session_context, conversation_service, enhanced_slot_service
         )
 
 
@@ -594,7 +607,8 @@ async def _mock_check_balance_service(intent, slots: Dict, session_context: Dict
 
 
 async def _generate_slot_prompt(intent, slot_result, session_context: Dict,
-                              conversation_service: ConversationService) -> ChatResponse:
+                              conversation_service: ConversationService,
+                              enhanced_slot_service: EnhancedSlotService) -> ChatResponse:
     """
     生成槽位询问提示
     
@@ -603,6 +617,7 @@ async def _generate_slot_prompt(intent, slot_result, session_context: Dict,
         slot_result: 槽位提取结果
         session_context: 会话上下文
         conversation_service: 对话服务
+        enhanced_slot_service: 增强槽位服务
         
     Returns:
         ChatResponse: 槽位询问响应
@@ -619,10 +634,6 @@ async def _generate_slot_prompt(intent, slot_result, session_context: Dict,
         except Exception as e:
             logger.warning(f"更新会话槽位失败: {str(e)}")
     
-    # V2.2增强：使用统一的槽位数据服务
-    from src.services.enhanced_slot_service import get_enhanced_slot_service
-    enhanced_slot_service = await get_enhanced_slot_service()
-    
     # 生成槽位询问提示
     prompt_message = await enhanced_slot_service.generate_slot_prompt(
         intent, slot_result.missing_slots, session_context
@@ -743,43 +754,56 @@ async def _save_conversation_record(user_id: str, session_id: str, user_input: s
     """
     try:
         logger.info(f"保存对话记录: user_input='{user_input}', intent='{response.intent}', status='{response.status}', response_type='{response.response_type}'")
-        # V2.2重构: 更新对话记录创建以适配新的字段结构
-        from src.models.conversation import Session
-        session = Session.get(Session.session_id == session_id)
-        
         # 确定正确的意图名称 - 优先使用response中的意图信息
         recognized_intent = response.intent or (intent_result.intent.intent_name if intent_result and intent_result.intent else None)
         confidence_score = response.confidence if hasattr(response, 'confidence') else (intent_result.confidence if intent_result else 0.0)
         
-        # 检查是否已存在相同的记录，避免重复键错误
+        def _persist_conversation() -> Conversation:
+            # V2.2重构: 更新对话记录创建以适配新的字段结构（在数据库线程池中执行）
+            from src.models.conversation import Session
+            session = Session.get(Session.session_id == session_id)
+            
+            # 检查是否已存在相同的记录，避免重复键错误
+            try:
+                conversation = Conversation.get(
+                    Conversation.session_id == session.session_id,
+                    Conversation.id == conversation_turn  # 假设conversation_turn对应id
+                )
+                # 更新现有记录
+                conversation.user_input = user_input
+                conversation.intent_recognized = recognized_intent
+                conversation.confidence_score = confidence_score
+                conversation.system_response = response.response
+                conversation.response_type = response.response_type
+                conversation.status = response.status
+                conversation.processing_time_ms = processing_time
+                conversation.save()
+            except Conversation.DoesNotExist:
+                # 创建新记录
+                conversation = Conversation.create(
+                    session_id=session.session_id,  # 修复：传递session_id而不是session对象
+                    user_id=session.user_id,
+                    user_input=user_input,
+                    intent_recognized=recognized_intent,
+                    confidence_score=confidence_score,
+                    system_response=response.response,
+                    response_type=response.response_type,
+                    status=response.status,
+                    processing_time_ms=processing_time,
+                    conversation_turn=conversation_turn
+                )
+            
+            return conversation
+        
+        conversation = await run_db(_persist_conversation)
+        
+        # 新的对话轮次写入后失效对话历史缓存
         try:
-            conversation = Conversation.get(
-                Conversation.session_id == session.session_id,
-                Conversation.id == conversation_turn  # 假设conversation_turn对应id
-            )
-            # 更新现有记录
-            conversation.user_input = user_input
-            conversation.intent_recognized = recognized_intent
-            conversation.confidence_score = confidence_score
-            conversation.system_response = response.response
-            conversation.response_type = response.response_type
-            conversation.status = response.status
-            conversation.processing_time_ms = processing_time
-            conversation.save()
-        except Conversation.DoesNotExist:
-            # 创建新记录
-            conversation = Conversation.create(
-                session_id=session.session_id,  # 修复：传递session_id而不是session对象
-                user_id=session.user_id,
-                user_input=user_input,
-                intent_recognized=recognized_intent,
-                confidence_score=confidence_score,
-                system_response=response.response,
-                response_type=response.response_type,
-                status=response.status,
-                processing_time_ms=processing_time,
-                conversation_turn=conversation_turn
-            )
+            from src.services.cache_service import get_cache_service
+            cache_service = await get_cache_service()
+            await cache_service.invalidate_conversation_history(session_id)
+        except Exception as e:
+            logger.warning(f"失效对话历史缓存失败: {str(e)}")
         
         # V2.2重构: 如果有槽位信息，保存到slot_values表
         if response.slots:
@@ -804,7 +828,8 @@ async def _try_handle_confirmation_response(
     user_input: str,
     session_context: Dict,
     conversation_service: ConversationService,
-    intent_service: IntentService
+    intent_service: IntentService,
+    enhanced_slot_service: EnhancedSlotService
 ) -> ChatResponse:
     """
     尝试处理用户的确认响应
@@ -814,6 +839,7 @@ async def _try_handle_confirmation_response(
         session_context: 会话上下文
         conversation_service: 对话服务
         intent_service: 意图服务
+        enhanced_slot_service: 增强槽位服务
         
     Returns:
         ChatResponse: 如果成功处理确认响应则返回响应，否则返回None
@@ -874,9 +900,6 @@ async def _try_handle_confirmation_response(
             logger.info(f"用户要求修改槽位: {intent_name}")
             
             # 构造一个slot_result来生成槽位询问
-            from src.services.enhanced_slot_service import get_enhanced_slot_service
-            enhanced_slot_service = await get_enhanced_slot_service()
-            
             # 获取必需槽位
             from src.models.slot import Slot
             slot_definitions = list(Slot.select().where(Slot.intent == intent.id, Slot.is_required == True))
@@ -894,7 +917,7 @@ async def _try_handle_confirmation_response(
             mock_slot_result = MockSlotResult()
             
             return await _generate_slot_prompt(
-                intent, mock_slot_result, session_context, conversation_service
+                intent, mock_slot_result, session_context, conversation_service, enhanced_slot_service
             )
             
         elif any(keyword in user_input_lower for keyword in cancel_keywords):
@@ -929,6 +952,7 @@ async def _try_handle_slot_supplement(
     session_context: Dict, 
     conversation_service: ConversationService,
     intent_service: IntentService,
+    enhanced_slot_service: EnhancedSlotService,
     session_id: str = None
 ) -> ChatResponse:
     """
@@ -939,6 +963,7 @@ async def _try_handle_slot_supplement(
         session_context: 会话上下文
         conversation_service: 对话服务
         intent_service: 意图服务
+        enhanced_slot_service: 增强槽位服务
         
     Returns:
         ChatResponse: 如果成功处理槽位补充则返回响应，否则返回None
@@ -1024,9 +1049,6 @@ async def _try_handle_slot_supplement(
         current_slots = session_context.get('current_slots', {})
         
         # 5. 尝试识别用户输入作为槽位值
-        from src.services.enhanced_slot_service import get_enhanced_slot_service
-        enhanced_slot_service = await get_enhanced_slot_service()
-        
         # 重新获取完整的历史槽位（确保包含最新数据）
         from src.services.slot_value_service import get_slot_value_service
         slot_value_service = get_slot_value_service()
@@ -1080,7 +1102,7 @@ async def _try_handle_slot_supplement(
         else:
             # 槽位不完整，继续询问
             return await _generate_slot_prompt(
-                intent, slot_result, session_context, conversation_service
+                intent, slot_result, session_context, conversation_service, enhanced_slot_service
             )
             
     except Exception as e:
@@ -13,7 +13,7 @@ database = PooledMySQLDatabase(
     host=settings.DATABASE_HOST,
     port=settings.DATABASE_PORT,
     charset='utf8mb4',
-    max_connections=20,
+    max_connections=settings.DATABASE_POOL_MAX_CONNECTIONS,
     stale_timeout=300
 )
 
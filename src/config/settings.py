@@ -26,6 +26,8 @@ class Settings(BaseSettings):
     DATABASE_USER: str = Field(default="root", env="DATABASE_USER")
     DATABASE_PASSWORD: str = Field(default="", env="DATABASE_PASSWORD")
     DATABASE_NAME: str = Field(default="intent_db", env="DATABASE_NAME")
+    DATABASE_POOL_MAX_CONNECTIONS: int = Field(default=20, env="DATABASE_POOL_MAX_CONNECTIONS")
+    DB_EXECUTOR_MAX_WORKERS: int = Field(default=10, env="DB_EXECUTOR_MAX_WORKERS")  # 数据库线程池大小，需小于连接池上限
     
     # Redis配置
     REDIS_HOST: str = Field(default="localhost", env="REDIS_HOST")
@@ -37,6 +39,33 @@ class Settings(BaseSettings):
     CACHE_TTL_CONFIG: int = Field(default=3600, env="CACHE_TTL_CONFIG")  # 配置缓存1小时
     CACHE_TTL_NLU: int = Field(default=1800, env="CACHE_TTL_NLU")       # NLU结果缓存30分钟
     CACHE_TTL_SESSION: int = Field(default=86400, env="CACHE_TTL_SESSION")  # 会话缓存24小时
+    # 进程内L1缓存（位于Redis之前，按缓存键模板启用，跨worker通过缓存失效总线失效）
+    CACHE_L1_ENABLED: bool = Field(default=True, env="CACHE_L1_ENABLED")
+    CACHE_L1_MAX_ENTRIES: int = Field(default=2048, env="CACHE_L1_MAX_ENTRIES")
+    # 进程内有界缓存（utils.cache_service.CacheService）：按条目数和字节数限制，W-TinyLFU淘汰
+    MEMORY_CACHE_MAX_ENTRIES: int = Field(default=10000, env="MEMORY_CACHE_MAX_ENTRIES")
+    MEMORY_CACHE_MAX_BYTES: int = Field(default=64 * 1024 * 1024, env="MEMORY_CACHE_MAX_BYTES")
+    # 槽位依赖图缓存的最大意图数
+    DEPENDENCY_GRAPH_CACHE_MAX_ENTRIES: int = Field(default=512, env="DEPENDENCY_GRAPH_CACHE_MAX_ENTRIES")
+    # 缓存失效总线：stream（Redis Stream，断线后可补读）或 pubsub（发布订阅）；CHANNEL为Stream键或频道名
+    CACHE_INVALIDATION_TRANSPORT: str = Field(default="stream", env="CACHE_INVALIDATION_TRANSPORT")
+    CACHE_INVALIDATION_CHANNEL: str = Field(default="intent_system:cache_invalidation", env="CACHE_INVALIDATION_CHANNEL")
+    CACHE_INVALIDATION_STREAM_MAXLEN: int = Field(default=10000, env="CACHE_INVALIDATION_STREAM_MAXLEN")
+    # 缓存失效审计日志（CacheInvalidationLog）：缓冲后批量写入数据库；执行失败的失效始终记录，供补偿处理
+    CACHE_INVALIDATION_AUDIT_ENABLED: bool = Field(default=True, env="CACHE_INVALIDATION_AUDIT_ENABLED")
+    CACHE_INVALIDATION_AUDIT_BATCH_SIZE: int = Field(default=100, env="CACHE_INVALIDATION_AUDIT_BATCH_SIZE")
+    CACHE_INVALIDATION_AUDIT_FLUSH_INTERVAL: float = Field(default=5.0, env="CACHE_INVALIDATION_AUDIT_FLUSH_INTERVAL")
+    # 按模式批量操作使用SCAN增量遍历（每次SCAN的COUNT提示）和分批UNLINK（每条命令的键数）
+    CACHE_SCAN_COUNT: int = Field(default=500, env="CACHE_SCAN_COUNT")
+    CACHE_UNLINK_BATCH: int = Field(default=500, env="CACHE_UNLINK_BATCH")
+    # 缓存标签集合的TTL（秒），应不小于登记到标签的条目的最长TTL
+    CACHE_TAG_TTL: int = Field(default=86400, env="CACHE_TAG_TTL")
+    # 缓存值压缩：序列化后达到阈值（字节）的值按算法压缩（zstd/lz4/zlib/none，zstd、lz4需安装对应的库，否则使用zlib）
+    CACHE_COMPRESSION: str = Field(default="zstd", env="CACHE_COMPRESSION")
+    CACHE_COMPRESSION_THRESHOLD: int = Field(default=4096, env="CACHE_COMPRESSION_THRESHOLD")
+    # 防击穿：缓存未命中时跨worker的加载锁超时（秒），未获得锁的请求最多等待 CACHE_LOAD_LOCK_WAIT 秒后自行加载
+    CACHE_LOAD_LOCK_TIMEOUT: float = Field(default=10.0, env="CACHE_LOAD_LOCK_TIMEOUT")
+    CACHE_LOAD_LOCK_WAIT: float = Field(default=2.0, env="CACHE_LOAD_LOCK_WAIT")
     
     # NLU配置
     LLM_MODEL: str = Field(default="gpt-3.5-turbo", env="LLM_MODEL")
@@ -45,11 +74,32 @@ class Settings(BaseSettings):
     LLM_API_URL: Optional[str] = Field(default=None, env="LLM_API_BASE")  # xinference兼容性映射
     LLM_TEMPERATURE: float = Field(default=0.1, env="LLM_TEMPERATURE")
     LLM_MAX_TOKENS: int = Field(default=1000, env="LLM_MAX_TOKENS")
+    # LLM请求合并与响应缓存（仅温度不高于阈值的确定性请求可缓存，默认只缓存温度为0的调用）
+    LLM_COALESCING_ENABLED: bool = Field(default=True, env="LLM_COALESCING_ENABLED")
+    LLM_RESPONSE_CACHE_SIZE: int = Field(default=512, env="LLM_RESPONSE_CACHE_SIZE")
+    LLM_RESPONSE_CACHE_TTL: int = Field(default=300, env="LLM_RESPONSE_CACHE_TTL")
+    LLM_RESPONSE_CACHE_MAX_TEMPERATURE: float = Field(default=0.0, env="LLM_RESPONSE_CACHE_MAX_TEMPERATURE")
+    # LLM请求微批调度（窗口毫秒、单批上限、在途请求并发上限）
+    LLM_BATCHING_ENABLED: bool = Field(default=False, env="LLM_BATCHING_ENABLED")
+    LLM_BATCH_WINDOW_MS: float = Field(default=5.0, env="LLM_BATCH_WINDOW_MS")
+    LLM_BATCH_MAX_SIZE: int = Field(default=16, env="LLM_BATCH_MAX_SIZE")
+    LLM_BATCH_MAX_CONCURRENCY: int = Field(default=32, env="LLM_BATCH_MAX_CONCURRENCY")
+    # 融合NLU模式：一次LLM调用同时完成意图识别、实体与槽位提取
+    NLU_FUSED_MODE: bool = Field(default=False, env="NLU_FUSED_MODE")
+    NLU_FUSED_SLOT_CANDIDATES: int = Field(default=3, env="NLU_FUSED_SLOT_CANDIDATES")
+    # 流式意图识别：意图置信度达到阈值即提前判定并取消剩余生成
+    NLU_STREAMING_MODE: bool = Field(default=False, env="NLU_STREAMING_MODE")
+    NLU_STREAM_EARLY_STOP_CONFIDENCE: float = Field(default=0.8, env="NLU_STREAM_EARLY_STOP_CONFIDENCE")
     
     # Duckling配置
     DUCKLING_URL: str = Field(default="http://localhost:8000", env="DUCKLING_URL")
     DUCKLING_TIMEOUT: int = Field(default=5, env="DUCKLING_TIMEOUT")
     
+    # 实体提取配置（各来源并发执行，超时单位：秒）
+    LLM_ENTITY_TIMEOUT: float = Field(default=8.0, env="LLM_ENTITY_TIMEOUT")
+    RULE_ENTITY_TIMEOUT: float = Field(default=1.0, env="RULE_ENTITY_TIMEOUT")
+    ENTITY_EXTRACTION_DEADLINE: float = Field(default=10.0, env="ENTITY_EXTRACTION_DEADLINE")
+    
     # RAGFLOW配置
     RAGFLOW_API_URL: str = Field(default="", env="RAGFLOW_API_URL")
     RAGFLOW_CHAT_ID: str = Field(default="", env="RAGFLOW_CHAT_ID")
@@ -64,6 +114,24 @@ class Settings(BaseSettings):
     
     # 性能配置
     MAX_CONCURRENT_REQUESTS: int = Field(default=100, env="MAX_CONCURRENT_REQUESTS")
+    # 上游（LLM/Duckling/RAGFLOW）自适应并发限制，每个上游独立计算上限
+    UPSTREAM_LIMITER_ENABLED: bool = Field(default=True, env="UPSTREAM_LIMITER_ENABLED")
+    UPSTREAM_LIMIT_INITIAL: int = Field(default=20, env="UPSTREAM_LIMIT_INITIAL")
+    UPSTREAM_LIMIT_MIN: int = Field(default=2, env="UPSTREAM_LIMIT_MIN")
+    UPSTREAM_LIMIT_MAX: int = Field(default=100, env="UPSTREAM_LIMIT_MAX")
+    UPSTREAM_QUEUE_MAX: int = Field(default=50, env="UPSTREAM_QUEUE_MAX")
+    UPSTREAM_QUEUE_TIMEOUT: float = Field(default=2.0, env="UPSTREAM_QUEUE_TIMEOUT")
+    UPSTREAM_LATENCY_TOLERANCE: float = Field(default=2.0, env="UPSTREAM_LATENCY_TOLERANCE")
+    UPSTREAM_LIMIT_BACKOFF: float = Field(default=0.9, env="UPSTREAM_LIMIT_BACKOFF")
+    # LLM延迟随输出长度变化，默认不以延迟作为LLM的过载信号（只看超时和429/5xx）
+    UPSTREAM_LLM_LATENCY_SIGNAL: bool = Field(default=False, env="UPSTREAM_LLM_LATENCY_SIGNAL")
+    # 对冲请求：慢于观测分位数时补发一份，额外负载受预算比例约束
+    HEDGING_ENABLED: bool = Field(default=False, env="HEDGING_ENABLED")
+    HEDGE_BUDGET_RATIO: float = Field(default=0.05, env="HEDGE_BUDGET_RATIO")
+    HEDGE_PERCENTILE: float = Field(default=95.0, env="HEDGE_PERCENTILE")
+    HEDGE_MIN_DELAY_MS: float = Field(default=50.0, env="HEDGE_MIN_DELAY_MS")
+    HEDGE_MIN_SAMPLES: int = Field(default=20, env="HEDGE_MIN_SAMPLES")
+    LLM_HEDGE_API_BASE: Optional[str] = Field(default=None, env="LLM_HEDGE_API_BASE")
     REQUEST_TIMEOUT: int = Field(default=30, env="REQUEST_TIMEOUT")
     API_CALL_TIMEOUT: int = Field(default=30, env="API_CALL_TIMEOUT")
     MAX_RETRY_ATTEMPTS: int = Field(default=3, env="MAX_RETRY_ATTEMPTS")
@@ -7,9 +7,10 @@ import asyncio
 import aiohttp
 import json
 import ssl
+import threading
 import time
 from typing import Dict, List, Optional, Any, Union, Callable, Tuple
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field, replace
 from enum import Enum
 from datetime import datetime, timedelta
 import hashlib
@@ -17,6 +18,8 @@ import base64
 from urllib.parse import urljoin, urlparse
 import re
 
+from src.core.cache_strategy import SerializationMethod, get_cache_strategy
+from src.utils.bounded_cache import BoundedCache
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -113,6 +116,10 @@ class CacheConfig:
     cache_key_include_headers: bool = False
     cache_key_include_params: bool = True
     cache_get_only: bool = True
+    # 通过Redis在包装器和worker之间共享GET响应（仅用于幂等、与调用方身份无关的接口）
+    shared: bool = False
+    # 本地缓存分片数（按键哈希分片，每片独立加锁和淘汰）
+    lock_stripes: int = 16
 
 
 @dataclass
@@ -244,78 +251,152 @@ class RateLimiter:
 
 
 class ResponseCache:
-    """响应缓存"""
+    """响应缓存（按键哈希分片的本地有界缓存，可选经Redis共享GET响应）"""
     
     def __init__(self, config: CacheConfig):
         self.config = config
-        self.cache = {}
-        self.access_times = {}
-        self.lock = asyncio.Lock()
+        stripe_count = max(1, min(config.lock_stripes, config.max_size))
+        stripe_size, remainder = divmod(max(1, config.max_size), stripe_count)
+        self._stripes = [
+            BoundedCache(max_entries=stripe_size + (1 if i < remainder else 0), ttl=config.ttl_seconds)
+            for i in range(stripe_count)
+        ]
+        # 分片内的读写不会让出事件循环，锁只在跨线程使用时起作用，且各分片互不阻塞
+        self._locks = [threading.Lock() for _ in range(stripe_count)]
+        self.stats = {
+            'hits': 0,
+            'shared_hits': 0,
+            'misses': 0,
+            'shared_errors': 0
+        }
     
-    def _generate_cache_key(self, request: ApiRequest, config: ApiWrapperConfig) -> str:
-        """生成缓存键"""
+    def make_key(self, request: ApiRequest, config: ApiWrapperConfig) -> Optional[str]:
+        """
+        生成缓存键（每次调用只计算一次，get/set复用）
+        
+        Args:
+            request: API请求
+            config: 包装器配置
+            
+        Returns:
+            Optional[str]: 缓存键，请求不可缓存时返回None
+        """
+        if not self.config.enabled:
+            return None
+        
+        if self.config.cache_get_only and request.method != HttpMethod.GET:
+            return None
+        
         key_parts = [
-            request.endpoint,
-            request.method.value
+            request.method.value,
+            config.base_url,
+            request.endpoint
         ]
         
         if self.config.cache_key_include_params:
-            params_str = json.dumps(request.params, sort_keys=True)
-            key_parts.append(params_str)
+            key_parts.append(json.dumps(request.params, sort_keys=True, default=str, separators=(',', ':')))
         
         if self.config.cache_key_include_headers:
-            headers_str = json.dumps(request.headers, sort_keys=True)
-            key_parts.append(headers_str)
+            key_parts.append(json.dumps(request.headers, sort_keys=True, separators=(',', ':')))
         
         key = "|".join(key_parts)
-        return hashlib.md5(key.encode()).hexdigest()
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
     
-    async def get(self, request: ApiRequest, config: ApiWrapperConfig) -> Optional[ApiResponse]:
-        """获取缓存响应"""
-        if not self.config.enabled:
-            return None
+    def _stripe(self, cache_key: str) -> int:
+        return int(cache_key[:8], 16) % len(self._stripes)
+    
+    def _is_shared(self, method: HttpMethod) -> bool:
+        return self.config.shared and method == HttpMethod.GET
+    
+    async def get(self, cache_key: str, request: ApiRequest, config: ApiWrapperConfig) -> Optional[ApiResponse]:
+        """获取缓存响应：先查本地分片，未命中时查Redis共享缓存"""
+        index = self._stripe(cache_key)
+        with self._locks[index]:
+            cached_response = self._stripes[index].get(cache_key)
         
-        if self.config.cache_get_only and request.method != HttpMethod.GET:
-            return None
+        if cached_response is not None:
+            self.stats['hits'] += 1
+            return replace(cached_response, from_cache=True)
         
-        async with self.lock:
-            cache_key = self._generate_cache_key(request, config)
-            
-            if cache_key in self.cache:
-                cached_response, cache_time = self.cache[cache_key]
-                
-                # 检查是否过期
-                if time.time() - cache_time < self.config.ttl_seconds:
-                    self.access_times[cache_key] = time.time()
-                    cached_response.from_cache = True
-                    return cached_response
-                else:
-                    # 清理过期缓存
-                    del self.cache[cache_key]
-                    if cache_key in self.access_times:
-                        del self.access_times[cache_key]
+        if self._is_shared(request.method):
+            cached_response = await self._get_shared(cache_key, config)
+            if cached_response is not None:
+                self.stats['shared_hits'] += 1
+                with self._locks[index]:
+                    self._stripes[index].set(cache_key, cached_response)
+                return replace(cached_response, from_cache=True)
         
+        self.stats['misses'] += 1
         return None
     
-    async def set(self, request: ApiRequest, response: ApiResponse, config: ApiWrapperConfig):
+    async def set(self, cache_key: str, request: ApiRequest, response: ApiResponse, config: ApiWrapperConfig):
         """设置缓存响应"""
-        if not self.config.enabled:
-            return
-        
-        if self.config.cache_get_only and request.method != HttpMethod.GET:
-            return
-        
-        async with self.lock:
-            # 检查缓存大小限制
-            if len(self.cache) >= self.config.max_size:
-                # 删除最少使用的缓存项
-                oldest_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-                del self.cache[oldest_key]
-                del self.access_times[oldest_key]
-            
-            cache_key = self._generate_cache_key(request, config)
-            self.cache[cache_key] = (response, time.time())
-            self.access_times[cache_key] = time.time()
+        index = self._stripe(cache_key)
+        with self._locks[index]:
+            self._stripes[index].set(cache_key, response)
+        
+        # 只共享成功的响应，避免一个worker遇到的错误扩散到其他worker
+        if self._is_shared(request.method) and 200 <= response.status_code < 300:
+            await self._set_shared(cache_key, response, config)
+    
+    def _shared_key(self, cache_key: str, config: ApiWrapperConfig) -> str:
+        return get_cache_strategy().get_cache_key(
+            'external_api_response',
+            service_name=urlparse(config.base_url).netloc or config.name,
+            request_hash=cache_key
+        )
+    
+    async def _get_shared(self, cache_key: str, config: ApiWrapperConfig) -> Optional[ApiResponse]:
+        try:
+            from src.services.cache_service import get_cache_service
+            cache_service = await get_cache_service()
+            data = await cache_service.get(self._shared_key(cache_key, config))
+            if not data:
+                return None
+            return ApiResponse(**data)
+        except Exception as e:
+            self.stats['shared_errors'] += 1
+            logger.warning(f"读取共享响应缓存失败: {str(e)}")
+            return None
+    
+    async def _set_shared(self, cache_key: str, response: ApiResponse, config: ApiWrapperConfig):
+        try:
+            from src.services.cache_service import get_cache_service
+            cache_service = await get_cache_service()
+            data = asdict(response)
+            data['from_cache'] = False
+            # raw_content为字节串，msgpack可直接表示
+            await cache_service.set(self._shared_key(cache_key, config), data,
+                                    ttl=self.config.ttl_seconds, method=SerializationMethod.MSGPACK)
+        except Exception as e:
+            self.stats['shared_errors'] += 1
+            logger.warning(f"写入共享响应缓存失败: {str(e)}")
+    
+    def clear(self):
+        """清空本地缓存"""
+        for lock, stripe in zip(self._locks, self._stripes):
+            with lock:
+                stripe.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        stats = dict(self.stats)
+        size = evictions = 0
+        for lock, stripe in zip(self._locks, self._stripes):
+            with lock:
+                stripe_stats = stripe.get_stats()
+            size += stripe_stats['size']
+            evictions += stripe_stats['evictions']
+        total = stats['hits'] + stats['shared_hits'] + stats['misses']
+        stats.update({
+            'size': size,
+            'max_size': self.config.max_size,
+            'evictions': evictions,
+            'stripes': len(self._stripes),
+            'shared': self.config.shared,
+            'hit_rate': round((stats['hits'] + stats['shared_hits']) / total, 4) if total else 0.0
+        })
+        return stats
 
 
 class ApiMetrics:
@@ -450,8 +531,9 @@ class ApiWrapper:
         """执行API调用"""
         await self._ensure_session()
         
-        # 检查缓存
-        cached_response = await self.cache.get(request, self.config)
+        # 检查缓存（缓存键只计算一次，写入时复用）
+        cache_key = self.cache.make_key(request, self.config)
+        cached_response = await self.cache.get(cache_key, request, self.config) if cache_key else None
         if cached_response:
             if self.metrics:
                 await self.metrics.record_request(request, cached_response)
@@ -468,8 +550,8 @@ class ApiWrapper:
         await self.rate_limiter.record_request()
         
         # 缓存响应
-        if not response.error:
-            await self.cache.set(request, response, self.config)
+        if cache_key and not response.error:
+            await self.cache.set(cache_key, request, response, self.config)
         
         # 记录指标
         if self.metrics:
@@ -763,6 +845,10 @@ class ApiWrapper:
     def get_metrics(self) -> Optional[Dict[str, Any]]:
         """获取API指标"""
         return self.metrics.get_metrics() if self.metrics else None
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取响应缓存统计"""
+        return self.cache.get_stats()
 
 
 class ApiWrapperFactory:
@@ -0,0 +1,266 @@
+"""
+缓存值编解码
+每个缓存值以1字节编解码标签开头，标签同时标识序列化格式和压缩算法，解码时按标签查表，
+不再依赖“先尝试JSON、失败再反序列化pickle”的猜测。标签取值均小于0x20，
+旧版本写入的数据（JSON文本或以0x80开头的pickle）不会以这些字节开头，可以继续按旧方式读取；
+旧版本读取到带标签的数据会解析失败并按未命中处理。
+
+序列化格式：JSON（优先使用orjson）、msgpack、pickle、字符串。JSON/msgpack无法表示的值
+（日期时间、自定义对象、非字符串键等）自动改用pickle，标签记录实际使用的格式。
+超过阈值的值按配置压缩（zstd、lz4，不可用时退化为zlib），压缩无收益时保持原样。
+"""
+import json
+import pickle
+import zlib
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config.settings import settings
+from src.core.cache_strategy import SerializationMethod
+from src.utils.logger import get_logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+logger = get_logger(__name__)
+
+# 序列化格式编号（标签低3位）
+_FORMAT_IDS = {
+    SerializationMethod.JSON: 1,
+    SerializationMethod.MSGPACK: 2,
+    SerializationMethod.PICKLE: 3,
+    SerializationMethod.STRING: 4,
+}
+
+# 压缩算法编号（标签第3-4位）
+_COMPRESSION_IDS = {
+    'none': 0,
+    'zlib': 1,
+    'zstd': 2,
+    'lz4': 3,
+}
+
+# orjson遇到日期时间、数据类和str/int等子类时交给default处理，未提供default即抛出异常，
+# 从而改用pickle保留原始类型
+_ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+    if orjson is not None else 0
+)
+
+
+def make_tag(method: SerializationMethod, compression: str = 'none') -> int:
+    """计算编解码标签"""
+    return _FORMAT_IDS[method] | (_COMPRESSION_IDS[compression] << 3)
+
+
+def _encode_json(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=_ORJSON_OPTIONS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _decode_json(payload: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def _encode_msgpack(data: Any) -> bytes:
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def _decode_msgpack(payload: bytes) -> Any:
+    if msgpack is None:
+        raise RuntimeError("msgpack未安装，无法解码缓存值")
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+def _encode_string(data: Any) -> bytes:
+    return str(data).encode('utf-8')
+
+
+def _decode_string(payload: bytes) -> str:
+    return payload.decode('utf-8')
+
+
+def _zstd_compress(payload: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=3).compress(payload)
+
+
+def _zstd_decompress(payload: bytes) -> bytes:
+    if zstandard is None:
+        raise RuntimeError("zstandard未安装，无法解压缓存值")
+    return zstandard.ZstdDecompressor().decompress(payload)
+
+
+def _lz4_decompress(payload: bytes) -> bytes:
+    if lz4_frame is None:
+        raise RuntimeError("lz4未安装，无法解压缓存值")
+    return lz4_frame.decompress(payload)
+
+
+_DECODERS: Dict[int, Callable[[bytes], Any]] = {
+    _FORMAT_IDS[SerializationMethod.JSON]: _decode_json,
+    _FORMAT_IDS[SerializationMethod.MSGPACK]: _decode_msgpack,
+    _FORMAT_IDS[SerializationMethod.PICKLE]: pickle.loads,
+    _FORMAT_IDS[SerializationMethod.STRING]: _decode_string,
+}
+
+_DECOMPRESSORS: Dict[int, Callable[[bytes], bytes]] = {
+    _COMPRESSION_IDS['none']: lambda payload: payload,
+    _COMPRESSION_IDS['zlib']: zlib.decompress,
+    _COMPRESSION_IDS['zstd']: _zstd_decompress,
+    _COMPRESSION_IDS['lz4']: _lz4_decompress,
+}
+
+# 标签 -> (解压函数, 解码函数)
+_TAG_TABLE: Dict[int, Tuple[Callable[[bytes], bytes], Callable[[bytes], Any]]] = {
+    format_id | (compression_id << 3): (_DECOMPRESSORS[compression_id], _DECODERS[format_id])
+    for format_id in _DECODERS
+    for compression_id in _DECOMPRESSORS
+}
+
+
+def _resolve_compressor(algorithm: str) -> Tuple[str, Optional[Callable[[bytes], bytes]]]:
+    """按配置选择压缩算法，所需的库未安装时退化为zlib"""
+    algorithm = (algorithm or 'none').lower()
+    if algorithm == 'none':
+        return 'none', None
+    if algorithm == 'zstd' and zstandard is not None:
+        return 'zstd', _zstd_compress
+    if algorithm == 'lz4' and lz4_frame is not None:
+        return 'lz4', lz4_frame.compress
+    if algorithm not in ('zlib', 'zstd', 'lz4'):
+        logger.warning(f"未知的缓存压缩算法: {algorithm}，改用zlib")
+    elif algorithm != 'zlib':
+        # 其他worker若安装了该库，会写入本进程无法解压的值
+        logger.warning(f"缓存压缩算法 {algorithm} 所需的库未安装，改用zlib")
+    return 'zlib', lambda payload: zlib.compress(payload, 6)
+
+
+class CacheCodec:
+    """带标签的缓存值编解码器"""
+
+    def __init__(self, compression: str = 'zstd', compression_threshold: int = 4096):
+        """
+        Args:
+            compression: 压缩算法（zstd/lz4/zlib/none）
+            compression_threshold: 序列化后达到该字节数才压缩，0表示不压缩
+        """
+        self.compression, self._compress = _resolve_compressor(compression)
+        self.compression_threshold = compression_threshold
+        self.stats = {
+            'encoded': 0,
+            'compressed': 0,
+            'fallback_to_pickle': 0,
+            'bytes_before_compression': 0,
+            'bytes_after_compression': 0
+        }
+
+    @staticmethod
+    def is_tagged(data: bytes) -> bool:
+        """是否为带编解码标签的缓存值"""
+        return bool(data) and data[0] in _TAG_TABLE
+
+    def encode(self, data: Any, method: SerializationMethod) -> bytes:
+        """
+        编码缓存值
+
+        Args:
+            data: 缓存值
+            method: 首选序列化格式，无法表示该值时改用pickle
+
+        Returns:
+            bytes: 标签 + （可能压缩的）序列化数据
+        """
+        payload = None
+        if method == SerializationMethod.JSON:
+            payload = self._try_encode(_encode_json, data)
+        elif method == SerializationMethod.MSGPACK:
+            if msgpack is None:
+                # msgpack未安装时使用JSON
+                method = SerializationMethod.JSON
+                payload = self._try_encode(_encode_json, data)
+            else:
+                payload = self._try_encode(_encode_msgpack, data)
+        elif method == SerializationMethod.STRING:
+            payload = _encode_string(data)
+
+        if payload is None:
+            if method != SerializationMethod.PICKLE:
+                self.stats['fallback_to_pickle'] += 1
+            method = SerializationMethod.PICKLE
+            payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.stats['encoded'] += 1
+        compression = 'none'
+        if self._compress is not None and 0 < self.compression_threshold <= len(payload):
+            compressed = self._compress(payload)
+            if len(compressed) < len(payload):
+                self.stats['compressed'] += 1
+                self.stats['bytes_before_compression'] += len(payload)
+                self.stats['bytes_after_compression'] += len(compressed)
+                payload = compressed
+                compression = self.compression
+
+        return bytes((make_tag(method, compression),)) + payload
+
+    @staticmethod
+    def _try_encode(encoder: Callable[[Any], bytes], data: Any) -> Optional[bytes]:
+        try:
+            return encoder(data)
+        except (TypeError, ValueError, OverflowError):
+            return None
+
+    @staticmethod
+    def decode(data: bytes) -> Any:
+        """
+        解码带标签的缓存值
+
+        Raises:
+            KeyError: 数据不带编解码标签
+        """
+        decompress, decode = _TAG_TABLE[data[0]]
+        return decode(decompress(data[1:]))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取编码统计"""
+        stats = dict(self.stats)
+        stats.update({
+            'compression': self.compression,
+            'compression_threshold': self.compression_threshold,
+            'json_backend': 'orjson' if orjson is not None else 'json',
+            'msgpack_available': msgpack is not None
+        })
+        return stats
+
+
+# 全局编解码器实例
+_cache_codec: Optional[CacheCodec] = None
+
+
+def get_cache_codec() -> CacheCodec:
+    """获取全局缓存编解码器"""
+    global _cache_codec
+    if _cache_codec is None:
+        _cache_codec = CacheCodec(
+            compression=settings.CACHE_COMPRESSION,
+            compression_threshold=settings.CACHE_COMPRESSION_THRESHOLD
+        )
+    return _cache_codec
@@ -2,18 +2,24 @@
 统一的缓存策略和命名规范
 规范化缓存键命名、TTL策略、序列化方式等
 """
-from typing import Dict, Any, Optional, Union, List
+from typing import Dict, Any, Optional, Union, List, Tuple
 from enum import Enum
 from datetime import timedelta
 import hashlib
 import json
 import pickle
+import re
+import unicodedata
 from dataclasses import dataclass
 
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 文本归一化时去除的结尾标点（全角标点经NFKC后大多已转为半角）
+_TRAILING_PUNCTUATION = "。.!！?？~～、,，;；"
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
 
 class CacheNamespace(str, Enum):
     """缓存命名空间枚举"""
@@ -65,6 +71,7 @@ class CacheTTL(int, Enum):
 class SerializationMethod(str, Enum):
     """序列化方法"""
     JSON = "json"           # JSON序列化，适合简单数据结构
+    MSGPACK = "msgpack"     # MessagePack，比JSON更紧凑的二进制格式
     PICKLE = "pickle"       # Python pickle，适合复杂对象
     STRING = "string"       # 字符串存储，适合纯文本
     HASH = "hash"          # 哈希值存储，适合去重和索引
@@ -79,6 +86,15 @@ class CacheKeyTemplate:
     ttl: CacheTTL
     serialization: SerializationMethod
     description: str
+    # 进程内L1缓存的TTL（秒），None表示不启用L1；适用于读多写少、变更时会发出失效通知的数据
+    l1_ttl: Optional[int] = None
+    # 同类数据在统一命名规范之前使用的完整键前缀（含命名空间），同样适用本模板的L1策略
+    legacy_prefixes: Tuple[str, ...] = ()
+    # 防击穿（仅对通过 CacheService.get_or_load 读取的键生效）：
+    # 逻辑过期后继续保留的时间（秒），期间返回旧值并由一个请求在后台刷新，0表示不启用
+    stale_ttl: int = 0
+    # XFetch提前刷新系数，越大越早刷新，0表示不提前刷新
+    xfetch_beta: float = 0.0
     
     def generate_key(self, system_prefix: str = "intent_system", **kwargs) -> str:
         """生成具体的缓存键"""
@@ -89,6 +105,37 @@ class CacheKeyTemplate:
             raise ValueError(f"缓存键模板参数缺失: {e}")
 
 
+class CacheTag:
+    """
+    缓存标签
+    
+    写入缓存时可将条目登记到标签集合（Redis集合，成员为完整缓存键），
+    意图、用户或会话数据变更时按标签直接删除受影响的条目，无需扫描键空间
+    """
+    # 标签集合的缓存键前缀（不含命名空间）
+    KEY_PREFIX = "tag:"
+    
+    @staticmethod
+    def intent(intent_id: Any) -> str:
+        """意图标签"""
+        return f"intent:{intent_id}"
+    
+    @staticmethod
+    def user(user_id: Any) -> str:
+        """用户标签"""
+        return f"user:{user_id}"
+    
+    @staticmethod
+    def session(session_id: Any) -> str:
+        """会话标签"""
+        return f"session:{session_id}"
+    
+    @classmethod
+    def key(cls, tag: str) -> str:
+        """标签集合的缓存键（不含命名空间）"""
+        return f"{cls.KEY_PREFIX}{tag}"
+
+
 class UnifiedCacheStrategy:
     """统一缓存策略管理器"""
     
@@ -105,7 +152,9 @@ class UnifiedCacheStrategy:
                 pattern="{input_hash}:{user_id}",
                 ttl=CacheTTL.MEDIUM,
                 serialization=SerializationMethod.JSON,
-                description="意图识别结果缓存"
+                description="意图识别结果缓存",
+                stale_ttl=60,
+                xfetch_beta=1.0
             ),
             
             'intent_recognition_with_history': CacheKeyTemplate(
@@ -123,7 +172,23 @@ class UnifiedCacheStrategy:
                 pattern="{intent_name}",
                 ttl=CacheTTL.CONFIG_CACHE,
                 serialization=SerializationMethod.JSON,
-                description="意图配置信息"
+                description="意图配置信息",
+                l1_ttl=60,
+                stale_ttl=60,
+                xfetch_beta=1.0
+            ),
+            
+            'active_intents': CacheKeyTemplate(
+                namespace=CacheNamespace.INTENT,
+                category="active",
+                pattern="list",
+                ttl=CacheTTL.LONG,
+                serialization=SerializationMethod.JSON,
+                description="活跃意图目录（版本化的紧凑格式）",
+                l1_ttl=30,
+                stale_ttl=60,
+                xfetch_beta=1.0,
+                legacy_prefixes=("intent_system:active_intents",)
             ),
             
             # === 会话管理相关 ===
@@ -158,10 +223,10 @@ class UnifiedCacheStrategy:
             'conversation_history': CacheKeyTemplate(
                 namespace=CacheNamespace.CONVERSATION,
                 category="history",
-                pattern="{session_id}:{limit}",
+                pattern="{session_id}",
                 ttl=CacheTTL.LONG,
-                serialization=SerializationMethod.JSON,
-                description="对话历史记录"
+                serialization=SerializationMethod.MSGPACK,
+                description="对话历史记录（Redis哈希，字段为返回条数limit，新对话写入时整体失效）"
             ),
             
             'conversation_transfer_history': CacheKeyTemplate(
@@ -199,7 +264,11 @@ class UnifiedCacheStrategy:
                 pattern="{intent_name}",
                 ttl=CacheTTL.CONFIG_CACHE,
                 serialization=SerializationMethod.JSON,
-                description="槽位定义"
+                description="槽位定义",
+                l1_ttl=60,
+                stale_ttl=60,
+                xfetch_beta=1.0,
+                legacy_prefixes=("intent_system:slot_definitions:",)
             ),
             
             'slot_dependencies': CacheKeyTemplate(
@@ -220,6 +289,15 @@ class UnifiedCacheStrategy:
                 description="会话槽位值"
             ),
             
+            'session_slot_state': CacheKeyTemplate(
+                namespace=CacheNamespace.SESSION,
+                category="slot_state",
+                pattern="{session_id}",
+                ttl=CacheTTL.SESSION_LIFETIME,
+                serialization=SerializationMethod.MSGPACK,
+                description="会话当前槽位状态（物化视图，Redis哈希，每个槽位一个字段）"
+            ),
+            
             # === 函数调用相关 ===
             'function_definition': CacheKeyTemplate(
                 namespace=CacheNamespace.METADATA,
@@ -246,7 +324,11 @@ class UnifiedCacheStrategy:
                 pattern="{config_key}",
                 ttl=CacheTTL.CONFIG_CACHE,
                 serialization=SerializationMethod.JSON,
-                description="系统配置项"
+                description="系统配置项",
+                l1_ttl=60,
+                stale_ttl=60,
+                xfetch_beta=1.0,
+                legacy_prefixes=("intent_system:system_configs",)
             ),
             
             'ragflow_config': CacheKeyTemplate(
@@ -255,7 +337,9 @@ class UnifiedCacheStrategy:
                 pattern="{config_name}",
                 ttl=CacheTTL.CONFIG_CACHE,
                 serialization=SerializationMethod.JSON,
-                description="RAGFlow配置"
+                description="RAGFlow配置",
+                l1_ttl=60,
+                legacy_prefixes=("ragflow:config:",)
             ),
             
             # === 统计分析相关 ===
@@ -307,6 +391,102 @@ class UnifiedCacheStrategy:
                 description="计算结果缓存"
             ),
         }
+        
+        # L1缓存规则：(键前缀, L1 TTL)，前缀越长越优先
+        self._l1_rules = self._build_l1_rules()
+        # 缓存键前缀到模板名称的规则，前缀越长越优先
+        self._template_rules = self._build_template_rules()
+    
+    def _build_l1_rules(self) -> List[Tuple[str, int]]:
+        rules = []
+        for template in self.templates.values():
+            if not template.l1_ttl:
+                continue
+            rules.append((f"{self.system_prefix}:{template.namespace.value}:{template.category}:", template.l1_ttl))
+            rules.extend((prefix, template.l1_ttl) for prefix in template.legacy_prefixes)
+        return sorted(rules, key=lambda rule: len(rule[0]), reverse=True)
+    
+    def _build_template_rules(self) -> List[Tuple[str, str]]:
+        rules = []
+        for name, template in self.templates.items():
+            rules.append((f"{self.system_prefix}:{template.namespace.value}:{template.category}:", name))
+            rules.extend((prefix, name) for prefix in template.legacy_prefixes)
+        return sorted(rules, key=lambda rule: len(rule[0]), reverse=True)
+    
+    def get_template_name_for_key(self, key: str, namespace: str = "intent_system") -> Optional[str]:
+        """
+        获取缓存键所属的模板名称
+        
+        Args:
+            key: 缓存键（不含命名空间）
+            namespace: 命名空间
+            
+        Returns:
+            Optional[str]: 模板名称，不属于任何模板时返回None
+        """
+        full_key = f"{namespace}:{key}"
+        for prefix, name in self._template_rules:
+            if key.startswith(prefix) or full_key.startswith(prefix):
+                return name
+        return None
+    
+    def get_template_key_patterns(self, template_name: str) -> List[str]:
+        """
+        获取模板缓存键的通配模式（不含命名空间，供 CacheService.delete_by_pattern 使用），包含旧版键前缀
+        
+        Args:
+            template_name: 模板名称
+            
+        Returns:
+            List[str]: 通配模式列表
+        """
+        if template_name not in self.templates:
+            raise ValueError(f"未知的缓存键模板: {template_name}")
+        
+        template = self.templates[template_name]
+        patterns = [f"{self.system_prefix}:{template.namespace.value}:{template.category}:*"]
+        # 旧版前缀是写入Redis的完整键前缀，去掉命名空间部分
+        namespace_prefix = f"{self.system_prefix}:"
+        for prefix in template.legacy_prefixes:
+            if prefix.startswith(namespace_prefix):
+                prefix = prefix[len(namespace_prefix):]
+            patterns.append(f"{prefix}*")
+        return patterns
+    
+    def get_key_serialization(self, key: str, namespace: str = "intent_system") -> Optional[SerializationMethod]:
+        """获取缓存键所属模板的序列化方法，不属于任何模板时返回None"""
+        template_name = self.get_template_name_for_key(key, namespace)
+        return self.templates[template_name].serialization if template_name else None
+    
+    def get_l1_ttl(self, key: str, namespace: str = "intent_system") -> Optional[int]:
+        """
+        获取缓存键对应的进程内L1缓存TTL
+        
+        Args:
+            key: 缓存键（不含命名空间）
+            namespace: 命名空间
+            
+        Returns:
+            Optional[int]: L1 TTL（秒），该键未启用L1时返回None
+        """
+        full_key = f"{namespace}:{key}"
+        for prefix, ttl in self._l1_rules:
+            if key.startswith(prefix) or full_key.startswith(prefix):
+                return ttl
+        return None
+    
+    def get_l1_ttl_for_cache_key(self, cache_key: str) -> Optional[int]:
+        """
+        获取Redis中完整缓存键（命名空间:键）对应的进程内L1缓存TTL
+        
+        Args:
+            cache_key: 完整缓存键，如 intent_system:intent_system:intent:config:x
+            
+        Returns:
+            Optional[int]: L1 TTL（秒），该键未启用L1时返回None
+        """
+        namespace, _, key = cache_key.partition(':')
+        return self.get_l1_ttl(key, namespace)
     
     def get_cache_key(self, template_name: str, **kwargs) -> str:
         """
@@ -344,6 +524,9 @@ class UnifiedCacheStrategy:
         try:
             if method == SerializationMethod.JSON:
                 return json.dumps(data, ensure_ascii=False, default=str)
+            elif method == SerializationMethod.MSGPACK:
+                import msgpack
+                return msgpack.packb(data, use_bin_type=True)
             elif method == SerializationMethod.PICKLE:
                 return pickle.dumps(data)
             elif method == SerializationMethod.STRING:
@@ -361,6 +544,9 @@ class UnifiedCacheStrategy:
         try:
             if method == SerializationMethod.JSON:
                 return json.loads(data) if isinstance(data, str) else json.loads(data.decode())
+            elif method == SerializationMethod.MSGPACK:
+                import msgpack
+                return msgpack.unpackb(data, raw=False, strict_map_key=False)
             elif method == SerializationMethod.PICKLE:
                 return pickle.loads(data) if isinstance(data, bytes) else pickle.loads(data.encode())
             elif method == SerializationMethod.STRING:
@@ -378,6 +564,36 @@ class UnifiedCacheStrategy:
         content = "|".join(str(arg) for arg in args)
         return hashlib.md5(content.encode()).hexdigest()[:16]  # 取前16位
     
+    def normalize_text(self, text: str) -> str:
+        """
+        归一化用户输入文本，用于生成跨进程稳定的内容寻址缓存键
+        
+        依次执行: NFKC归一化(全角转半角) -> 大小写折叠 -> 空白折叠 -> 去除结尾标点
+        """
+        if not text:
+            return ""
+        normalized = unicodedata.normalize("NFKC", text).casefold()
+        normalized = _WHITESPACE_PATTERN.sub(" ", normalized).strip()
+        return normalized.rstrip(_TRAILING_PUNCTUATION).strip()
+    
+    def generate_content_hash(self, text: str, *scopes) -> str:
+        """
+        生成文本内容的稳定摘要（不受Python进程级hash随机化影响）
+        
+        Args:
+            text: 原始文本，会先进行归一化
+            *scopes: 参与摘要的附加作用域，如配置版本号
+            
+        Returns:
+            str: 16位十六进制摘要
+        """
+        return self.generate_hash(self.normalize_text(text), *scopes)
+    
+    def generate_context_hash(self, context: Any) -> str:
+        """生成结构化上下文的稳定摘要（键排序后JSON序列化）"""
+        content = json.dumps(context, ensure_ascii=False, sort_keys=True, default=str)
+        return self.generate_hash(content)
+    
     def validate_template_params(self, template_name: str, **kwargs) -> bool:
         """验证模板参数是否完整"""
         if template_name not in self.templates:
@@ -403,7 +619,10 @@ class UnifiedCacheStrategy:
             "pattern": template.pattern,
             "ttl_seconds": template.ttl.value,
             "serialization": template.serialization.value,
-            "description": template.description
+            "description": template.description,
+            "l1_ttl_seconds": template.l1_ttl,
+            "stale_ttl_seconds": template.stale_ttl,
+            "xfetch_beta": template.xfetch_beta
         }
     
     def list_all_templates(self) -> Dict[str, Dict[str, Any]]:
@@ -457,6 +676,7 @@ __all__ = [
     'UnifiedCacheStrategy',
     'CacheNamespace', 
     'CacheTTL',
+    'CacheTag',
     'SerializationMethod',
     'get_cache_strategy',
     'generate_cache_key',
@@ -0,0 +1,441 @@
+"""
+意图与槽位目录快照
+按意图配置版本从数据库构建一次不可变的内存快照：示例语句、验证规则等JSON字段预先解析，
+关键词与示例的小写分词结果预先计算。NLU和槽位验证的热路径直接读取快照，
+不再在每次打分或验证时访问Peewee模型实例。
+"""
+import asyncio
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Pattern, Tuple
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 示例相似度打分使用的示例数量
+SCORING_EXAMPLES_PER_INTENT = 10
+
+# 共享缓存中意图目录的格式版本，字段变化时递增（旧格式数据按未命中处理）
+INTENT_CATALOG_FORMAT = 1
+INTENT_CATALOG_FIELDS = (
+    'id', 'intent_name', 'display_name', 'description', 'confidence_threshold',
+    'priority', 'category', 'examples', 'fallback_response', 'updated_at'
+)
+
+_EMPTY_RULES: Mapping[str, Any] = MappingProxyType({})
+
+
+@dataclass(frozen=True, slots=True)
+class SlotSnapshot:
+    """槽位定义快照"""
+
+    id: int
+    intent_id: int
+    slot_name: str
+    display_name: Optional[str]
+    slot_type: str
+    is_required: bool
+    is_list: bool
+    validation_rules: Mapping[str, Any]
+    examples: Tuple[Any, ...]
+    pattern: Optional[Pattern]
+    default_value: Optional[str]
+    prompt_template: Optional[str]
+    error_message: Optional[str]
+    extraction_priority: int
+    sort_order: int
+    updated_at: Any
+
+    def get_validation_rules(self) -> Mapping[str, Any]:
+        """获取验证规则（只读映射，需要修改时请先复制）"""
+        return self.validation_rules
+
+    def get_examples(self) -> Tuple[Any, ...]:
+        """获取示例值"""
+        return self.examples
+
+    def validate_value(self, value) -> Tuple[bool, str]:
+        """验证槽位值，规则与 Slot.validate_value 一致，正则表达式已预编译"""
+        rules = self.validation_rules
+
+        if self.slot_type == 'NUMBER':
+            try:
+                float(value)
+            except (ValueError, TypeError):
+                return False, "值必须是数字"
+
+        elif self.slot_type == 'ENUM':
+            allowed_values = rules.get('options', [])
+            if allowed_values and value not in allowed_values:
+                return False, f"值必须是以下之一: {', '.join(allowed_values)}"
+
+        if isinstance(value, str):
+            min_length = rules.get('min_length', 0)
+            max_length = rules.get('max_length', 1000)
+            if len(value) < min_length:
+                return False, f"长度不能少于{min_length}字符"
+            if len(value) > max_length:
+                return False, f"长度不能超过{max_length}字符"
+
+        pattern = rules.get('pattern')
+        if pattern and isinstance(value, str):
+            matched = self.pattern.match(value) if self.pattern is not None else re.match(pattern, value)
+            if not matched:
+                return False, rules.get('pattern_message', '格式不正确')
+
+        return True, ""
+
+
+@dataclass(frozen=True, slots=True)
+class IntentSnapshot:
+    """意图配置快照"""
+
+    id: int
+    intent_name: str
+    display_name: str
+    description: Optional[str]
+    confidence_threshold: float
+    priority: int
+    category: Optional[str]
+    examples: Tuple[str, ...]
+    fallback_response: Optional[str]
+    updated_at: Any
+    # 关键词打分使用的词集合：意图名按下划线切分 + 描述 + 显示名称（均小写）
+    keyword_words: FrozenSet[str]
+    # 示例相似度打分使用的示例词集合（前 SCORING_EXAMPLES_PER_INTENT 条，小写后按空白切分）
+    example_word_sets: Tuple[FrozenSet[str], ...]
+    slots: Tuple[SlotSnapshot, ...] = ()
+
+    def get_examples(self) -> Tuple[str, ...]:
+        """获取示例语句（只读）"""
+        return self.examples
+
+
+@dataclass(frozen=True, slots=True)
+class CatalogSnapshot:
+    """意图与槽位目录快照"""
+
+    version: Optional[int]
+    # 意图名 -> 意图快照，保持数据库返回顺序
+    intents: Mapping[str, IntentSnapshot]
+    intents_by_id: Mapping[int, IntentSnapshot]
+    # (意图ID, 槽位名) -> 槽位快照
+    slots: Mapping[Tuple[int, str], SlotSnapshot]
+    built_at: float = field(default_factory=time.time)
+
+    def get_intent(self, intent_name: str) -> Optional[IntentSnapshot]:
+        """按名称获取意图快照"""
+        return self.intents.get(intent_name)
+
+    def get_slot(self, intent_id: int, slot_name: str) -> Optional[SlotSnapshot]:
+        """获取意图下指定槽位的快照"""
+        return self.slots.get((intent_id, slot_name))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取快照信息"""
+        return {
+            'version': self.version,
+            'intents': len(self.intents),
+            'slots': len(self.slots),
+            'built_at': self.built_at
+        }
+
+
+def _freeze_rules(rules: Any) -> Mapping[str, Any]:
+    return MappingProxyType(dict(rules)) if isinstance(rules, dict) and rules else _EMPTY_RULES
+
+
+def _compile_pattern(pattern: Any) -> Optional[Pattern]:
+    if not pattern or not isinstance(pattern, str):
+        return None
+    try:
+        return re.compile(pattern)
+    except re.error:
+        # 非法的正则在验证时按原方式抛出异常，由验证逻辑统一处理
+        return None
+
+
+def build_slot_snapshot(slot: Any) -> SlotSnapshot:
+    """由槽位模型实例构建快照"""
+    rules = _freeze_rules(slot.validation_rules)
+    return SlotSnapshot(
+        id=slot.id,
+        intent_id=slot.intent_id,
+        slot_name=slot.slot_name,
+        display_name=slot.display_name,
+        slot_type=slot.slot_type,
+        is_required=bool(slot.is_required),
+        is_list=bool(slot.is_list),
+        validation_rules=rules,
+        examples=tuple(rules.get('examples') or ()),
+        pattern=_compile_pattern(rules.get('pattern')),
+        default_value=slot.default_value,
+        prompt_template=slot.prompt_template,
+        error_message=slot.error_message,
+        extraction_priority=slot.extraction_priority,
+        sort_order=slot.sort_order,
+        updated_at=slot.updated_at
+    )
+
+
+def build_intent_snapshot(intent: Any, slots: Iterable[SlotSnapshot] = ()) -> IntentSnapshot:
+    """由意图模型实例构建快照"""
+    return _new_intent_snapshot({
+        'id': intent.id,
+        'intent_name': intent.intent_name,
+        'display_name': intent.display_name,
+        'description': intent.description,
+        'confidence_threshold': float(intent.confidence_threshold),
+        'priority': intent.priority,
+        'category': intent.category,
+        'examples': intent.examples if isinstance(intent.examples, list) else [],
+        'fallback_response': intent.fallback_response,
+        'updated_at': intent.updated_at
+    }, slots)
+
+
+def _new_intent_snapshot(fields: Dict[str, Any], slots: Iterable[SlotSnapshot] = ()) -> IntentSnapshot:
+    """由意图的基础字段构建快照，并预先计算打分使用的词集合"""
+    examples = tuple(str(example) for example in fields['examples'] or ())
+    intent_name = fields['intent_name']
+    description = fields['description']
+    display_name = fields['display_name']
+
+    keyword_words = set(intent_name.lower().split('_'))
+    if description:
+        keyword_words.update(description.lower().split())
+    if display_name:
+        keyword_words.update(display_name.lower().split())
+
+    return IntentSnapshot(
+        id=fields['id'],
+        intent_name=intent_name,
+        display_name=display_name,
+        description=description,
+        confidence_threshold=fields['confidence_threshold'],
+        priority=fields['priority'],
+        category=fields['category'],
+        examples=examples,
+        fallback_response=fields['fallback_response'],
+        updated_at=fields['updated_at'],
+        keyword_words=frozenset(keyword_words),
+        example_word_sets=tuple(
+            frozenset(example.lower().split()) for example in examples[:SCORING_EXAMPLES_PER_INTENT]
+        ),
+        slots=tuple(slots)
+    )
+
+
+def dump_intent_catalog(intents: Iterable[IntentSnapshot], version: int) -> Dict[str, Any]:
+    """
+    将意图列表序列化为共享缓存使用的紧凑格式（只包含基础字段，可直接JSON编码）
+
+    Args:
+        intents: 意图快照列表
+        version: 意图配置版本号
+
+    Returns:
+        Dict[str, Any]: {"format", "config_version", "fields", "rows"}
+    """
+    rows = []
+    for intent in intents:
+        row = [getattr(intent, name) for name in INTENT_CATALOG_FIELDS]
+        row[INTENT_CATALOG_FIELDS.index('examples')] = list(intent.examples)
+        updated_at = intent.updated_at
+        row[INTENT_CATALOG_FIELDS.index('updated_at')] = updated_at.isoformat() if updated_at else None
+        rows.append(row)
+    return {
+        'format': INTENT_CATALOG_FORMAT,
+        'config_version': version,
+        'fields': list(INTENT_CATALOG_FIELDS),
+        'rows': rows
+    }
+
+
+def parse_intent_catalog(payload: Any, version: Optional[int] = None) -> Optional[List[IntentSnapshot]]:
+    """
+    解析共享缓存中的意图目录
+
+    Args:
+        payload: dump_intent_catalog 的输出
+        version: 期望的意图配置版本号，为None时不校验
+
+    Returns:
+        Optional[List[IntentSnapshot]]: 意图快照列表；格式或版本不匹配（如旧格式的缓存数据）时返回None
+    """
+    if not isinstance(payload, dict) or payload.get('format') != INTENT_CATALOG_FORMAT:
+        return None
+    if version is not None and payload.get('config_version') != version:
+        return None
+    if payload.get('fields') != list(INTENT_CATALOG_FIELDS):
+        return None
+
+    try:
+        intents = []
+        for row in payload.get('rows') or []:
+            fields = dict(zip(INTENT_CATALOG_FIELDS, row))
+            if fields['updated_at']:
+                fields['updated_at'] = datetime.fromisoformat(fields['updated_at'])
+            intents.append(_new_intent_snapshot(fields))
+        return intents
+    except (TypeError, ValueError, KeyError) as e:
+        logger.warning(f"意图目录缓存数据无效: {str(e)}")
+        return None
+
+
+def build_catalog_snapshot(intents: Iterable[Any], slots: Iterable[Any],
+                           version: Optional[int] = None) -> CatalogSnapshot:
+    """
+    由意图和槽位模型实例构建目录快照
+
+    Args:
+        intents: 活跃意图模型实例
+        slots: 活跃槽位模型实例（按 sort_order 排序），不属于上述意图的槽位被忽略
+        version: 意图配置版本号
+
+    Returns:
+        CatalogSnapshot: 目录快照
+    """
+    intents = list(intents)
+    intent_ids = {intent.id for intent in intents}
+
+    slots_by_intent: Dict[int, list] = {}
+    for slot in slots:
+        if slot.intent_id in intent_ids:
+            slots_by_intent.setdefault(slot.intent_id, []).append(build_slot_snapshot(slot))
+
+    intent_snapshots: Dict[str, IntentSnapshot] = {}
+    slot_index: Dict[Tuple[int, str], SlotSnapshot] = {}
+    for intent in intents:
+        intent_slots = slots_by_intent.get(intent.id, ())
+        intent_snapshots[intent.intent_name] = build_intent_snapshot(intent, intent_slots)
+        for slot in intent_slots:
+            slot_index[(intent.id, slot.slot_name)] = slot
+
+    return CatalogSnapshot(
+        version=version,
+        intents=MappingProxyType(intent_snapshots),
+        intents_by_id=MappingProxyType({snapshot.id: snapshot for snapshot in intent_snapshots.values()}),
+        slots=MappingProxyType(slot_index)
+    )
+
+
+def load_catalog_snapshot(version: Optional[int] = None) -> CatalogSnapshot:
+    """从数据库加载活跃意图和槽位并构建快照（同步查询，异步环境请通过run_db调用）"""
+    from src.models.intent import Intent
+    from src.models.slot import Slot
+
+    intents = list(Intent.select().where(Intent.is_active == True))
+    slots = list(Slot.select().where(Slot.is_active == True).order_by(Slot.sort_order))
+    return build_catalog_snapshot(intents, slots, version)
+
+
+# 当前进程使用的目录快照
+_catalog_snapshot: Optional[CatalogSnapshot] = None
+_pending_load: Optional[asyncio.Future] = None
+
+# 进程内的活跃意图列表副本（按配置版本号），意图配置失效时清空
+_local_active_intents: Dict[str, Any] = {'version': None, 'intents': None}
+
+
+def get_local_active_intents(version: int) -> Optional[Tuple[IntentSnapshot, ...]]:
+    """获取进程内与配置版本号一致的活跃意图列表，没有时返回None"""
+    if _local_active_intents['version'] != version:
+        return None
+    return _local_active_intents['intents']
+
+
+def set_local_active_intents(version: int, intents: Iterable[IntentSnapshot]) -> Tuple[IntentSnapshot, ...]:
+    """保存进程内的活跃意图列表副本"""
+    intents = tuple(intents)
+    _local_active_intents['version'] = version
+    _local_active_intents['intents'] = intents
+    return intents
+
+
+def invalidate_local_catalog():
+    """清空进程内的活跃意图列表副本（本进程发出意图配置失效事件时调用）"""
+    _local_active_intents['version'] = None
+    _local_active_intents['intents'] = None
+
+
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """获取当前的目录快照，尚未加载时返回None"""
+    return _catalog_snapshot
+
+
+def set_catalog_snapshot(snapshot: CatalogSnapshot):
+    """替换当前的目录快照"""
+    global _catalog_snapshot
+    _catalog_snapshot = snapshot
+    logger.info(f"意图目录快照已更新: 版本={snapshot.version}, "
+                f"{len(snapshot.intents)}个意图, {len(snapshot.slots)}个槽位")
+
+
+async def ensure_catalog_snapshot(version: int) -> Optional[CatalogSnapshot]:
+    """
+    确保目录快照与给定的配置版本一致，版本变化时重新加载（并发调用只加载一次）
+
+    Args:
+        version: 当前意图配置版本号
+
+    Returns:
+        Optional[CatalogSnapshot]: 目录快照；加载失败时返回旧快照（可能为None）
+    """
+    global _pending_load
+    snapshot = _catalog_snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    if _pending_load is None:
+        from src.utils.db_executor import run_db
+        _pending_load = asyncio.ensure_future(run_db(load_catalog_snapshot, version))
+
+    pending = _pending_load
+    try:
+        snapshot = await asyncio.shield(pending)
+        if _catalog_snapshot is None or _catalog_snapshot.built_at < snapshot.built_at:
+            set_catalog_snapshot(snapshot)
+        return _catalog_snapshot
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"加载意图目录快照失败: {str(e)}")
+        return _catalog_snapshot
+    finally:
+        if _pending_load is pending and pending.done():
+            _pending_load = None
+
+
+def resolve_intent_snapshot(intent: Any) -> Optional[IntentSnapshot]:
+    """
+    获取与意图模型实例对应的快照
+
+    快照中的记录与实例的更新时间不一致（快照尚未随配置刷新）时返回None，由调用方使用实例本身
+    """
+    if isinstance(intent, IntentSnapshot):
+        return intent
+    snapshot = _catalog_snapshot
+    if snapshot is None:
+        return None
+    intent_snapshot = snapshot.intents.get(intent.intent_name)
+    if intent_snapshot is None or intent_snapshot.updated_at != intent.updated_at:
+        return None
+    return intent_snapshot
+
+
+def resolve_slot_snapshot(slot: Any) -> Optional[SlotSnapshot]:
+    """获取与槽位模型实例对应的快照，规则同 resolve_intent_snapshot"""
+    if isinstance(slot, SlotSnapshot):
+        return slot
+    snapshot = _catalog_snapshot
+    if snapshot is None:
+        return None
+    slot_snapshot = snapshot.slots.get((slot.intent_id, slot.slot_name))
+    if slot_snapshot is None or slot_snapshot.updated_at != slot.updated_at:
+        return None
+    return slot_snapshot
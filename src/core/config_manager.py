@@ -831,7 +831,7 @@ class EnhancedConfigManager:
                 self.file_observer.join()
             
             # 清理缓存
-            await self.cache_service.delete_pattern(
+            await self.cache_service.delete_by_pattern(
                 f"config:*", 
                 namespace=self.cache_namespace
             )
@@ -11,6 +11,8 @@ import logging
 
 from ..models.slot import Slot
 from ..models.slot_value import SlotDependency
+from ..config.settings import settings
+from ..utils.bounded_cache import BoundedCache
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -456,8 +458,13 @@ class DependencyGraph:
 class DependencyGraphManager:
     """依赖图管理器"""
     
-    def __init__(self):
-        self._graphs: Dict[int, DependencyGraph] = {}  # intent_id -> graph
+    def __init__(self, max_graphs: Optional[int] = None):
+        """
+        Args:
+            max_graphs: 最多缓存的依赖图数量，默认取 DEPENDENCY_GRAPH_CACHE_MAX_ENTRIES
+        """
+        # intent_id -> graph，超出数量时按访问频率和时间淘汰
+        self._graphs = BoundedCache(max_entries=max_graphs or settings.DEPENDENCY_GRAPH_CACHE_MAX_ENTRIES)
     
     async def build_graph(self, intent_id: int, slots: List[Slot], 
                          dependencies: List[SlotDependency]) -> DependencyGraph:
@@ -473,7 +480,7 @@ class DependencyGraphManager:
             graph.add_edge(dependency)
         
         # 缓存图
-        self._graphs[intent_id] = graph
+        self._graphs.set(intent_id, graph)
         
         logger.info(f"构建依赖图完成: intent_id={intent_id}, "
                    f"节点数={len(graph.nodes)}, 边数={len(graph.edges)}")
@@ -486,14 +493,17 @@ class DependencyGraphManager:
     
     def invalidate_graph(self, intent_id: int):
         """使依赖图缓存失效"""
-        if intent_id in self._graphs:
-            del self._graphs[intent_id]
+        if self._graphs.delete(intent_id):
             logger.info(f"依赖图缓存失效: intent_id={intent_id}")
     
     def clear_cache(self):
         """清空所有缓存"""
         self._graphs.clear()
         logger.info("清空依赖图缓存")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取依赖图缓存统计"""
+        return self._graphs.get_stats()
 
 
 # 全局依赖图管理器实例
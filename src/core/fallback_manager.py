@@ -622,7 +622,9 @@ class FallbackManager:
         try:
             # 搜索相似的缓存键
             pattern = f"fallback_{context.error_type.value}_*"
-            similar_keys = await self.cache_service.get_keys_by_pattern(pattern, namespace=self.cache_namespace)
+            similar_keys = await self.cache_service.get_keys_by_pattern(
+                pattern, namespace=self.cache_namespace, limit=1
+            )
             
             if similar_keys:
                 # 取第一个匹配的结果
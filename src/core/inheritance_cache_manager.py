@@ -10,6 +10,7 @@ import json
 import hashlib
 
 from ..services.cache_service import CacheService
+from .cache_strategy import CacheTag
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -153,11 +154,12 @@ class InheritanceCacheManager:
                 ttl_seconds=ttl
             )
             
-            # 缓存数据
+            # 缓存数据，登记到用户和意图标签以便按用户或意图整体失效
             await self.cache_service.set(
                 cache_key_str,
                 cached_result.to_dict(),
-                ttl=ttl
+                ttl=ttl,
+                tags=[CacheTag.user(user_id), CacheTag.intent(intent_id)]
             )
             
             logger.debug(f"继承结果已缓存: {cache_key_str}")
@@ -170,15 +172,9 @@ class InheritanceCacheManager:
     async def invalidate_user_inheritance_cache(self, user_id: str):
         """使用户的所有继承缓存失效"""
         try:
-            # 使用模式匹配删除用户相关的缓存
-            pattern = f"inheritance:{user_id}:*"
-            
-            # 注意：这需要Redis支持，如果使用其他缓存可能需要调整
-            if hasattr(self.cache_service, 'delete_pattern'):
-                deleted_count = await self.cache_service.delete_pattern(pattern)
-                logger.info(f"清除用户继承缓存: {user_id}, 删除{deleted_count}个条目")
-            else:
-                logger.warning("缓存服务不支持模式删除，无法批量清除用户缓存")
+            # 按用户标签删除，只触及该用户的缓存条目
+            deleted_count = await self.cache_service.invalidate_tags([CacheTag.user(user_id)])
+            logger.info(f"清除用户继承缓存: {user_id}, 删除{deleted_count}个条目")
             
         except Exception as e:
             logger.error(f"清除用户继承缓存失败: {user_id}, 错误: {e}")
@@ -186,11 +182,8 @@ class InheritanceCacheManager:
     async def invalidate_intent_inheritance_cache(self, intent_id: int):
         """使意图的所有继承缓存失效"""
         try:
-            pattern = f"inheritance:*:{intent_id}:*"
-            
-            if hasattr(self.cache_service, 'delete_pattern'):
-                deleted_count = await self.cache_service.delete_pattern(pattern)
-                logger.info(f"清除意图继承缓存: {intent_id}, 删除{deleted_count}个条目")
+            deleted_count = await self.cache_service.invalidate_tags([CacheTag.intent(intent_id)])
+            logger.info(f"清除意图继承缓存: {intent_id}, 删除{deleted_count}个条目")
             
         except Exception as e:
             logger.error(f"清除意图继承缓存失败: {intent_id}, 错误: {e}")
@@ -0,0 +1,300 @@
+"""
+编译型规则意图匹配器
+在意图或关键词加载/刷新时一次性构建：关键词、描述词、意图名和示例语句编入同一个
+Aho-Corasick多模式自动机，并预计算 关键词→意图 权重表与每个示例的分词权重。
+匹配时对输入只扫描一遍即可为所有意图打分，评分语义与逐意图、逐示例的子串扫描实现一致。
+"""
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# 规则匹配中不计分的无意义词
+COMMON_WORDS = frozenset(['我', '想', '要', '帮', '的', '了', '吗', '呢', '吧', '一张', '一个'])
+
+# 每个意图参与匹配的示例数量上限
+MAX_EXAMPLES_PER_INTENT = 10
+
+# 意图名、描述词、示例包含关系及关键词的计分
+INTENT_NAME_SCORE = 0.8
+DESCRIPTION_WORD_SCORE = 0.2
+EXACT_MATCH_SCORE = 1.0
+INPUT_IN_EXAMPLE_SCORE = 0.3
+EXAMPLE_IN_INPUT_SCORE = 0.6
+DIRECT_CORE_MATCH_SCORE = 2.0
+DIRECT_CORE_MISMATCH_SCORE = -1.0
+EXAMPLE_CORE_MATCH_SCORE = 0.8
+EXAMPLE_CORE_MISMATCH_SCORE = -0.3
+NORMAL_WORD_SCORE = 0.1
+
+_EXAMPLE_SEPARATOR = '\x00'
+
+IntentSignature = Tuple[Tuple[str, Optional[str], Tuple[str, ...]], ...]
+IntentVersionKey = Tuple[Tuple[Any, ...], ...]
+
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick多模式匹配自动机"""
+
+    __slots__ = ('_goto', '_fail', '_output')
+
+    def __init__(self, patterns: Iterable[str]):
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[str]] = [[]]
+
+        for pattern in set(patterns):
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    output.append([])
+                node = next_node
+            output[node].append(pattern)
+
+        # 广度优先构建失败指针，并沿失败链合并输出
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                output[child].extend(output[fail[child]])
+
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(patterns_at) for patterns_at in output]
+
+    def find_all(self, text: str) -> Set[str]:
+        """返回在文本中出现过的所有模式（单次扫描，空串视为总是出现）"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        found: Set[str] = {''}
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class _CompiledExample:
+    """编译后的示例语句"""
+
+    __slots__ = ('text', 'index', 'tokens')
+
+    def __init__(self, text: str, index: int, tokens: Tuple[Tuple[str, float], ...]):
+        self.text = text
+        self.index = index
+        # 参与分词匹配的(词, 该意图下的权重)，保持原始顺序
+        self.tokens = tokens
+
+
+class _CompiledIntent:
+    """编译后的意图匹配数据"""
+
+    __slots__ = ('name', 'name_lower', 'description_words', 'examples')
+
+    def __init__(self, name: str, description_words: Tuple[str, ...],
+                 examples: Tuple[_CompiledExample, ...]):
+        self.name = name
+        self.name_lower = name.lower()
+        self.description_words = description_words
+        self.examples = examples
+
+
+def build_intent_signature(intents: Dict[str, object]) -> IntentSignature:
+    """计算意图集合中参与规则匹配的内容签名，用于判断编译结果是否需要重建"""
+    return tuple(
+        (name, intent.description, tuple(intent.get_examples()[:MAX_EXAMPLES_PER_INTENT]))
+        for name, intent in intents.items()
+    )
+
+
+def build_intent_version_key(intents: Dict[str, object]) -> IntentVersionKey:
+    """
+    计算意图集合的版本键：意图名 + 更新时间（模型保存时自动刷新），不需要遍历示例；
+    没有更新时间的对象退回按内容计算
+
+    Args:
+        intents: 意图名 -> 意图对象
+
+    Returns:
+        IntentVersionKey: 版本键（保持意图顺序）
+    """
+    key = []
+    for name, intent in intents.items():
+        updated_at = getattr(intent, 'updated_at', None)
+        if updated_at is not None:
+            key.append((name, updated_at))
+        else:
+            key.append((name, intent.description, tuple(intent.get_examples()[:MAX_EXAMPLES_PER_INTENT])))
+    return tuple(key)
+
+
+class CompiledIntentMatcher:
+    """编译型规则意图匹配器"""
+
+    def __init__(self, intents: Dict[str, object], keywords_mapping: Optional[Dict[str, List[str]]] = None,
+                 signature: Optional[IntentSignature] = None):
+        """
+        Args:
+            intents: 意图名 -> 意图对象（迭代顺序即同分时的优先顺序）
+            keywords_mapping: 关键词 -> 目标意图名列表
+            signature: 预先计算的意图签名，为None时自动计算
+        """
+        keywords_mapping = keywords_mapping or {}
+        self.signature = signature if signature is not None else build_intent_signature(intents)
+
+        # 关键词 -> 目标意图集合（命中目标意图加分，其余意图扣分）
+        self._keyword_order = {keyword: position for position, keyword in enumerate(keywords_mapping)}
+        self._keyword_targets = {keyword: frozenset(targets) for keyword, targets in keywords_mapping.items()}
+
+        patterns: List[str] = list(keywords_mapping)
+        example_texts: List[str] = []
+        compiled_intents: List[_CompiledIntent] = []
+
+        for name, intent in intents.items():
+            description_words = tuple(
+                word for word in (intent.description or '').lower().split() if len(word) > 2
+            )
+
+            examples = []
+            for example_text in intent.get_examples()[:MAX_EXAMPLES_PER_INTENT]:
+                example_lower = example_text.lower()
+                tokens = tuple(
+                    (word, self._example_word_weight(name, word))
+                    for word in example_lower.split()
+                    if len(word) > 1 and word not in COMMON_WORDS
+                )
+                examples.append(_CompiledExample(example_lower, len(example_texts), tokens))
+                example_texts.append(example_lower)
+
+            compiled = _CompiledIntent(name, description_words, tuple(examples))
+            compiled_intents.append(compiled)
+
+            patterns.append(compiled.name_lower)
+            patterns.extend(description_words)
+            patterns.extend(example.text for example in examples)
+
+        self._intents = tuple(compiled_intents)
+        self._automaton = AhoCorasickAutomaton(patterns)
+
+        # 所有示例拼接成一个语料串，用于一次性查找“输入是示例的子串”的情况
+        self._example_texts = example_texts
+        self._example_starts: List[int] = []
+        offset = 0
+        for text in example_texts:
+            self._example_starts.append(offset)
+            offset += len(text) + len(_EXAMPLE_SEPARATOR)
+        self._example_corpus = _EXAMPLE_SEPARATOR.join(example_texts)
+
+    def _example_word_weight(self, intent_name: str, word: str) -> float:
+        """示例分词在指定意图下的权重"""
+        targets = self._keyword_targets.get(word)
+        if targets is None:
+            return NORMAL_WORD_SCORE
+        return EXAMPLE_CORE_MATCH_SCORE if intent_name in targets else EXAMPLE_CORE_MISMATCH_SCORE
+
+    def _examples_containing(self, text: str) -> Set[int]:
+        """查找包含输入文本的示例编号"""
+        if not text or _EXAMPLE_SEPARATOR in text:
+            return {index for index, example in enumerate(self._example_texts) if text in example}
+
+        corpus = self._example_corpus
+        starts = self._example_starts
+        indexes: Set[int] = set()
+        position = corpus.find(text)
+        while position >= 0:
+            index = bisect_right(starts, position) - 1
+            indexes.add(index)
+            if index + 1 >= len(starts):
+                break
+            position = corpus.find(text, starts[index + 1])
+        return indexes
+
+    def score(self, user_input: str) -> Dict[str, float]:
+        """
+        为所有意图打分
+
+        Args:
+            user_input: 用户输入
+
+        Returns:
+            Dict[str, float]: 意图名 -> 得分（按意图顺序）
+        """
+        text = user_input.lower()
+        found = self._automaton.find_all(text)
+        containing = self._examples_containing(text)
+        user_words = set(text.split())
+
+        # 输入中出现的关键词，按关键词表顺序排列
+        present_keywords = sorted(
+            (keyword for keyword in found if keyword in self._keyword_order),
+            key=self._keyword_order.__getitem__
+        )
+
+        scores: Dict[str, float] = {}
+        for intent in self._intents:
+            score = 0.0
+
+            if intent.name_lower in found:
+                score += INTENT_NAME_SCORE
+
+            for word in intent.description_words:
+                if word in found:
+                    score += DESCRIPTION_WORD_SCORE
+
+            keyword_terms = None
+            for example in intent.examples:
+                if text == example.text:
+                    score += EXACT_MATCH_SCORE
+                elif example.index in containing:
+                    score += INPUT_IN_EXAMPLE_SCORE
+                elif example.text in found:
+                    score += EXAMPLE_IN_INPUT_SCORE
+                else:
+                    # 输入中直接出现的核心名词：与示例无关，每个不包含匹配的示例都计一次
+                    if keyword_terms is None:
+                        keyword_terms = [
+                            DIRECT_CORE_MATCH_SCORE if intent.name in self._keyword_targets[keyword]
+                            else DIRECT_CORE_MISMATCH_SCORE
+                            for keyword in present_keywords
+                        ]
+                    for term in keyword_terms:
+                        score += term
+
+                    for word, weight in example.tokens:
+                        if word in user_words:
+                            score += weight
+
+            scores[intent.name] = score
+
+        return scores
+
+    def best_match(self, user_input: str) -> Tuple[Optional[str], float, Dict[str, float]]:
+        """
+        获取得分最高的意图（同分时取顺序靠前者，得分需大于0）
+
+        Returns:
+            Tuple: (最佳意图名, 最佳得分, 全部得分)
+        """
+        scores = self.score(user_input)
+        best_match = None
+        best_score = 0.0
+        for name, score in scores.items():
+            if score > best_score:
+                best_score = score
+                best_match = name
+        return best_match, best_score, scores
@@ -0,0 +1,104 @@
+"""
+增量JSON字段扫描
+逐块接收LLM流式输出的JSON文本，一旦顶层对象中的标量字段（字符串、数字、布尔、null）
+完整出现即可读取，无需等待整个对象生成完毕。嵌套的对象和数组会被跳过；
+首个 '{' 之前的内容（如 ```json 代码块标记）会被忽略。
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+
+class IncrementalJSONFieldScanner:
+    """顶层JSON标量字段的增量扫描器"""
+
+    __slots__ = ('fields', '_depth', '_in_string', '_escape', '_capture',
+                 '_token', '_key', '_expect_value', '_scalar')
+
+    def __init__(self):
+        # 已完整解析的顶层标量字段
+        self.fields: Dict[str, Any] = {}
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._capture = False
+        self._token: List[str] = []
+        self._key: Optional[str] = None
+        self._expect_value = False
+        self._scalar: Optional[List[str]] = None
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        """
+        输入一段文本
+
+        Args:
+            chunk: 流式输出的增量文本
+
+        Returns:
+            Dict[str, Any]: 目前已完整解析的顶层标量字段
+        """
+        for char in chunk:
+            self._consume(char)
+        return self.fields
+
+    def _consume(self, char: str):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._capture:
+                    self._finish_string()
+                return
+            if self._capture:
+                self._token.append(char)
+            return
+
+        if self._scalar is not None:
+            if char not in ',}]' and not char.isspace():
+                self._scalar.append(char)
+                return
+            self._finish_scalar()
+
+        if char == '"':
+            self._in_string = True
+            self._capture = self._depth == 1
+            self._token = []
+        elif char in '{[':
+            if self._depth == 1 and self._expect_value:
+                # 嵌套值不解析，跳过该字段
+                self._expect_value = False
+                self._key = None
+            self._depth += 1
+        elif char in '}]':
+            self._depth -= 1
+        elif self._depth == 1:
+            if char == ':':
+                self._expect_value = self._key is not None
+            elif char == ',':
+                self._key = None
+                self._expect_value = False
+            elif self._expect_value and not char.isspace():
+                self._scalar = [char]
+
+    def _finish_string(self):
+        try:
+            text = json.loads('"' + ''.join(self._token) + '"')
+        except ValueError:
+            text = ''.join(self._token)
+
+        if self._expect_value:
+            self.fields[self._key] = text
+            self._expect_value = False
+        else:
+            self._key = text
+
+    def _finish_scalar(self):
+        raw = ''.join(self._scalar)
+        self._scalar = None
+        self._expect_value = False
+        try:
+            self.fields[self._key] = json.loads(raw)
+        except ValueError:
+            pass
@@ -0,0 +1,156 @@
+"""
+LLM请求微批调度器
+在极短的时间窗口内收集提示词（或收满N条），成批下发给上游，并把每条响应路由回对应的等待者。
+xinference的OpenAI兼容 /chat/completions 接口一次只接受一组消息，批内请求以受限并发的方式
+同时发出，由推理后端的连续批处理合并执行；并发上限同时充当对上游的背压。
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SendFunction = Callable[..., Awaitable[str]]
+
+
+class _PendingCall:
+    """等待下发的调用"""
+
+    __slots__ = ('prompt', 'kwargs', 'future', 'enqueued_at')
+
+    def __init__(self, prompt: str, kwargs: Dict[str, Any], future: asyncio.Future):
+        self.prompt = prompt
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class LLMBatchDispatcher:
+    """LLM请求微批调度器"""
+
+    def __init__(self, send: SendFunction, window_ms: float = 5.0,
+                 max_batch_size: int = 16, max_concurrency: int = 32):
+        """
+        Args:
+            send: 实际发送单条请求的协程函数 send(prompt, **kwargs) -> str
+            window_ms: 收集窗口（毫秒），首条请求入队后最多等待的时间
+            max_batch_size: 单批最大条数，收满立即下发
+            max_concurrency: 同时在途的上游请求上限
+        """
+        self._send = send
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._pending: List[_PendingCall] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+        self._in_flight = 0
+
+        self.stats = {
+            'submitted': 0,
+            'batches': 0,
+            'dispatched': 0,
+            'cancelled_before_dispatch': 0,
+            'max_batch_size_seen': 0,
+            'max_in_flight_seen': 0,
+            'queue_wait_ms_total': 0.0
+        }
+
+    async def submit(self, prompt: str, **kwargs: Any) -> str:
+        """
+        提交一条调用并等待其响应
+
+        Args:
+            prompt: 提示词
+            **kwargs: 透传给发送函数的生成参数
+
+        Returns:
+            str: 上游响应内容
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(_PendingCall(prompt, kwargs, future))
+        self.stats['submitted'] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """下发当前收集到的一批调用"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        # 下发前已被取消的调用直接丢弃
+        live = [call for call in batch if not call.future.done()]
+        self.stats['cancelled_before_dispatch'] += len(batch) - len(live)
+        if not live:
+            return
+
+        self.stats['batches'] += 1
+        self.stats['max_batch_size_seen'] = max(self.stats['max_batch_size_seen'], len(live))
+
+        for call in live:
+            task = asyncio.ensure_future(self._dispatch(call))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, call: _PendingCall):
+        """在并发上限内发送单条调用，并把结果交给等待者"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            if call.future.done():
+                self.stats['cancelled_before_dispatch'] += 1
+                return
+
+            self.stats['dispatched'] += 1
+            self.stats['queue_wait_ms_total'] += (time.perf_counter() - call.enqueued_at) * 1000
+            self._in_flight += 1
+            self.stats['max_in_flight_seen'] = max(self.stats['max_in_flight_seen'], self._in_flight)
+            try:
+                result = await self._send(call.prompt, **call.kwargs)
+            except asyncio.CancelledError:
+                if not call.future.done():
+                    call.future.cancel()
+                raise
+            except Exception as e:
+                if not call.future.done():
+                    call.future.set_exception(e)
+                return
+            finally:
+                self._in_flight -= 1
+
+        if not call.future.done():
+            call.future.set_result(result)
+
+    async def close(self):
+        """下发剩余调用并等待所有在途请求结束"""
+        if self._pending:
+            self._flush()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取调度统计"""
+        stats = dict(self.stats)
+        batches = stats['batches']
+        dispatched = stats['dispatched']
+        stats['avg_batch_size'] = round(dispatched / batches, 2) if batches else 0.0
+        stats['avg_queue_wait_ms'] = round(stats.pop('queue_wait_ms_total') / dispatched, 2) if dispatched else 0.0
+        stats['pending'] = len(self._pending)
+        stats['in_flight'] = self._in_flight
+        stats['window_ms'] = self.window * 1000
+        stats['max_batch_size'] = self.max_batch_size
+        stats['max_concurrency'] = self.max_concurrency
+        return stats
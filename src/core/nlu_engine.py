@@ -2,22 +2,38 @@
 NLU自然语言理解引擎
 集成xinference + Duckling + 自定义模型
 """
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, AsyncIterator
 import json
+import time
 import asyncio
+import hashlib
 import aiohttp
+from contextlib import aclosing
 from datetime import datetime
 from decimal import Decimal
 
 from src.config.settings import settings
 from src.models.intent import Intent
-from src.models.slot import Slot
 from src.utils.logger import get_logger
+from src.utils.lru_cache import LRUTTLCache
 from src.schemas.intent_recognition import IntentRecognitionResult
 from src.core.confidence_manager import ConfidenceManager, ConfidenceSource, ConfidenceScore
+from src.core.intent_matcher import CompiledIntentMatcher, IntentVersionKey, build_intent_version_key
+from src.core.catalog_snapshot import (
+    CatalogSnapshot, IntentSnapshot, get_catalog_snapshot, load_catalog_snapshot, set_catalog_snapshot
+)
+from src.core.llm_batcher import LLMBatchDispatcher
+from src.core.json_stream import IncrementalJSONFieldScanner
+from src.core.prompt_templates import PromptFragmentCache, render_request_suffix
+from src.utils.request_context import prime_request_memo, peek_request_memo
+from src.utils.concurrency_limiter import ConcurrencyLimitExceeded, upstream_permit
+from src.utils.hedging import get_hedge_policy
 
 logger = get_logger(__name__)
 
+# 同时保留的编译型规则匹配器数量上限（不同的意图集合各对应一个）
+MAX_RULE_MATCHERS = 4
+
 
 class DecimalEncoder(json.JSONEncoder):
     """自定义JSON编码器，处理Decimal和datetime类型"""
@@ -37,10 +53,32 @@ def safe_json_dumps(obj, **kwargs) -> str:
 class CustomLLM:
     """自定义LLM包装器，用于xinference集成"""
     
-    def __init__(self, api_url: str, api_key: str):
+    def __init__(self, api_url: str, api_key: str, hedge_api_url: Optional[str] = None):
         self.api_url = api_url
         self.api_key = api_key
+        # 对冲请求的备用端点，未配置时对冲到同一端点
+        self.hedge_api_url = hedge_api_url or api_url
         self.session = None
+        # 累计调用次数与token用量（来自响应中的usage字段）
+        self.usage_stats = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+        
+        # 单飞合并：相同提示词摘要的并发调用共享一次上游请求
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # 确定性（低温度）提示词的响应缓存
+        self._response_cache = LRUTTLCache(
+            max_size=settings.LLM_RESPONSE_CACHE_SIZE,
+            ttl=settings.LLM_RESPONSE_CACHE_TTL
+        ) if settings.LLM_RESPONSE_CACHE_SIZE > 0 else None
+        self.call_stats = {'requests': 0, 'upstream_calls': 0, 'coalesced': 0, 'cache_hits': 0,
+                           'streams': 0, 'streams_cancelled': 0}
+        
+        # 可选的微批调度器：短窗口内收集请求，受限并发地下发
+        self._batcher = LLMBatchDispatcher(
+            self._send,
+            window_ms=settings.LLM_BATCH_WINDOW_MS,
+            max_batch_size=settings.LLM_BATCH_MAX_SIZE,
+            max_concurrency=settings.LLM_BATCH_MAX_CONCURRENCY
+        ) if settings.LLM_BATCHING_ENABLED else None
     
     async def _ainit_session(self):
         """异步初始化HTTP会话"""
@@ -50,7 +88,78 @@ class CustomLLM:
             self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
     
     async def acall(self, prompt: str, **kwargs: Any) -> str:
-        """异步调用xinference LLM"""
+        """异步调用xinference LLM
+        
+        低温度提示词优先命中响应缓存；与进行中的相同请求合并，共享同一次上游调用
+        """
+        self.call_stats['requests'] += 1
+        
+        temperature = kwargs.get('temperature', settings.LLM_TEMPERATURE)
+        digest = self._prompt_digest(prompt, kwargs)
+        cacheable = (self._response_cache is not None and
+                     temperature <= settings.LLM_RESPONSE_CACHE_MAX_TEMPERATURE)
+        
+        if cacheable:
+            cached = self._response_cache.get(digest)
+            if cached is not None:
+                self.call_stats['cache_hits'] += 1
+                return cached
+        
+        if settings.LLM_COALESCING_ENABLED:
+            task = self._inflight.get(digest)
+            if task is not None:
+                self.call_stats['coalesced'] += 1
+                return await asyncio.shield(task)
+            
+            # 上游请求独立于首个调用者运行，调用者被取消时不影响其他等待者
+            task = asyncio.ensure_future(self._request(prompt, **kwargs))
+            self._inflight[digest] = task
+            task.add_done_callback(lambda done: self._release_inflight(digest, done))
+            content = await asyncio.shield(task)
+        else:
+            content = await self._request(prompt, **kwargs)
+        
+        if cacheable and not content.startswith("Error:"):
+            self._response_cache.set(digest, content)
+        return content
+    
+    def _release_inflight(self, digest: str, task: asyncio.Future):
+        """上游请求完成后移除单飞登记"""
+        if self._inflight.get(digest) is task:
+            del self._inflight[digest]
+    
+    @staticmethod
+    def _prompt_digest(prompt: str, kwargs: Dict[str, Any]) -> str:
+        """提示词及生成参数的摘要"""
+        key = json.dumps({
+            'model': kwargs.get('model', settings.LLM_MODEL),
+            'temperature': kwargs.get('temperature', settings.LLM_TEMPERATURE),
+            'max_tokens': kwargs.get('max_tokens', settings.LLM_MAX_TOKENS),
+            'prompt': prompt
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+    
+    async def _request(self, prompt: str, **kwargs: Any) -> str:
+        """向上游发送一次LLM请求（启用微批时经调度器下发）"""
+        if self._batcher is not None:
+            return await self._batcher.submit(prompt, **kwargs)
+        return await self._send(prompt, **kwargs)
+    
+    async def _send(self, prompt: str, **kwargs: Any) -> str:
+        """发送单条LLM请求（启用对冲时，慢请求会向备用端点补发一份）"""
+        if not settings.HEDGING_ENABLED:
+            return await self._post(prompt, **kwargs)
+        
+        return await get_hedge_policy('llm').run(
+            lambda attempt: self._post(
+                prompt, api_url=self.hedge_api_url if attempt else self.api_url, **kwargs
+            ),
+            lambda content: not content.startswith("Error:")
+        )
+    
+    async def _post(self, prompt: str, api_url: Optional[str] = None, **kwargs: Any) -> str:
+        """发送单条LLM HTTP请求"""
+        self.call_stats['upstream_calls'] += 1
         try:
             await self._ainit_session()
             
@@ -67,27 +176,116 @@ class CustomLLM:
                 'stream': False  # xinference支持，明确指定非流式
             }
             
-            async with self.session.post(self.api_url, headers=headers, json=data) as response:
+            async with upstream_permit('llm') as permit, \
+                    self.session.post(api_url or self.api_url, headers=headers, json=data) as response:
                 if response.status == 200:
                     result = await response.json()
                     content = result['choices'][0]['message']['content']
+                    self._record_usage(result.get('usage'))
                     logger.debug(f"LLM调用成功: {len(content)} 字符")
                     return content
                 else:
+                    if response.status == 429 or response.status >= 500:
+                        permit.mark_dropped()
                     error_text = await response.text()
                     logger.error(f"LLM调用失败: {response.status}, {error_text}")
                     return "Error: LLM调用失败"
         
+        except ConcurrencyLimitExceeded as e:
+            # 快速拒绝：由调用方按LLM失败处理（意图识别回退到规则匹配）
+            logger.warning(f"LLM调用被拒绝: {e.reason}")
+            return f"Error: {str(e)}"
         except Exception as e:
             logger.error(f"LLM异步调用异常: {str(e)}")
             return f"Error: {str(e)}"
     
+    async def astream(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        """流式调用xinference LLM，逐块产出增量文本
+        
+        解析OpenAI兼容的SSE输出；调用方提前关闭生成器时会断开连接，由服务端中止剩余生成。
+        流式调用不经过请求合并、响应缓存和微批调度。
+        
+        Raises:
+            RuntimeError: 上游返回非200状态
+        """
+        self.call_stats['upstream_calls'] += 1
+        self.call_stats['streams'] += 1
+        await self._ainit_session()
+        
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        
+        data = {
+            'model': kwargs.get('model', settings.LLM_MODEL),
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': kwargs.get('temperature', settings.LLM_TEMPERATURE),
+            'max_tokens': kwargs.get('max_tokens', settings.LLM_MAX_TOKENS),
+            'stream': True
+        }
+        
+        async with upstream_permit('llm') as permit, \
+                self.session.post(self.api_url, headers=headers, json=data) as response:
+            if response.status != 200:
+                if response.status == 429 or response.status >= 500:
+                    permit.mark_dropped()
+                error_text = await response.text()
+                raise RuntimeError(f"LLM流式调用失败: {response.status}, {error_text}")
+            
+            usage = None
+            finished = False
+            try:
+                async for raw_line in response.content:
+                    line = raw_line.decode('utf-8').strip()
+                    if not line.startswith('data:'):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        break
+                    
+                    chunk = json.loads(payload)
+                    usage = chunk.get('usage') or usage
+                    choices = chunk.get('choices') or []
+                    if choices:
+                        content = (choices[0].get('delta') or {}).get('content')
+                        if content:
+                            yield content
+                finished = True
+            finally:
+                self._record_usage(usage)
+                if not finished:
+                    # 提前结束：直接关闭连接而不是归还连接池，通知服务端停止生成
+                    self.call_stats['streams_cancelled'] += 1
+                    response.close()
+    
     # 兼容性别名
     async def _acall(self, prompt: str, **kwargs: Any) -> str:
         return await self.acall(prompt, **kwargs)
     
+    def _record_usage(self, usage: Optional[Dict[str, Any]]):
+        """累计token用量"""
+        self.usage_stats['calls'] += 1
+        if usage:
+            self.usage_stats['prompt_tokens'] += usage.get('prompt_tokens', 0) or 0
+            self.usage_stats['completion_tokens'] += usage.get('completion_tokens', 0) or 0
+    
+    def get_usage_stats(self) -> Dict[str, int]:
+        """获取累计调用次数与token用量"""
+        return dict(self.usage_stats)
+    
+    def get_call_stats(self) -> Dict[str, Any]:
+        """获取请求合并与响应缓存统计"""
+        stats = dict(self.call_stats)
+        stats['inflight'] = len(self._inflight)
+        stats['response_cache'] = self._response_cache.get_stats() if self._response_cache else None
+        stats['batching'] = self._batcher.get_stats() if self._batcher else None
+        return stats
+    
     async def cleanup(self):
         """清理资源"""
+        if self._batcher:
+            await self._batcher.close()
         if self.session:
             await self.session.close()
             self.session = None
@@ -100,10 +298,27 @@ class NLUEngine:
         self.llm: Optional[CustomLLM] = None
         self.duckling_url = settings.DUCKLING_URL if hasattr(settings, 'DUCKLING_URL') else None
         self._initialized = False
-        self._intent_cache: Dict[str, Intent] = {}
+        # 意图名 -> 意图快照（只读，随目录快照整体替换）
+        self._intent_cache: Dict[str, IntentSnapshot] = {}
+        # 当前编译结果对应的目录快照
+        self._catalog_snapshot: Optional[CatalogSnapshot] = None
         self._session: Optional[aiohttp.ClientSession] = None
         self.confidence_manager = ConfidenceManager(settings)
         self._keywords_cache: Optional[Dict[str, List[str]]] = None
+        # 关键词映射的版本号，每次重新加载关键词时递增
+        self._keywords_version = 0
+        # 已加载意图的版本键（意图名 + 更新时间）
+        self._catalog_key: IntentVersionKey = ()
+        # 已加载意图的编译型规则匹配器，在意图或关键词加载/刷新时构建
+        self._rule_matcher: Optional[CompiledIntentMatcher] = None
+        # 调用方传入的其他意图集合的匹配器，按 (关键词版本, 意图版本键) 缓存
+        self._rule_matchers: Dict[tuple, CompiledIntentMatcher] = {}
+        # 活跃意图的槽位定义（融合NLU模式的提示词使用）
+        self._slot_definitions_cache: Dict[str, List[Dict[str, Any]]] = {}
+        # 预编译的提示词片段：意图目录前缀在意图/槽位配置加载时构建，与 _catalog_key 对应
+        self._prompt_fragments = PromptFragmentCache()
+        self._catalog_prefixes: Dict[str, str] = {}
+        self._fused_slot_sections: Dict[str, str] = {}
     
     async def initialize(self):
         """初始化NLU引擎"""
@@ -115,7 +330,11 @@ class NLUEngine:
                 if not api_url.endswith('/chat/completions'):
                     api_url = api_url.rstrip('/') + '/chat/completions'
                 
-                self.llm = CustomLLM(api_url, settings.LLM_API_KEY or "EMPTY")
+                hedge_api_url = settings.LLM_HEDGE_API_BASE
+                if hedge_api_url and not hedge_api_url.endswith('/chat/completions'):
+                    hedge_api_url = hedge_api_url.rstrip('/') + '/chat/completions'
+                
+                self.llm = CustomLLM(api_url, settings.LLM_API_KEY or "EMPTY", hedge_api_url)
                 logger.info(f"LLM初始化完成 - 连接到: {api_url}")
                 
                 # 测试连接
@@ -128,11 +347,11 @@ class NLUEngine:
             timeout = aiohttp.ClientTimeout(total=30)
             self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
             
-            # 加载意图缓存
-            await self._load_intent_cache()
-            
             # 预加载关键词缓存
-            self._keywords_cache = await self._load_intent_keywords_from_db()
+            self._set_intent_keywords(await self._load_intent_keywords_from_db())
+            
+            # 加载意图缓存（同时编译规则匹配器和提示词模板）
+            await self._load_intent_cache()
             
             self._initialized = True
             logger.info("NLU引擎初始化完成")
@@ -151,18 +370,50 @@ class NLUEngine:
             self._session = None
     
     async def _load_intent_cache(self):
-        """加载意图缓存"""
+        """加载意图缓存：构建意图与槽位目录快照，热路径只读取快照"""
         try:
-            intents = Intent.select().where(Intent.is_active == True)
-            self._intent_cache.clear()
-            
-            for intent in intents:
-                self._intent_cache[intent.intent_name] = intent
-            
-            logger.info(f"加载了{len(self._intent_cache)}个意图到缓存")
-            
+            snapshot = load_catalog_snapshot()
+            set_catalog_snapshot(snapshot)
         except Exception as e:
             logger.error(f"加载意图缓存失败: {str(e)}")
+            return
+        
+        self._apply_catalog_snapshot(snapshot)
+    
+    def _sync_catalog_snapshot(self):
+        """目录快照已随意图配置版本更新（见 ensure_catalog_snapshot）时，切换到新快照并重新编译"""
+        snapshot = get_catalog_snapshot()
+        if snapshot is not None and snapshot is not self._catalog_snapshot:
+            self._apply_catalog_snapshot(snapshot)
+    
+    def _apply_catalog_snapshot(self, snapshot: CatalogSnapshot):
+        """使用目录快照替换已加载的意图和槽位定义，并编译规则匹配器和提示词模板"""
+        self._catalog_snapshot = snapshot
+        self._intent_cache = dict(snapshot.intents)
+        self._slot_definitions_cache = {
+            intent_name: [
+                {
+                    'slot_name': slot.slot_name,
+                    'slot_type': slot.slot_type,
+                    'is_required': slot.is_required,
+                    'description': slot.display_name or ''
+                }
+                for slot in intent.slots
+            ]
+            for intent_name, intent in snapshot.intents.items()
+            if intent.slots
+        }
+        self._catalog_key = build_intent_version_key(self._intent_cache)
+        self._compile_rule_matcher()
+        self._compile_prompt_templates()
+        logger.info(f"加载了{len(self._intent_cache)}个意图到缓存")
+    
+    def _set_intent_keywords(self, keywords: Optional[Dict[str, List[str]]]):
+        """替换关键词映射，已编译的规则匹配器随之重建"""
+        self._keywords_cache = keywords
+        self._keywords_version += 1
+        if self._rule_matcher is not None:
+            self._compile_rule_matcher()
     
     async def _load_intent_keywords_from_db(self) -> Dict[str, List[str]]:
         """从数据库加载意图关键词映射"""
@@ -263,9 +514,7 @@ class NLUEngine:
         try:
             if not self._initialized:
                 await self.initialize()
-            
-            # 构建意图识别提示
-            prompt = await self._build_intent_prompt(user_input, active_intents, context)
+            self._sync_catalog_snapshot()
             
             # 获取多种置信度计算
             llm_confidence = None
@@ -273,13 +522,26 @@ class NLUEngine:
             
             # 调用LLM进行意图识别
             if self.llm:
-                llm_response = await self.llm._acall(
-                    prompt, 
-                    model=settings.LLM_MODEL,
-                    temperature=settings.LLM_TEMPERATURE,
-                    max_tokens=settings.LLM_MAX_TOKENS
-                )
-                result = await self._parse_llm_response(llm_response, user_input)
+                result = None
+                if settings.NLU_FUSED_MODE:
+                    # 融合模式：一次调用同时得到意图、实体和候选意图的槽位
+                    result = await self._recognize_intent_fused(user_input, active_intents, context)
+                
+                if result is None:
+                    # 构建意图识别提示
+                    prompt = await self._build_intent_prompt(user_input, active_intents, context)
+                    if settings.NLU_STREAMING_MODE and hasattr(self.llm, 'astream'):
+                        # 流式模式：意图和置信度一旦可解析即提前判定
+                        result = await self._recognize_intent_streaming(prompt, user_input)
+                
+                if result is None:
+                    llm_response = await self.llm._acall(
+                        prompt, 
+                        model=settings.LLM_MODEL,
+                        temperature=settings.LLM_TEMPERATURE,
+                        max_tokens=settings.LLM_MAX_TOKENS
+                    )
+                    result = await self._parse_llm_response(llm_response, user_input)
                 
                 # 如果LLM调用失败，回退到规则匹配
                 if (result.intent == 'unknown' and result.confidence == 0.0 and 
@@ -353,65 +615,49 @@ class NLUEngine:
     
     async def _build_intent_prompt(self, user_input: str, active_intents: List = None, 
                                   context: Optional[Dict] = None) -> str:
-        """构建意图识别提示"""
-        # 获取意图描述 - 优先使用传入的活跃意图列表
-        intent_descriptions = []
-        intents_to_use = {}
-        
+        """构建意图识别提示（预编译的固定前缀 + 上下文与用户输入）"""
+        # 优先使用传入的活跃意图列表
         if active_intents:
-            # 使用传入的活跃意图列表
-            for intent in active_intents:
-                intents_to_use[intent.intent_name] = intent
+            intents = {intent.intent_name: intent for intent in active_intents}
         else:
-            # 使用缓存的意图
-            intents_to_use = self._intent_cache
-        
-        for intent_name, intent in intents_to_use.items():
-            description = f"- {intent_name}: {intent.description}"
-            
-            # 添加示例
-            examples = intent.get_examples()
-            if examples:
-                examples_text = ", ".join([f'"{ex}"' for ex in examples[:3]])  # 只取前3个
-                description += f" (示例: {examples_text})"
-            
-            intent_descriptions.append(description)
-        
-        intents_text = "\n".join(intent_descriptions)
-        
-        # 构建上下文信息
-        context_text = ""
-        if context:
-            context_text = f"对话上下文：{safe_json_dumps(context, ensure_ascii=False)}\n"
-        
-        prompt = f"""你是一个智能意图识别助手。请分析用户输入的文本，识别其真实意图。
-
-        可用的意图类别：
-        {intents_text}
-
-        {context_text}
-        用户输入："{user_input}"
-
-        请分析用户的真实意图，并返回JSON格式的结果：
-        {{
-            "intent": "意图名称",
-            "confidence": 0.95,
-            "reasoning": "识别理由",
-            "alternatives": [
-                {{"intent": "备选意图1", "confidence": 0.8}},
-                {{"intent": "备选意图2", "confidence": 0.6}}
-            ]
-        }}
-
-        要求：
-        1. confidence值应该在0-1之间，表示识别的置信度
-        2. 如果无法确定意图，返回"unknown"
-        3. reasoning要简要说明识别理由
-        4. alternatives最多返回3个备选意图，按置信度降序排列
-        5. 只返回JSON，不要其他文字
+            intents = self._intent_cache
+        prefix = self._get_catalog_prefix('intent', intents)
+        return prefix + render_request_suffix([], self._format_context(context), user_input)
+    
+    def _compile_prompt_templates(self):
+        """按当前意图和槽位配置预编译提示词片段"""
+        self._prompt_fragments.clear()
+        intents = list(self._intent_cache.values())
+        self._catalog_prefixes = {
+            'intent': self._prompt_fragments.intent_prompt_prefix(intents),
+            'fused': self._prompt_fragments.fused_prompt_prefix(intents)
+        }
+        self._fused_slot_sections = {
+            intent_name: f"{intent_name}:\n" + self._prompt_fragments.slot_schema(slot_definitions, indent='  ')
+            for intent_name, slot_definitions in self._slot_definitions_cache.items()
+            if slot_definitions
+        }
+        logger.debug(f"提示词模板已编译: {len(intents)}个意图, {len(self._fused_slot_sections)}个槽位定义")
+    
+    def _get_catalog_prefix(self, kind: str, intents: Dict[str, Intent]) -> str:
         """
-        
-        return prompt
+        获取意图目录提示词前缀：意图集合与已加载的意图版本一致（意图名和更新时间均相同）时
+        直接使用预编译结果，否则按内容渲染（片段缓存以可见内容为键，意图编辑后不会复用旧文本）
+        """
+        prefix = self._catalog_prefixes.get(kind)
+        if prefix is not None and (intents is self._intent_cache or
+                                   build_intent_version_key(intents) == self._catalog_key):
+            return prefix
+        if kind == 'fused':
+            return self._prompt_fragments.fused_prompt_prefix(intents.values())
+        return self._prompt_fragments.intent_prompt_prefix(intents.values())
+    
+    @staticmethod
+    def _format_context(context: Optional[Dict]) -> str:
+        """渲染对话上下文"""
+        if not context:
+            return ""
+        return f"对话上下文：{safe_json_dumps(context, ensure_ascii=False)}\n"
     
     async def _parse_llm_response(self, llm_response: str, user_input: str) -> IntentRecognitionResult:
         """解析LLM响应"""
@@ -426,25 +672,7 @@ class NLUEngine:
             # 解析JSON
             result_data = json.loads(response_text)
             
-            intent = result_data.get('intent', 'unknown')
-            confidence = float(result_data.get('confidence', 0.0))
-            reasoning = result_data.get('reasoning', '')
-            alternatives = result_data.get('alternatives', [])
-            
-            # 验证意图是否存在（检查缓存中的所有意图）
-            if intent != 'unknown' and intent not in self._intent_cache:
-                logger.warning(f"LLM返回了未知意图: {intent}")
-                intent = 'unknown'
-                confidence = 0.0
-                reasoning += " (意图不在预定义列表中)"
-            
-            return IntentRecognitionResult.from_nlu_result(
-                intent_name=intent,
-                confidence=confidence,
-                alternatives=alternatives,
-                reasoning=reasoning,
-                user_input=user_input
-            )
+            return self._build_intent_result(result_data, user_input)
             
         except json.JSONDecodeError as e:
             logger.error(f"LLM响应JSON解析失败: {e}, 响应: {llm_response}")
@@ -463,6 +691,198 @@ class NLUEngine:
                 user_input=user_input
             )
     
+    def _build_intent_result(self, result_data: Dict[str, Any], user_input: str) -> IntentRecognitionResult:
+        """由LLM输出的意图字段构建识别结果"""
+        intent = result_data.get('intent', 'unknown')
+        confidence = float(result_data.get('confidence', 0.0))
+        reasoning = result_data.get('reasoning', '')
+        alternatives = result_data.get('alternatives', [])
+        
+        # 验证意图是否存在（检查缓存中的所有意图）
+        if intent != 'unknown' and intent not in self._intent_cache:
+            logger.warning(f"LLM返回了未知意图: {intent}")
+            intent = 'unknown'
+            confidence = 0.0
+            reasoning += " (意图不在预定义列表中)"
+        
+        return IntentRecognitionResult.from_nlu_result(
+            intent_name=intent,
+            confidence=confidence,
+            alternatives=alternatives,
+            reasoning=reasoning,
+            user_input=user_input
+        )
+    
+    async def _recognize_intent_streaming(self, prompt: str, user_input: str) -> Optional[IntentRecognitionResult]:
+        """流式意图识别
+        
+        顶层的 intent 和 confidence 字段完整输出后，若置信度达到提前判定阈值则立即取消剩余生成；
+        置信度较低时继续读完整个输出，以保留备选意图供歧义检测使用。
+        
+        Returns:
+            Optional[IntentRecognitionResult]: 识别结果，流式调用失败时返回None（由调用方改用非流式调用）
+        """
+        scanner = IncrementalJSONFieldScanner()
+        chunks: List[str] = []
+        started_at = time.perf_counter()
+        
+        try:
+            async with aclosing(self.llm.astream(
+                prompt,
+                model=settings.LLM_MODEL,
+                temperature=settings.LLM_TEMPERATURE,
+                max_tokens=settings.LLM_MAX_TOKENS
+            )) as stream:
+                async for delta in stream:
+                    chunks.append(delta)
+                    fields = scanner.feed(delta)
+                    
+                    intent = fields.get('intent')
+                    confidence = fields.get('confidence')
+                    if (isinstance(intent, str) and isinstance(confidence, (int, float)) and
+                            not isinstance(confidence, bool) and
+                            confidence >= settings.NLU_STREAM_EARLY_STOP_CONFIDENCE):
+                        logger.debug(f"流式意图提前判定: {intent} ({confidence}), "
+                                     f"耗时 {(time.perf_counter() - started_at) * 1000:.1f}ms")
+                        return self._build_intent_result({
+                            'intent': intent,
+                            'confidence': confidence,
+                            'reasoning': fields.get('reasoning') or '流式输出提前判定',
+                            'alternatives': []
+                        }, user_input)
+        except Exception as e:
+            logger.warning(f"流式意图识别失败，改用非流式调用: {str(e)}")
+            return None
+        
+        return await self._parse_llm_response(''.join(chunks), user_input)
+    
+    async def _recognize_intent_fused(self, user_input: str, active_intents: List = None,
+                                      context: Optional[Dict] = None) -> Optional[IntentRecognitionResult]:
+        """融合NLU：一次LLM调用完成意图识别、实体提取和候选意图的槽位提取
+        
+        Duckling与规则实体和LLM调用并发提取，完成后与LLM实体合并；槽位和实体结果写入请求级上下文，
+        同一轮次内的extract_slots和extract_entities直接复用；
+        响应不是合法JSON时返回None，由调用方回退到独立的意图识别调用
+        
+        Args:
+            user_input: 用户输入文本
+            active_intents: 活跃意图列表
+            context: 对话上下文
+            
+        Returns:
+            Optional[IntentRecognitionResult]: 意图识别结果
+        """
+        intents_to_use = {}
+        if active_intents:
+            for intent in active_intents:
+                intents_to_use[intent.intent_name] = intent
+        else:
+            intents_to_use = self._intent_cache
+        
+        candidates = self._select_fused_candidates(user_input, intents_to_use)
+        candidate_slots = {name: self._slot_definitions_cache.get(name, []) for name in candidates}
+        
+        # Duckling与规则实体不依赖LLM，与LLM调用并发提取，不进入关键路径
+        base_task = asyncio.create_task(self.extract_entities_with_metadata(user_input, use_llm=False))
+        try:
+            prompt = self._build_fused_prompt(user_input, intents_to_use, candidate_slots, context)
+            llm_response = await self.llm._acall(
+                prompt,
+                model=settings.LLM_MODEL,
+                temperature=settings.LLM_TEMPERATURE,
+                max_tokens=settings.LLM_MAX_TOKENS
+            )
+            if llm_response.startswith("Error:"):
+                # LLM本身不可用，交给上层的规则匹配回退处理
+                return await self._parse_llm_response(llm_response, user_input)
+            
+            try:
+                fused_data = json.loads(self._strip_json_fence(llm_response))
+            except (json.JSONDecodeError, TypeError):
+                fused_data = None
+            if not isinstance(fused_data, dict):
+                logger.warning("融合NLU响应格式错误，回退到独立意图识别调用")
+                return None
+            
+            result = await self._parse_llm_response(llm_response, user_input)
+            base_entities = (await base_task)['entities']
+        finally:
+            if not base_task.done():
+                base_task.cancel()
+        
+        # 实体：LLM实体校验后与Duckling/规则实体一起合并过滤
+        llm_entities = []
+        for entity in fused_data.get('entities') or []:
+            if isinstance(entity, dict) and self._validate_llm_entity(entity, user_input):
+                entity['source'] = 'llm'
+                entity['confidence'] = max(0.5, min(0.95, float(entity.get('confidence', 0.8))))
+                llm_entities.append(entity)
+        entities = base_entities + llm_entities
+        if entities:
+            entities = self._filter_low_quality_entities(self._merge_entities(entities))
+        
+        # 槽位：只保留识别出的意图在提示词中给出定义的槽位
+        slot_names = None
+        slots = {}
+        if result.intent_name in candidate_slots:
+            slot_definitions = candidate_slots[result.intent_name]
+            slot_names = frozenset(slot_def['slot_name'] for slot_def in slot_definitions)
+            raw_slots = fused_data.get('slots')
+            slots = {
+                slot_name: slot_info
+                for slot_name, slot_info in (raw_slots.items() if isinstance(raw_slots, dict) else [])
+                if slot_name in slot_names and slot_info is not None
+            }
+        
+        prime_request_memo('fused_nlu', user_input.strip(), {
+            'intent': result.intent_name,
+            'slot_names': slot_names,
+            'slots': slots,
+            'entities': entities
+        })
+        logger.info(f"融合NLU完成: {result.intent_name}, 槽位={list(slots)}, 实体={len(entities)}个")
+        
+        return result
+    
+    def _select_fused_candidates(self, user_input: str, intents: Dict[str, Intent]) -> List[str]:
+        """按规则匹配得分选出需要在融合提示词中附带槽位定义的候选意图"""
+        limit = settings.NLU_FUSED_SLOT_CANDIDATES
+        scores = self._get_rule_matcher(intents).score(user_input)
+        ranked = sorted((name for name, score in scores.items() if score > 0),
+                        key=lambda name: scores[name], reverse=True)
+        return ranked[:limit] if ranked else list(intents)[:limit]
+    
+    def _build_fused_prompt(self, user_input: str, intents: Dict[str, Intent],
+                            candidate_slots: Dict[str, List[Dict[str, Any]]],
+                            context: Optional[Dict] = None) -> str:
+        """构建融合NLU提示（意图+实体+槽位）"""
+        prefix = self._get_catalog_prefix('fused', intents)
+        
+        slot_sections = []
+        for intent_name, slot_definitions in candidate_slots.items():
+            if not slot_definitions:
+                continue
+            section = self._fused_slot_sections.get(intent_name)
+            if section is None or slot_definitions is not self._slot_definitions_cache.get(intent_name):
+                section = f"{intent_name}:\n" + self._prompt_fragments.slot_schema(slot_definitions, indent='  ')
+            slot_sections.append(section)
+        slots_text = "\n".join(slot_sections) if slot_sections else "（无）"
+        
+        return (prefix + f"候选意图的槽位定义：\n{slots_text}\n\n" +
+                render_request_suffix([], self._format_context(context), user_input))
+    
+    @staticmethod
+    def _strip_json_fence(llm_response: str) -> str:
+        """去除LLM响应中的Markdown代码块标记"""
+        response_text = llm_response.strip()
+        if response_text.startswith("```json"):
+            response_text = response_text[7:]
+        elif response_text.startswith("```"):
+            response_text = response_text[3:]
+        if response_text.endswith("```"):
+            response_text = response_text[:-3]
+        return response_text.strip()
+    
     def _calculate_context_confidence(self, intent_name: str, context: Dict) -> float:
         """
         计算基于上下文的置信度
@@ -527,10 +947,6 @@ class NLUEngine:
                                            active_intents: List = None) -> IntentRecognitionResult:
         """基于规则的意图识别（模拟模式）"""
         try:
-            user_input_lower = user_input.lower()
-            best_match = None
-            best_score = 0.0
-            
             # 确定要匹配的意图范围
             intents_to_match = {}
             if active_intents:
@@ -539,102 +955,12 @@ class NLUEngine:
             else:
                 intents_to_match = self._intent_cache
             
-            # 改进的关键词匹配
-            for intent_name, intent in intents_to_match.items():
-                score = 0.0
-                matched_keywords = []
-                
-                # 检查意图名称匹配
-                if intent_name.lower() in user_input_lower:
-                    score += 0.8
-                    matched_keywords.append(f"intent_name:{intent_name}")
-                
-                # 检查描述关键词匹配
-                if intent.description:
-                    desc_words = intent.description.lower().split()
-                    for word in desc_words:
-                        if len(word) > 2 and word in user_input_lower:
-                            score += 0.2
-                            matched_keywords.append(f"desc:{word}")
-                
-                # 改进的示例匹配 - 优先完全匹配，然后才是关键词匹配
-                examples = intent.get_examples()
-                for example_text in examples[:10]:  # 限制处理数量
-                    example_lower = example_text.lower()
-                    
-                    # 完全匹配或高度相似匹配得更高分
-                    if user_input_lower == example_lower:
-                        score += 1.0  # 完全匹配得最高分
-                        matched_keywords.append(f"exact_match:{example_text}")
-                    elif user_input_lower in example_lower or example_lower in user_input_lower:
-                        # 包含关系匹配，但要区分方向
-                        if user_input_lower in example_lower:
-                            # 用户输入是示例的子串（较不准确）
-                            score += 0.3
-                            matched_keywords.append(f"partial_in_example:{example_text}")
-                        else:
-                            # 示例是用户输入的子串（较准确）
-                            score += 0.6
-                            matched_keywords.append(f"example_in_input:{example_text}")
-                    else:
-                        # 分词匹配，只有关键特征词才计分
-                        example_words = example_lower.split()
-                        user_words = user_input_lower.split()
-                        
-                        # 使用缓存的关键词权重策略
-                        keywords_mapping = self._keywords_cache or {}
-                        
-                        # 分离不同类型的关键词
-                        core_nouns = {}
-                        action_verbs = []
-                        
-                        for keyword, intents in keywords_mapping.items():
-                            core_nouns[keyword] = intents
-                            # 基于常见动词模式判断
-                            if keyword in ['订', '预订', '购买', '买', '查询', '查', '看']:
-                                if keyword not in action_verbs:
-                                    action_verbs.append(keyword)
-                        
-                        # 无意义词过滤
-                        common_words = ['我', '想', '要', '帮', '的', '了', '吗', '呢', '吧', '一张', '一个']
-                        
-                        # 首先检查用户输入中是否包含核心名词（支持复合词）
-                        user_input_has_core_noun = False
-                        for core_noun, target_intents in core_nouns.items():
-                            if core_noun in user_input_lower:
-                                if intent_name in target_intents:
-                                    score += 2.0  # 用户输入直接包含匹配的核心名词，给予最高分
-                                    matched_keywords.append(f"direct_core_match:{core_noun}")
-                                    user_input_has_core_noun = True
-                                else:
-                                    score -= 1.0  # 用户输入包含其他意图的核心名词，大幅扣分
-                                    matched_keywords.append(f"direct_core_mismatch:{core_noun}")
-                        
-                        # 然后检查示例词匹配
-                        for word in example_words:
-                            if len(word) > 1 and word in user_words and word not in common_words:
-                                # 检查是否为核心名词，且是否匹配正确的意图类型
-                                if word in core_nouns:
-                                    if intent_name in core_nouns[word]:
-                                        score += 0.8  # 示例中核心名词匹配正确意图
-                                        matched_keywords.append(f"example_core_match:{word}")
-                                    else:
-                                        score -= 0.3  # 示例中核心名词不匹配意图，轻微扣分
-                                        matched_keywords.append(f"example_core_mismatch:{word}")
-                                elif word in action_verbs:
-                                    score += 0.2  # 动词中等分
-                                    matched_keywords.append(f"action_verb:{word}")
-                                else:
-                                    score += 0.1  # 其他词低分
-                                    matched_keywords.append(f"normal_word:{word}")
-                
-                # 记录匹配信息用于调试
-                if score > 0:
-                    logger.info(f"规则匹配 - 意图 {intent_name} 得分: {score:.3f}, 匹配关键词: {matched_keywords}")
-                
-                if score > best_score:
-                    best_score = score
-                    best_match = intent_name
+            # 使用编译好的匹配器对所有意图单次打分
+            matcher = self._get_rule_matcher(intents_to_match)
+            best_match, best_score, scores = matcher.best_match(user_input)
+            
+            # 记录匹配信息用于调试
+            logger.debug(f"规则匹配得分: { {name: round(score, 3) for name, score in scores.items() if score > 0} }")
             
             # 设置阈值
             if best_score < 0.3:
@@ -662,6 +988,33 @@ class NLUEngine:
                 user_input=user_input
             )
     
+    def _compile_rule_matcher(self):
+        """按已加载的意图和当前关键词编译规则匹配器"""
+        self._rule_matchers.clear()
+        self._rule_matcher = CompiledIntentMatcher(self._intent_cache, self._keywords_cache)
+        logger.debug(f"规则匹配器已编译: {len(self._intent_cache)}个意图")
+    
+    def _get_rule_matcher(self, intents: Dict[str, Intent]) -> CompiledIntentMatcher:
+        """获取与意图集合一致的编译型规则匹配器：已加载的意图直接使用预编译结果，其他集合按版本键缓存"""
+        if self._rule_matcher is None:
+            self._compile_rule_matcher()
+        if intents is self._intent_cache:
+            return self._rule_matcher
+        
+        intent_key = build_intent_version_key(intents)
+        if intent_key == self._catalog_key:
+            return self._rule_matcher
+        
+        key = (self._keywords_version, intent_key)
+        matcher = self._rule_matchers.get(key)
+        if matcher is None:
+            if len(self._rule_matchers) >= MAX_RULE_MATCHERS:
+                self._rule_matchers.pop(next(iter(self._rule_matchers)))
+            matcher = CompiledIntentMatcher(intents, self._keywords_cache)
+            self._rule_matchers[key] = matcher
+            logger.debug(f"规则匹配器已编译: {len(intents)}个意图")
+        return matcher
+    
     async def extract_entities(self, text: str, entity_types: List[str] = None,
                              use_duckling: bool = True, use_llm: bool = True) -> List[Dict[str, Any]]:
         """提取文本中的实体
@@ -675,39 +1028,85 @@ class NLUEngine:
         Returns:
             List[Dict]: 实体列表
         """
+        if entity_types is None and use_duckling and use_llm:
+            # 融合NLU模式下，本轮意图识别已一并提取并合并了全部来源的实体
+            fused = peek_request_memo('fused_nlu', text.strip())
+            if fused:
+                return list(fused['entities'])
+        
+        result = await self.extract_entities_with_metadata(text, entity_types, use_duckling, use_llm)
+        return result['entities']
+    
+    async def extract_entities_with_metadata(self, text: str, entity_types: List[str] = None,
+                                             use_duckling: bool = True, use_llm: bool = True,
+                                             deadline: Optional[float] = None) -> Dict[str, Any]:
+        """并发提取文本中的实体，并返回各来源的耗时信息
+        
+        Duckling、LLM和规则提取并发执行，各自有独立的超时预算；
+        到达总截止时间时返回已完成来源的结果，未完成的来源被取消
+        
+        Args:
+            text: 输入文本
+            entity_types: 要提取的实体类型列表
+            use_duckling: 是否使用Duckling
+            use_llm: 是否使用LLM
+            deadline: 总截止时间（秒），默认使用ENTITY_EXTRACTION_DEADLINE
+            
+        Returns:
+            Dict: {'entities': 实体列表, 'metadata': {'sources': 各来源状态/数量/耗时, 'elapsed_ms', 'deadline_ms'}}
+        """
+        deadline = deadline if deadline is not None else settings.ENTITY_EXTRACTION_DEADLINE
+        metadata: Dict[str, Any] = {'sources': {}, 'elapsed_ms': 0.0, 'deadline_ms': round(deadline * 1000, 3)}
+        
         try:
             if not text or not text.strip():
-                return []
+                return {'entities': [], 'metadata': metadata}
             
-            entities = []
+            started_at = time.perf_counter()
             
-            # 使用Duckling提取结构化实体
+            # 按Duckling、LLM、规则的顺序登记来源，合并时保持该顺序
+            sources = []
             if use_duckling and self.duckling_url:
-                try:
-                    duckling_dims = self._get_duckling_dims_for_types(entity_types)
-                    duckling_entities = await self._extract_duckling_entities(text, duckling_dims)
-                    entities.extend(duckling_entities)
-                    logger.debug(f"Duckling提取了 {len(duckling_entities)} 个实体")
-                except Exception as e:
-                    logger.warning(f"Duckling实体提取异常: {str(e)}")
-            
-            # 使用LLM提取命名实体
+                duckling_dims = self._get_duckling_dims_for_types(entity_types)
+                sources.append(('duckling', self._extract_duckling_entities(text, duckling_dims),
+                                settings.DUCKLING_TIMEOUT))
             if use_llm and self.llm:
-                try:
-                    llm_types = self._get_llm_types_for_extraction(entity_types)
-                    llm_entities = await self._extract_llm_entities(text, llm_types)
-                    entities.extend(llm_entities)
-                    logger.debug(f"LLM提取了 {len(llm_entities)} 个实体")
-                except Exception as e:
-                    logger.warning(f"LLM实体提取异常: {str(e)}")
-            
+                llm_types = self._get_llm_types_for_extraction(entity_types)
+                sources.append(('llm', self._extract_llm_entities(text, llm_types),
+                                settings.LLM_ENTITY_TIMEOUT))
             # 规则匹配（针对特定业务实体）
+            sources.append(('rule', self._extract_rule_based_entities(text, entity_types),
+                            settings.RULE_ENTITY_TIMEOUT))
+            
+            tasks = [
+                asyncio.create_task(self._run_entity_source(name, coroutine, timeout))
+                for name, coroutine, timeout in sources
+            ]
             try:
-                rule_entities = await self._extract_rule_based_entities(text, entity_types)
-                entities.extend(rule_entities)
-                logger.debug(f"规则匹配了 {len(rule_entities)} 个实体")
-            except Exception as e:
-                logger.warning(f"规则实体提取异常: {str(e)}")
+                done, pending = await asyncio.wait(tasks, timeout=deadline)
+            except asyncio.CancelledError:
+                for task in tasks:
+                    task.cancel()
+                raise
+
+            if pending:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+            
+            entities = []
+            for (name, _, _), task in zip(sources, tasks):
+                if task in done:
+                    source_entities, source_metadata = task.result()
+                    entities.extend(source_entities)
+                else:
+                    source_metadata = {
+                        'status': 'deadline_exceeded',
+                        'count': 0,
+                        'elapsed_ms': round((time.perf_counter() - started_at) * 1000, 3)
+                    }
+                    logger.warning(f"{name}实体提取未在总截止时间内完成({deadline}s)，已取消")
+                metadata['sources'][name] = source_metadata
             
             # 合并和去重
             if entities:
@@ -716,12 +1115,36 @@ class NLUEngine:
                 # 过滤低质量实体
                 entities = self._filter_low_quality_entities(entities)
             
-            logger.info(f"实体提取完成: '{text[:50]}...' -> {len(entities)} 个实体")
-            return entities
+            metadata['elapsed_ms'] = round((time.perf_counter() - started_at) * 1000, 3)
+            logger.info(f"实体提取完成: '{text[:50]}...' -> {len(entities)} 个实体, "
+                        f"耗时: {metadata['elapsed_ms']}ms, 来源: {metadata['sources']}")
+            return {'entities': entities, 'metadata': metadata}
             
         except Exception as e:
             logger.error(f"实体提取失败: {str(e)}")
-            return []
+            return {'entities': [], 'metadata': metadata}
+    
+    async def _run_entity_source(self, name: str, coroutine,
+                                 timeout: float) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """在独立超时预算内执行单个实体提取来源"""
+        started_at = time.perf_counter()
+        entities: List[Dict[str, Any]] = []
+        try:
+            entities = await asyncio.wait_for(coroutine, timeout=timeout)
+            status = 'ok'
+            logger.debug(f"{name}提取了 {len(entities)} 个实体")
+        except asyncio.TimeoutError:
+            status = 'timeout'
+            logger.warning(f"{name}实体提取超时({timeout}s)")
+        except Exception as e:
+            status = 'error'
+            logger.warning(f"{name}实体提取异常: {str(e)}")
+        
+        return entities, {
+            'status': status,
+            'count': len(entities),
+            'elapsed_ms': round((time.perf_counter() - started_at) * 1000, 3)
+        }
     
     def _get_duckling_dims_for_types(self, entity_types: List[str] = None) -> List[str]:
         """根据实体类型获取Duckling维度"""
@@ -1020,7 +1443,7 @@ class NLUEngine:
                 'dims': safe_json_dumps(dims)
             }
             
-            async with self._session.post(
+            async with upstream_permit('duckling') as permit, self._session.post(
                 f"{self.duckling_url}/parse",
                 data=data,
                 timeout=aiohttp.ClientTimeout(total=10)
@@ -1050,6 +1473,8 @@ class NLUEngine:
                     logger.debug(f"Duckling提取到 {len(entities)} 个实体")
                     return entities
                 else:
+                    if response.status == 429 or response.status >= 500:
+                        permit.mark_dropped()
                     error_text = await response.text()
                     logger.warning(f"Duckling请求失败: {response.status}, {error_text}")
                     return []
@@ -1057,6 +1482,9 @@ class NLUEngine:
         except asyncio.TimeoutError:
             logger.warning("Duckling请求超时")
             return []
+        except ConcurrencyLimitExceeded as e:
+            logger.warning(f"Duckling请求被拒绝: {e.reason}")
+            return []
         except Exception as e:
             logger.error(f"Duckling实体提取失败: {str(e)}")
             return []
@@ -1438,6 +1866,12 @@ class NLUEngine:
             if not slot_definitions:
                 return {}
             
+            # 融合NLU模式下，本轮意图识别已一并提取了该意图的槽位
+            fused_slots = self._get_fused_slots(text, slot_definitions)
+            if fused_slots is not None:
+                logger.info(f"复用融合NLU槽位提取结果: {fused_slots}")
+                return fused_slots
+            
             # 首先提取所有实体
             entities = await self.extract_entities(text)
             
@@ -1460,29 +1894,21 @@ class NLUEngine:
             logger.error(f"槽位提取失败: {str(e)}")
             return {}
     
+    def _get_fused_slots(self, text: str, slot_definitions: List[Dict]) -> Optional[Dict[str, Any]]:
+        """获取本轮融合NLU调用提取的槽位，槽位定义不一致（意图已变化）时返回None"""
+        fused = peek_request_memo('fused_nlu', text.strip())
+        if not fused:
+            return None
+        
+        requested = {slot_def['slot_name'] for slot_def in slot_definitions}
+        if fused['slot_names'] is None or requested != fused['slot_names']:
+            return None
+        return dict(fused['slots'])
+    
     async def _build_slots_prompt(self, text: str, slot_definitions: List[Dict],
                                 entities: List[Dict], context: Optional[Dict] = None) -> str:
-        """构建槽位提取提示"""
-        # 构建槽位定义描述
-        slots_desc = []
-        for slot_def in slot_definitions:
-            desc = f"- {slot_def['slot_name']} ({slot_def['slot_type']}): {slot_def.get('description', '')}"
-            if slot_def.get('is_required'):
-                desc += " [必需]"
-            slots_desc.append(desc)
-        
-        slots_text = "\n".join(slots_desc)
-        
-        # 构建已识别实体信息
-        entities_text = ""
-        if entities:
-            entities_desc = [f"- {e['entity']}: {e['value']} ({e['text']})" for e in entities]
-            entities_text = f"已识别的实体：\n" + "\n".join(entities_desc) + "\n"
-        
-        # 构建上下文信息
-        context_text = ""
-        if context:
-            context_text = f"对话上下文：{safe_json_dumps(context, ensure_ascii=False)}\n"
+        """构建槽位提取提示（按槽位定义预编译的固定前缀 + 实体、已有槽位、上下文与用户输入）"""
+        prefix = self._prompt_fragments.slots_prompt_prefix(slot_definitions)
         
         # 构建已有槽位信息
         existing_slots_text = ""
@@ -1495,44 +1921,7 @@ class NLUEngine:
                     existing_desc.append(f"- {slot_name}: {value}")
                 existing_slots_text = f"已有槽位值：\n" + "\n".join(existing_desc) + "\n"
         
-        prompt = f"""请从用户输入中提取指定的槽位信息。
-
-需要提取的槽位：
-{slots_text}
-
-{entities_text}
-{existing_slots_text}
-{context_text}
-用户输入："{text}"
-
-重要提示：
-- 如果用户提到"往返"、"往返机票"、"来回"，应该提取trip_type为"round_trip"
-- 如果用户提到"返程"、"回来"、"回程"、"回去"等词语，相关时间应该提取为return_date
-- 如果用户提到"出发"、"去程"等词语，相关时间应该提取为departure_date  
-- 如果用户说"三天后回来"，应该只提取return_date，不要提取departure_date
-- 已有槽位值不要重复提取，除非用户明确要修改
-- 如果用户输入中同时包含返程信息（如"回来"），不要覆盖已有的departure_date
-- 优先考虑用户输入的语义和上下文
-
-请分析用户输入，提取相应的槽位值，返回JSON格式：
-{{
-    "槽位名称": {{
-        "value": "提取的值",
-        "confidence": 0.95,
-        "source": "提取来源",
-        "original_text": "原文中的文本"
-    }}
-}}
-
-要求：
-1. 只提取有明确值的槽位
-2. confidence表示提取置信度(0-1)
-3. source可以是"text", "entity", "context"
-4. 如果没有找到任何槽位值，返回空对象 {{}}
-5. 只返回JSON，不要其他文字
-"""
-        
-        return prompt
+        return prefix + render_request_suffix(entities, self._format_context(context), text, existing_slots_text)
     
     async def _parse_slots_response(self, llm_response: str) -> Dict[str, Any]:
         """解析槽位提取响应"""
@@ -1640,7 +2029,8 @@ class NLUEngine:
             return []
     
     async def refresh_intent_cache(self):
-        """刷新意图缓存"""
+        """刷新意图缓存（同时重新加载关键词）"""
+        self._set_intent_keywords(await self._load_intent_keywords_from_db())
         await self._load_intent_cache()
         logger.info("意图缓存已刷新")
     
@@ -0,0 +1,234 @@
+"""
+预编译提示词模板
+意图目录、槽位定义等只随配置变化的内容预先渲染为文本片段并缓存，单次请求只需拼接片段。
+每个提示词按 “固定前缀（说明 + 目录/槽位定义 + 输出格式） + 请求相关后缀（实体、上下文、用户输入）”
+组织，相同配置下前缀逐字节一致，推理服务可以复用前缀的KV缓存。
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+
+from src.utils.lru_cache import LRUTTLCache
+
+# 意图目录中每个意图展示的示例数量
+PROMPT_EXAMPLES_PER_INTENT = 3
+
+INTENT_PROMPT_HEADER = """你是一个智能意图识别助手。请分析用户输入的文本，识别其真实意图。
+
+可用的意图类别：
+"""
+
+INTENT_PROMPT_INSTRUCTIONS = """
+请分析用户的真实意图，并返回JSON格式的结果：
+{
+    "intent": "意图名称",
+    "confidence": 0.95,
+    "reasoning": "识别理由",
+    "alternatives": [
+        {"intent": "备选意图1", "confidence": 0.8},
+        {"intent": "备选意图2", "confidence": 0.6}
+    ]
+}
+
+要求：
+1. confidence值应该在0-1之间，表示识别的置信度
+2. 如果无法确定意图，返回"unknown"
+3. reasoning要简要说明识别理由
+4. alternatives最多返回3个备选意图，按置信度降序排列
+5. 只返回JSON，不要其他文字
+
+"""
+
+SLOTS_PROMPT_HEADER = """请从用户输入中提取指定的槽位信息。
+
+需要提取的槽位：
+"""
+
+SLOTS_PROMPT_INSTRUCTIONS = """
+重要提示：
+- 如果用户提到"往返"、"往返机票"、"来回"，应该提取trip_type为"round_trip"
+- 如果用户提到"返程"、"回来"、"回程"、"回去"等词语，相关时间应该提取为return_date
+- 如果用户提到"出发"、"去程"等词语，相关时间应该提取为departure_date
+- 如果用户说"三天后回来"，应该只提取return_date，不要提取departure_date
+- 已有槽位值不要重复提取，除非用户明确要修改
+- 如果用户输入中同时包含返程信息（如"回来"），不要覆盖已有的departure_date
+- 优先考虑用户输入的语义和上下文
+
+请分析用户输入，提取相应的槽位值，返回JSON格式：
+{
+    "槽位名称": {
+        "value": "提取的值",
+        "confidence": 0.95,
+        "source": "提取来源",
+        "original_text": "原文中的文本"
+    }
+}
+
+要求：
+1. 只提取有明确值的槽位
+2. confidence表示提取置信度(0-1)
+3. source可以是"text", "entity", "context"
+4. 如果没有找到任何槽位值，返回空对象 {}
+5. 只返回JSON，不要其他文字
+
+"""
+
+FUSED_PROMPT_HEADER = """你是一个智能意图识别与信息提取助手。请分析用户输入，一次性完成意图识别、实体提取和槽位提取。
+
+可用的意图类别：
+"""
+
+FUSED_PROMPT_INSTRUCTIONS = """
+重要提示：
+- 如果用户提到"往返"、"往返机票"、"来回"，应该提取trip_type为"round_trip"
+- 如果用户提到"返程"、"回来"、"回程"、"回去"等词语，相关时间应该提取为return_date
+- 如果用户提到"出发"、"去程"等词语，相关时间应该提取为departure_date
+- 已有槽位值不要重复提取，除非用户明确要修改
+
+返回JSON格式：
+{
+    "intent": "意图名称",
+    "confidence": 0.95,
+    "reasoning": "识别理由",
+    "alternatives": [
+        {"intent": "备选意图", "confidence": 0.6}
+    ],
+    "entities": [
+        {"entity": "实体类型", "value": "标准化的实体值", "text": "原文片段", "start": 0, "end": 2, "confidence": 0.85}
+    ],
+    "slots": {
+        "槽位名称": {"value": "提取的值", "confidence": 0.95, "source": "text", "original_text": "原文中的文本"}
+    }
+}
+
+要求：
+1. confidence值在0-1之间；无法确定意图时intent返回"unknown"
+2. alternatives最多3个，按置信度降序排列
+3. entities只包含明确出现在文本中的实体，start/end为准确的字符位置
+4. slots只填写所识别意图在下面给出定义的槽位，且只提取有明确值的槽位，没有则返回空对象 {}
+5. 只返回JSON，不要其他文字
+
+"""
+
+IntentKey = Tuple[str, str, Tuple[str, ...]]
+SlotSchemaKey = Tuple[Tuple[str, str, str, bool], ...]
+
+
+def intent_prompt_key(intent: Any) -> IntentKey:
+    """意图在提示词中可见内容的键"""
+    return (
+        intent.intent_name,
+        intent.description or '',
+        tuple(intent.get_examples()[:PROMPT_EXAMPLES_PER_INTENT])
+    )
+
+
+def slot_schema_key(slot_definitions: Iterable[Dict[str, Any]]) -> SlotSchemaKey:
+    """槽位定义在提示词中可见内容的键"""
+    return tuple(
+        (slot_def['slot_name'], slot_def['slot_type'], slot_def.get('description', '') or '',
+         bool(slot_def.get('is_required')))
+        for slot_def in slot_definitions
+    )
+
+
+def render_intent_line(key: IntentKey) -> str:
+    """渲染意图目录中的一行"""
+    name, description, examples = key
+    line = f"- {name}: {description}"
+    if examples:
+        examples_text = ", ".join(f'"{example}"' for example in examples)
+        line += f" (示例: {examples_text})"
+    return line
+
+
+def render_slot_schema(key: SlotSchemaKey, indent: str = '') -> str:
+    """渲染槽位定义列表"""
+    lines = []
+    for slot_name, slot_type, description, is_required in key:
+        line = f"{indent}- {slot_name} ({slot_type}): {description}"
+        if is_required:
+            line += " [必需]"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_request_suffix(entities: List[Dict[str, Any]], context_text: str,
+                          user_input: str, existing_slots_text: str = '') -> str:
+    """渲染提示词中与单次请求相关的后缀"""
+    parts = []
+    if entities:
+        entities_desc = "\n".join(f"- {e['entity']}: {e['value']} ({e['text']})" for e in entities)
+        parts.append(f"已识别的实体：\n{entities_desc}\n")
+    if existing_slots_text:
+        parts.append(existing_slots_text)
+    if context_text:
+        parts.append(context_text)
+    parts.append(f"用户输入：\"{user_input}\"\n")
+    return "".join(parts)
+
+
+class PromptFragmentCache:
+    """提示词片段缓存：按可见内容缓存渲染结果，配置变化后键随之变化，旧片段自然淘汰"""
+
+    def __init__(self, max_entries: int = 1024):
+        self._intent_lines = LRUTTLCache(max_size=max_entries * 4)
+        self._prefixes = LRUTTLCache(max_size=max_entries)
+
+    def intent_catalog(self, intents: Iterable[Any]) -> str:
+        """渲染意图目录"""
+        return self._render_catalog(tuple(intent_prompt_key(intent) for intent in intents))
+
+    def _render_catalog(self, keys: Tuple[IntentKey, ...]) -> str:
+        lines = []
+        for key in keys:
+            line = self._intent_lines.get(key)
+            if line is None:
+                line = render_intent_line(key)
+                self._intent_lines.set(key, line)
+            lines.append(line)
+        return "\n".join(lines)
+
+    def intent_prompt_prefix(self, intents: Iterable[Any]) -> str:
+        """意图识别提示词的固定前缀"""
+        return self._catalog_prefix('intent', intents, INTENT_PROMPT_HEADER, INTENT_PROMPT_INSTRUCTIONS)
+
+    def fused_prompt_prefix(self, intents: Iterable[Any]) -> str:
+        """融合NLU提示词的固定前缀"""
+        return self._catalog_prefix('fused', intents, FUSED_PROMPT_HEADER, FUSED_PROMPT_INSTRUCTIONS)
+
+    def _catalog_prefix(self, kind: str, intents: Iterable[Any], header: str, instructions: str) -> str:
+        keys = tuple(intent_prompt_key(intent) for intent in intents)
+        prefix = self._prefixes.get((kind, keys))
+        if prefix is None:
+            prefix = header + self._render_catalog(keys) + "\n" + instructions
+            self._prefixes.set((kind, keys), prefix)
+        return prefix
+
+    def slots_prompt_prefix(self, slot_definitions: Iterable[Dict[str, Any]]) -> str:
+        """槽位提取提示词的固定前缀"""
+        key = ('slots', slot_schema_key(slot_definitions))
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = SLOTS_PROMPT_HEADER + render_slot_schema(key[1]) + "\n" + SLOTS_PROMPT_INSTRUCTIONS
+            self._prefixes.set(key, prefix)
+        return prefix
+
+    def slot_schema(self, slot_definitions: Iterable[Dict[str, Any]], indent: str = '') -> str:
+        """渲染槽位定义片段"""
+        key = ('slot_schema', indent, slot_schema_key(slot_definitions))
+        text = self._prefixes.get(key)
+        if text is None:
+            text = render_slot_schema(key[2], indent)
+            self._prefixes.set(key, text)
+        return text
+
+    def clear(self):
+        """清空缓存（意图或槽位配置刷新时调用）"""
+        self._intent_lines.clear()
+        self._prefixes.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            'intent_lines': self._intent_lines.get_stats(),
+            'prefixes': self._prefixes.get_stats()
+        }
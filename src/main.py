@@ -50,15 +50,20 @@ async def lifespan(app: FastAPI):
         startup_service = await get_startup_service()
         logger.info("系统服务初始化完成")
         
-        # 5. 预热缓存
-        await _warm_up_cache()
-        logger.info("缓存预热完成")
-        
-        # 6. 初始化NLU引擎
+        # 5. 初始化NLU引擎
         from src.api.dependencies import get_nlu_engine
-        await get_nlu_engine()  # 这会初始化全局的NLU引擎实例
+        nlu_engine = await get_nlu_engine()  # 这会初始化全局的NLU引擎实例
         logger.info("NLU引擎初始化完成")
         
+        # 6. 构建应用级服务容器（所有请求共享）
+        from src.services.service_container import initialize_service_container
+        await initialize_service_container(cache_service, nlu_engine)
+        logger.info("服务容器初始化完成")
+        
+        # 7. 预热缓存
+        await _warm_up_cache()
+        logger.info("缓存预热完成")
+        
         logger.info(f"🚀 系统启动完成！监听端口: http://localhost:8000")
         logger.info(f"📚 API文档: http://localhost:8000/docs")
         
@@ -72,7 +77,17 @@ async def lifespan(app: FastAPI):
     logger.info("正在关闭系统...")
     
     try:
-        # 关闭数据库连接
+        # 关闭服务容器（释放RAGFLOW会话等资源）
+        from src.services.service_container import shutdown_service_container
+        await shutdown_service_container()
+        
+        # 写入缓冲中的缓存失效日志
+        from src.services.cache_invalidation_service import flush_invalidation_audit
+        await flush_invalidation_audit()
+        
+        # 关闭数据库线程池与连接
+        from src.utils.db_executor import shutdown_db_executor
+        shutdown_db_executor()
         close_database()
         
         # 关闭NLU引擎连接
@@ -192,15 +207,13 @@ def setup_global_handlers():
 async def _warm_up_cache():
     """缓存预热"""
     try:
-        from src.services.intent_service import IntentService
         from src.services.cache_service import get_cache_service
-        from src.core.nlu_engine import NLUEngine
         
         cache_service = await get_cache_service()
-        # 使用依赖注入系统的NLU引擎实例，避免重复创建aiohttp会话
-        from src.api.dependencies import get_nlu_engine
-        nlu_engine = await get_nlu_engine()
-        intent_service = IntentService(cache_service, nlu_engine)
+        # 使用服务容器中的共享实例，避免重复构建服务对象图
+        from src.api.dependencies import get_services
+        services = await get_services()
+        intent_service = services.intent_service
         
         # 预热活跃意图配置
         active_intents = await intent_service._get_active_intents()
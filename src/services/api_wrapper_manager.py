@@ -236,7 +236,8 @@ class ApiWrapperManager:
         cache_config = CacheConfig(
             enabled=cache_data.get('enabled', False),
             ttl_seconds=cache_data.get('ttl_seconds', 300),
-            max_size=cache_data.get('max_size', 1000)
+            max_size=cache_data.get('max_size', 1000),
+            shared=cache_data.get('shared', False)
         )
         
         # 参数映射
@@ -0,0 +1,275 @@
+"""
+缓存失效总线
+缓存失效事件通过Redis Stream（或发布订阅）推送给所有worker：发布方在本进程内立即处理，
+其他worker的监听任务阻塞读取新事件，在毫秒级内清除各自的进程内缓存（L1、意图目录副本等），
+不再依赖轮询数据库中的失效日志。
+
+Stream模式下每个worker各自记录已读取到的位置，连接中断后从该位置继续读取，期间的事件不会丢失；
+只有事件已被裁剪（超出 CACHE_INVALIDATION_STREAM_MAXLEN）时才整体重置进程内缓存。
+发布订阅模式（适用于不支持Stream的Redis）无法补读，每次（重新）订阅时整体重置。
+"""
+import asyncio
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.config.settings import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Stream中保存事件内容的字段名
+EVENT_FIELD = b'event'
+
+
+@dataclass(frozen=True, slots=True)
+class InvalidationEvent:
+    """缓存失效事件"""
+
+    # 发布事件的进程实例ID
+    origin: str
+    # 完整缓存键
+    keys: Tuple[str, ...] = ()
+    # 完整缓存键的通配模式
+    patterns: Tuple[str, ...] = ()
+    # 进程内状态的作用域（见 CacheInvalidationBus.add_scope_handler）
+    scopes: Tuple[str, ...] = ()
+
+    def to_json(self) -> str:
+        return json.dumps({
+            'origin': self.origin,
+            'keys': list(self.keys),
+            'patterns': list(self.patterns),
+            'scopes': list(self.scopes)
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data: Any) -> Optional['InvalidationEvent']:
+        try:
+            payload = json.loads(data)
+            return cls(
+                origin=payload.get('origin') or '',
+                keys=tuple(payload.get('keys') or ()),
+                patterns=tuple(payload.get('patterns') or ()),
+                scopes=tuple(payload.get('scopes') or ())
+            )
+        except (TypeError, ValueError, AttributeError):
+            return None
+
+
+EventHandler = Callable[[InvalidationEvent], None]
+
+
+class CacheInvalidationBus:
+    """跨worker的缓存失效总线（每个进程一个实例）"""
+
+    def __init__(self, stream: str, transport: str = 'stream', maxlen: int = 10000, block_ms: int = 1000):
+        """
+        Args:
+            stream: Stream键（发布订阅模式下为频道名）
+            transport: stream 或 pubsub
+            maxlen: Stream保留的事件数量上限（近似裁剪）
+            block_ms: 每次阻塞读取的最长时间（毫秒）
+        """
+        self.stream = stream
+        self.transport = transport if transport in ('stream', 'pubsub') else 'stream'
+        self.maxlen = maxlen
+        self.block_ms = block_ms
+        self.instance_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._handlers: List[EventHandler] = []
+        self._reset_handlers: List[Callable[[], None]] = []
+        self._scope_handlers: Dict[str, List[Callable[[], None]]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        # Stream模式下已处理到的事件ID
+        self._last_id: Optional[bytes] = None
+
+        self.stats = {
+            'published': 0,
+            'publish_failures': 0,
+            'received': 0,
+            'resets': 0
+        }
+
+    def add_handler(self, handler: EventHandler, on_reset: Optional[Callable[[], None]] = None):
+        """
+        注册事件处理函数
+
+        Args:
+            handler: 处理每个失效事件（包括本进程发布的事件）
+            on_reset: 可能丢失了事件时调用，应清空对应的进程内缓存
+        """
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+        if on_reset is not None and on_reset not in self._reset_handlers:
+            self._reset_handlers.append(on_reset)
+
+    def add_scope_handler(self, scope: str, handler: Callable[[], None]):
+        """注册作用域的清理函数：收到包含该作用域的事件或可能丢失事件时调用"""
+        handlers = self._scope_handlers.setdefault(scope, [])
+        if handler not in handlers:
+            handlers.append(handler)
+
+    @property
+    def listening(self) -> bool:
+        """监听任务是否在运行（未运行时无法感知其他worker的变更）"""
+        return self._listener is not None and not self._listener.done()
+
+    async def publish(self, redis_client, keys: Iterable[str] = (), patterns: Iterable[str] = (),
+                      scopes: Iterable[str] = ()) -> bool:
+        """
+        发布失效事件：先在本进程内处理，再推送给其他worker
+
+        Returns:
+            bool: 是否推送成功
+        """
+        event = InvalidationEvent(self.instance_id, tuple(keys), tuple(patterns), tuple(scopes))
+        if not (event.keys or event.patterns or event.scopes):
+            return True
+        self._dispatch(event)
+
+        try:
+            if self.transport == 'stream':
+                await redis_client.xadd(self.stream, {EVENT_FIELD: event.to_json()},
+                                        maxlen=self.maxlen, approximate=True)
+            else:
+                await redis_client.publish(self.stream, event.to_json())
+            self.stats['published'] += 1
+            return True
+        except Exception as e:
+            self.stats['publish_failures'] += 1
+            logger.warning(f"发布缓存失效事件失败: {str(e)}")
+            return False
+
+    def _dispatch(self, event: InvalidationEvent):
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.warning(f"处理缓存失效事件失败: {str(e)}")
+        for scope in event.scopes:
+            for handler in self._scope_handlers.get(scope, ()):
+                try:
+                    handler()
+                except Exception as e:
+                    logger.warning(f"清理进程内缓存失败: {scope}, 错误: {str(e)}")
+
+    def _on_message(self, data: Any):
+        event = InvalidationEvent.from_json(data)
+        if event is None or event.origin == self.instance_id:
+            return
+        self.stats['received'] += 1
+        self._dispatch(event)
+
+    def reset(self):
+        """可能丢失了失效事件：整体清空已注册的进程内缓存"""
+        self.stats['resets'] += 1
+        handlers = list(self._reset_handlers)
+        for scope_handlers in self._scope_handlers.values():
+            handlers.extend(scope_handlers)
+        for handler in handlers:
+            try:
+                handler()
+            except Exception as e:
+                logger.warning(f"重置进程内缓存失败: {str(e)}")
+
+    def start_listener(self, redis_client):
+        """启动事件监听（每个进程一个）"""
+        if self._listener is None or self._listener.done():
+            listen = self._listen_stream if self.transport == 'stream' else self._listen_pubsub
+            self._listener = asyncio.ensure_future(listen(redis_client))
+
+    async def stop_listener(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._listener = None
+
+    async def _listen_stream(self, redis_client):
+        while True:
+            try:
+                if self._last_id is None:
+                    # 首次启动从当前最新的事件之后开始读取，此时进程内缓存为空，无需补读
+                    latest = await redis_client.xrevrange(self.stream, count=1)
+                    self._last_id = latest[0][0] if latest else b'0-0'
+                elif await self._events_trimmed(redis_client):
+                    logger.warning("缓存失效事件在断线期间已被裁剪，重置进程内缓存")
+                    self.reset()
+
+                while True:
+                    response = await redis_client.xread({self.stream: self._last_id}, count=100,
+                                                         block=self.block_ms)
+                    for _, entries in response or ():
+                        for entry_id, fields in entries:
+                            self._last_id = entry_id
+                            self._on_message(fields.get(EVENT_FIELD))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"缓存失效事件读取中断，1秒后重连: {str(e)}")
+                await asyncio.sleep(1.0)
+
+    async def _events_trimmed(self, redis_client) -> bool:
+        """断线期间是否有未读取的事件已被裁剪"""
+        oldest = await redis_client.xrange(self.stream, count=1)
+        if not oldest:
+            return False
+        return _stream_id(oldest[0][0]) > _stream_id(self._last_id)
+
+    async def _listen_pubsub(self, redis_client):
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self.stream)
+                # 订阅建立（或重连）之前的失效事件可能已丢失，整体重置
+                self.reset()
+                async for message in pubsub.listen():
+                    if message.get('type') == 'message':
+                        self._on_message(message.get('data'))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"缓存失效订阅中断，1秒后重连: {str(e)}")
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.reset()
+                except Exception:
+                    pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取总线统计"""
+        stats = dict(self.stats)
+        stats.update({
+            'transport': self.transport,
+            'listener_running': self.listening
+        })
+        return stats
+
+
+def _stream_id(entry_id: Any) -> Tuple[int, int]:
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode('ascii')
+    milliseconds, _, sequence = entry_id.partition('-')
+    return int(milliseconds), int(sequence or 0)
+
+
+# 全局失效总线实例
+_invalidation_bus: Optional[CacheInvalidationBus] = None
+
+
+def get_cache_invalidation_bus() -> CacheInvalidationBus:
+    """获取本进程的缓存失效总线"""
+    global _invalidation_bus
+    if _invalidation_bus is None:
+        _invalidation_bus = CacheInvalidationBus(
+            settings.CACHE_INVALIDATION_CHANNEL,
+            transport=settings.CACHE_INVALIDATION_TRANSPORT,
+            maxlen=settings.CACHE_INVALIDATION_STREAM_MAXLEN
+        )
+    return _invalidation_bus
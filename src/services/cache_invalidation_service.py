@@ -1,18 +1,35 @@
 """
 缓存失效管理服务 (V2.2重构)
-实现基于事件的缓存清理机制，替代原数据库触发器
+实现基于事件的缓存清理机制，替代原数据库触发器。
+配置变更时直接删除Redis中的缓存，并通过缓存失效总线推送给所有worker清除进程内缓存；
+失效日志（CacheInvalidationLog）仅作为可选的审计记录批量写入数据库，
+执行失败的失效以pending状态记录，由 process_pending_invalidations 补偿处理。
 """
-from typing import Dict, Any, Optional, List, Set
-import json
+from typing import Dict, Any, Optional, List, Set, Iterable
+import asyncio
 from datetime import datetime
 from enum import Enum
 
+from src.config.settings import settings
 from src.models.audit import CacheInvalidationLog
 from src.services.cache_service import CacheService
+from src.services.cache_invalidation_bus import get_cache_invalidation_bus
+from src.core.cache_strategy import CacheTag
+from src.core.catalog_snapshot import invalidate_local_catalog
+from src.utils.db_executor import run_db
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 意图配置版本号缓存键（参与意图识别结果缓存键的计算，意图变更后旧结果自动失效）
+INTENT_CONFIG_VERSION_KEY = "intent_config_version"
+
+# 进程内意图目录副本的失效作用域
+INTENT_CATALOG_SCOPE = "intent_catalog"
+
+# 任意worker发布意图变更后，所有worker清空各自的意图目录副本
+get_cache_invalidation_bus().add_scope_handler(INTENT_CATALOG_SCOPE, invalidate_local_catalog)
+
 
 class CacheInvalidationType(Enum):
     """缓存失效类型"""
@@ -31,7 +48,8 @@ class CacheKeyGenerator:
         keys = [
             f"intent_config:all",
             f"intent_config:{intent_id}",
-            f"active_intents:list"
+            f"active_intents:list",
+            "active_intents"
         ]
         if intent_name:
             keys.append(f"intent_config:name:{intent_name}")
@@ -102,6 +120,157 @@ class CacheKeyGenerator:
                 f"session_context:{user_id}:{session_id}"
             ])
         return keys
+    
+    @staticmethod
+    def tags_by_table(table_name: str, record_id: Any, additional_data: Dict[str, Any]) -> List[str]:
+        """生成表变更需要失效的缓存标签（登记在标签下的条目按标签直接删除，无需扫描）"""
+        if table_name == "intents":
+            return [CacheTag.intent(record_id)]
+        if table_name in ("slots", "prompt_templates", "function_calls"):
+            intent_id = additional_data.get('intent_id')
+            return [CacheTag.intent(intent_id)] if intent_id else []
+        if table_name == "users":
+            return [CacheTag.user(additional_data.get('user_id', record_id))]
+        if table_name == "sessions":
+            return [CacheTag.session(additional_data.get('session_id', record_id))]
+        return []
+
+
+class InvalidationAuditTrail:
+    """
+    缓存失效审计日志
+    
+    记录先放入内存缓冲，收满一批或到达刷新间隔时通过数据库线程池一次批量写入，缓存失效本身不等待数据库
+    """
+    
+    def __init__(self, enabled: bool = True, batch_size: int = 100, flush_interval: float = 5.0,
+                 max_buffer: int = 10000):
+        """
+        Args:
+            enabled: 是否记录执行成功的失效（执行失败的失效始终记录，供补偿处理）
+            batch_size: 收满该数量立即写入
+            flush_interval: 首条记录入队后最多等待的时间（秒）
+            max_buffer: 缓冲上限，数据库持续不可用时超出部分丢弃
+        """
+        self.enabled = enabled
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_interval)
+        self.max_buffer = max(self.batch_size, max_buffer)
+        
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        
+        self.stats = {
+            'recorded': 0,
+            'written': 0,
+            'dropped': 0,
+            'write_failures': 0
+        }
+    
+    def record(self, table_name: str, record_id: Any, operation_type: str,
+               cache_keys: List[str], error: Optional[str] = None):
+        """
+        记录一次缓存失效
+        
+        Args:
+            table_name: 变更的表名
+            record_id: 记录ID
+            operation_type: 操作类型 (INSERT, UPDATE, DELETE)
+            cache_keys: 失效的缓存键（含标签记录）
+            error: 执行失败时的错误信息，记录为pending状态
+        """
+        if error is None and not self.enabled:
+            return
+        now = datetime.now()
+        self._append([{
+            'table_name': table_name,
+            'record_id': str(record_id),
+            'operation_type': operation_type,
+            'cache_keys': cache_keys,
+            'invalidation_status': 'pending' if error else 'completed',
+            'created_at': now,
+            'processed_at': None if error else now,
+            'error_message': error
+        }])
+        self.stats['recorded'] += 1
+    
+    def _append(self, rows: List[Dict[str, Any]], flush_when_full: bool = True):
+        room = self.max_buffer - len(self._buffer)
+        if room < len(rows):
+            self.stats['dropped'] += len(rows) - max(0, room)
+            rows = rows[:max(0, room)]
+        self._buffer.extend(rows)
+        
+        if flush_when_full and len(self._buffer) >= self.batch_size:
+            self._flush()
+        elif self._buffer and self._flush_handle is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._flush_handle = loop.call_later(self.flush_interval, self._flush)
+    
+    def _flush(self):
+        """写入当前缓冲的记录"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        task = asyncio.ensure_future(self._write(rows))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _write(self, rows: List[Dict[str, Any]]):
+        try:
+            await run_db(lambda: CacheInvalidationLog.insert_many(rows).execute())
+            self.stats['written'] += len(rows)
+        except Exception as e:
+            self.stats['write_failures'] += 1
+            logger.warning(f"写入缓存失效日志失败: {len(rows)}条, 错误: {str(e)}")
+            # 待补偿的记录放回缓冲，在下一个刷新间隔重试
+            pending = [row for row in rows if row['invalidation_status'] == 'pending']
+            self.stats['dropped'] += len(rows) - len(pending)
+            if pending:
+                self._append(pending, flush_when_full=False)
+    
+    async def flush(self):
+        """立即写入缓冲的记录并等待写入完成（关闭服务时调用）"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取审计日志统计"""
+        stats = dict(self.stats)
+        stats['enabled'] = self.enabled
+        stats['buffered'] = len(self._buffer)
+        return stats
+
+
+# 失效审计日志实例（同一进程内共享）
+_audit_trail: Optional[InvalidationAuditTrail] = None
+
+
+def get_invalidation_audit_trail() -> InvalidationAuditTrail:
+    """获取缓存失效审计日志"""
+    global _audit_trail
+    if _audit_trail is None:
+        _audit_trail = InvalidationAuditTrail(
+            enabled=settings.CACHE_INVALIDATION_AUDIT_ENABLED,
+            batch_size=settings.CACHE_INVALIDATION_AUDIT_BATCH_SIZE,
+            flush_interval=settings.CACHE_INVALIDATION_AUDIT_FLUSH_INTERVAL
+        )
+    return _audit_trail
+
+
+async def flush_invalidation_audit():
+    """写入缓冲中的缓存失效日志（关闭服务时在数据库线程池关闭前调用）"""
+    if _audit_trail is not None:
+        await _audit_trail.flush()
 
 
 class CacheInvalidationService:
@@ -111,6 +280,8 @@ class CacheInvalidationService:
         self.cache_service = cache_service
         self.logger = logger
         self.key_generator = CacheKeyGenerator()
+        self.bus = get_cache_invalidation_bus()
+        self.audit_trail = get_invalidation_audit_trail()
     
     async def invalidate_by_table_change(
         self,
@@ -118,7 +289,7 @@ class CacheInvalidationService:
         record_id: int,
         operation_type: str,
         additional_data: Optional[Dict[str, Any]] = None
-    ) -> CacheInvalidationLog:
+    ) -> Dict[str, Any]:
         """
         根据表变更失效相关缓存
         
@@ -129,32 +300,29 @@ class CacheInvalidationService:
             additional_data: 额外数据，用于生成更精确的缓存键
             
         Returns:
-            CacheInvalidationLog: 缓存失效日志记录
+            Dict: 失效结果
         """
         try:
             # 根据表名生成需要失效的缓存键
             cache_keys = self._generate_cache_keys_by_table(
                 table_name, record_id, additional_data or {}
             )
+            tags = self.key_generator.tags_by_table(table_name, record_id, additional_data or {})
+            scopes = [INTENT_CATALOG_SCOPE] if table_name == "intents" else []
             
-            # 记录缓存失效日志
-            log_record = CacheInvalidationLog.create(
-                table_name_field=table_name,
-                record_id=str(record_id),
-                operation_type=operation_type,
-                cache_keys=json.dumps(cache_keys, ensure_ascii=False),
-                invalidation_status='pending'
+            result = await self._create_and_execute_invalidation(
+                table_name, record_id, operation_type, cache_keys, tags, scopes
             )
             
-            # 异步执行缓存失效
-            await self._execute_cache_invalidation(log_record, cache_keys)
+            if table_name == "intents":
+                await self.bump_intent_config_version()
             
             self.logger.info(
                 f"触发缓存失效: {table_name}.{record_id} {operation_type}, "
                 f"影响缓存键: {len(cache_keys)}"
             )
             
-            return log_record
+            return result
             
         except Exception as e:
             self.logger.error(f"缓存失效处理失败: {str(e)}")
@@ -165,24 +333,47 @@ class CacheInvalidationService:
         intent_id: int,
         intent_name: str = None,
         operation_type: str = "UPDATE"
-    ) -> CacheInvalidationLog:
-        """失效意图相关缓存"""
+    ) -> Dict[str, Any]:
+        """失效意图相关缓存（所有worker的意图目录副本随之清空）"""
         cache_keys = self.key_generator.intent_keys(intent_id, intent_name)
-        return await self._create_and_execute_invalidation(
-            "intents", intent_id, operation_type, cache_keys
+        result = await self._create_and_execute_invalidation(
+            "intents", intent_id, operation_type, cache_keys, [CacheTag.intent(intent_id)],
+            [INTENT_CATALOG_SCOPE]
         )
+        await self.bump_intent_config_version()
+        return result
+    
+    async def bump_intent_config_version(self) -> Optional[int]:
+        """
+        递增意图配置版本号
+        
+        意图识别结果缓存键包含该版本号，递增后所有worker上的旧识别结果不再被命中
+        
+        Returns:
+            Optional[int]: 递增后的版本号，失败时返回None
+        """
+        try:
+            version = await self.cache_service.increment(INTENT_CONFIG_VERSION_KEY)
+            self.logger.info(f"意图配置版本号已更新: {version}")
+            return version
+        except Exception as e:
+            self.logger.warning(f"更新意图配置版本号失败: {str(e)}")
+            return None
     
     async def invalidate_slot_cache(
         self,
         slot_id: int,
         intent_id: int,
         operation_type: str = "UPDATE"
-    ) -> CacheInvalidationLog:
+    ) -> Dict[str, Any]:
         """失效槽位相关缓存"""
         cache_keys = self.key_generator.slot_keys(slot_id, intent_id)
-        return await self._create_and_execute_invalidation(
-            "slots", slot_id, operation_type, cache_keys
+        result = await self._create_and_execute_invalidation(
+            "slots", slot_id, operation_type, cache_keys, [CacheTag.intent(intent_id)]
         )
+        # 槽位定义属于意图目录快照的一部分，同样递增配置版本号
+        await self.bump_intent_config_version()
+        return result
     
     async def invalidate_system_config_cache(
         self,
@@ -190,7 +381,7 @@ class CacheInvalidationService:
         category: str = None,
         key: str = None,
         operation_type: str = "UPDATE"
-    ) -> CacheInvalidationLog:
+    ) -> Dict[str, Any]:
         """失效系统配置相关缓存"""
         cache_keys = self.key_generator.system_config_keys(config_id, category, key)
         return await self._create_and_execute_invalidation(
@@ -219,31 +410,18 @@ class CacheInvalidationService:
             if not matching_keys:
                 return {"pattern": pattern, "invalidated_count": 0, "message": "没有匹配的缓存键"}
             
-            # 批量删除缓存
-            success_count = 0
-            for key in matching_keys:
-                try:
-                    await self.cache_service.delete(key)
-                    success_count += 1
-                except Exception as e:
-                    self.logger.warning(f"删除缓存键失败: {key}, 错误: {str(e)}")
+            # 批量删除缓存（分批UNLINK，单次往返）
+            success_count = await self.cache_service.invalidate_keys(matching_keys)
             
             # 记录批量失效日志
-            log_record = CacheInvalidationLog.create(
-                table_name_field="batch_invalidation",
-                record_id="0",
-                operation_type="DELETE",
-                cache_keys=json.dumps(matching_keys, ensure_ascii=False),
-                invalidation_status='completed'
-            )
+            self.audit_trail.record("batch_invalidation", 0, "DELETE", matching_keys)
             
             self.logger.info(f"批量缓存失效完成: 模式={pattern}, 成功={success_count}/{len(matching_keys)}")
             
             return {
                 "pattern": pattern,
                 "total_keys": len(matching_keys),
-                "invalidated_count": success_count,
-                "log_id": log_record.id
+                "invalidated_count": success_count
             }
             
         except Exception as e:
@@ -280,9 +458,10 @@ class CacheInvalidationService:
                     # 标记为处理中
                     log.mark_processing()
                     
-                    # 获取缓存键并执行失效
-                    cache_keys = log.get_cache_keys()
-                    await self._execute_cache_invalidation_direct(cache_keys)
+                    # 获取缓存键和标签并执行失效
+                    cache_keys, tags = self._split_tag_entries(log.get_cache_keys())
+                    if not await self._execute_cache_invalidation_direct(cache_keys, tags):
+                        raise RuntimeError("部分缓存键失效失败")
                     
                     # 标记为处理完成
                     log.mark_completed()
@@ -328,9 +507,9 @@ class CacheInvalidationService:
                 status_stats[log.invalidation_status] += 1
                 
                 # 表名统计
-                if log.table_name_field not in table_stats:
-                    table_stats[log.table_name_field] = 0
-                table_stats[log.table_name_field] += 1
+                if log.table_name not in table_stats:
+                    table_stats[log.table_name] = 0
+                table_stats[log.table_name] += 1
                 
                 # 操作类型统计
                 if log.operation_type not in operation_stats:
@@ -343,6 +522,8 @@ class CacheInvalidationService:
                 'status_stats': status_stats,
                 'table_stats': table_stats,
                 'operation_stats': operation_stats,
+                'audit_trail': self.audit_trail.get_stats(),
+                'invalidation_bus': self.bus.get_stats(),
                 'generated_at': datetime.now().isoformat()
             }
             
@@ -406,40 +587,72 @@ class CacheInvalidationService:
         table_name: str,
         record_id: int,
         operation_type: str,
-        cache_keys: List[str]
-    ) -> CacheInvalidationLog:
-        """创建并执行缓存失效"""
-        log_record = CacheInvalidationLog.create(
-            table_name_field=table_name,
-            record_id=str(record_id),
-            operation_type=operation_type,
-            cache_keys=json.dumps(cache_keys, ensure_ascii=False),
-            invalidation_status='pending'
-        )
+        cache_keys: List[str],
+        tags: Optional[List[str]] = None,
+        scopes: Iterable[str] = ()
+    ) -> Dict[str, Any]:
+        """执行缓存失效，通知所有worker清除进程内缓存，并记录审计日志"""
+        tags = tags or []
+        succeeded = await self._execute_cache_invalidation_direct(cache_keys, tags)
         
-        await self._execute_cache_invalidation(log_record, cache_keys)
-        return log_record
+        scopes = list(scopes)
+        if scopes:
+            await self.bus.publish(self.cache_service.redis_client, scopes=scopes)
+        
+        self.audit_trail.record(
+            table_name, record_id, operation_type, cache_keys + self._tag_entries(tags),
+            error=None if succeeded else "部分缓存键失效失败"
+        )
+        return {
+            "table_name": table_name,
+            "record_id": str(record_id),
+            "operation_type": operation_type,
+            "cache_keys": cache_keys,
+            "tags": tags,
+            "status": "completed" if succeeded else "pending"
+        }
     
-    async def _execute_cache_invalidation(
-        self,
-        log_record: CacheInvalidationLog,
-        cache_keys: List[str]
-    ):
-        """执行缓存失效操作"""
+    @staticmethod
+    def _tag_entries(tags: List[str]) -> List[str]:
+        """缓存标签在失效日志中的记录形式（即标签集合的缓存键）"""
+        return [CacheTag.key(tag) for tag in tags]
+    
+    @staticmethod
+    def _split_tag_entries(entries: List[str]):
+        """将失效日志中的记录拆分为缓存键和缓存标签"""
+        cache_keys, tags = [], []
+        for entry in entries:
+            if entry.startswith(CacheTag.KEY_PREFIX):
+                tags.append(entry[len(CacheTag.KEY_PREFIX):])
+            else:
+                cache_keys.append(entry)
+        return cache_keys, tags
+    
+    async def _execute_cache_invalidation_direct(self, cache_keys: List[str],
+                                                 tags: Optional[List[str]] = None) -> bool:
+        """
+        直接执行缓存失效（批量删除Redis键和标签下登记的键，并通知所有worker清除L1缓存）
+        
+        Returns:
+            bool: 是否全部执行成功
+        """
+        succeeded = True
+        if tags:
+            try:
+                deleted_count = await self.cache_service.invalidate_tags(tags)
+                self.logger.debug(f"按标签失效缓存成功: {tags}, 删除{deleted_count}个条目")
+            except Exception as e:
+                succeeded = False
+                self.logger.warning(f"按标签失效缓存失败: {tags}, 错误: {str(e)}")
+        
         try:
-            log_record.mark_processing()
-            
-            # 执行实际的缓存删除
-            await self._execute_cache_invalidation_direct(cache_keys)
-            
-            log_record.mark_completed()
-            
+            await self.cache_service.invalidate_keys(cache_keys)
+            self.logger.debug(f"删除缓存键成功: {cache_keys}")
+            return succeeded
         except Exception as e:
-            log_record.mark_failed(str(e))
-            raise
-    
-    async def _execute_cache_invalidation_direct(self, cache_keys: List[str]):
-        """直接执行缓存失效"""
+            self.logger.warning(f"批量删除缓存键失败，逐个重试: {str(e)}")
+        
+        # 逐个删除无法区分键不存在与删除失败，仍按失败记录，由补偿处理再次执行（删除是幂等的）
         for key in cache_keys:
             try:
                 await self.cache_service.delete(key)
@@ -447,6 +660,7 @@ class CacheInvalidationService:
             except Exception as e:
                 self.logger.warning(f"删除缓存键失败: {key}, 错误: {str(e)}")
                 # 继续处理其他键，不因单个键失败而中断
+        return False
 
 
 # 全局缓存失效服务实例
@@ -1,9 +1,22 @@
 """
 Redis缓存服务
+读多写少的配置类数据（按缓存键模板启用）在Redis之前还有一层进程内L1缓存，
+L1保存Redis中的序列化数据，命中时省去一次网络往返；写入、删除和缓存失效服务发出的失效
+通过缓存失效总线（见 cache_invalidation_bus）通知其他worker清除各自的L1。
+按模式的批量操作使用SCAN增量遍历并分批UNLINK，不使用会阻塞Redis的KEYS；
+写入时可将条目登记到标签集合（见 CacheTag），按标签失效只触及受影响的键。
+热点键通过 get_or_load 读取：未命中时单飞加载，并按模板配置提前刷新或在过期后短暂返回旧值（防缓存击穿）。
+缓存值按所属模板的序列化方法编码并带1字节编解码标签（见 cache_codec），读取时按标签解码。
 """
 import json
 import asyncio
-from typing import Any, Optional, Dict, List, Union
+import contextvars
+import fnmatch
+import math
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Optional, Dict, Iterable, List, Set, Tuple, Union
 import redis.asyncio as redis
 from redis.asyncio import ConnectionPool
 import pickle
@@ -11,12 +24,194 @@ import hashlib
 from datetime import datetime, timedelta
 
 from src.config.settings import settings
-from src.core.cache_strategy import get_cache_strategy, UnifiedCacheStrategy
+from src.core.cache_strategy import get_cache_strategy, UnifiedCacheStrategy, SerializationMethod, CacheTag
+from src.core.cache_codec import get_cache_codec
+from src.services.cache_invalidation_bus import (
+    CacheInvalidationBus, InvalidationEvent, get_cache_invalidation_bus
+)
 from src.utils.logger import get_logger
+from src.utils.lru_cache import LRUTTLCache
 
 logger = get_logger(__name__)
 
 
+class LocalCacheTier:
+    """进程内L1缓存层（同一进程内的所有CacheService实例共享），通过缓存失效总线与其他worker同步"""
+    
+    def __init__(self, max_entries: int, bus: CacheInvalidationBus):
+        self.bus = bus
+        self._cache = LRUTTLCache(max_size=max_entries)
+        # 每收到一次失效递增；读取Redis期间发生失效时，读到的旧值不回填L1
+        self.generation = 0
+        self.stats = {
+            'l2_hits': 0,
+            'l2_misses': 0
+        }
+        bus.add_handler(self._on_event, on_reset=self.clear)
+    
+    @property
+    def listening(self) -> bool:
+        """失效事件监听是否在运行"""
+        return self.bus.listening
+    
+    def get(self, cache_key: str) -> Optional[bytes]:
+        return self._cache.get(cache_key)
+    
+    def set(self, cache_key: str, data: bytes, ttl: float, generation: Optional[int] = None):
+        if generation is not None and generation != self.generation:
+            return
+        self._cache.set(cache_key, data, ttl=ttl)
+    
+    def discard(self, keys: Iterable[str] = (), patterns: Iterable[str] = ()):
+        """清除本地L1中的键和匹配模式的键"""
+        self.generation += 1
+        for key in keys:
+            self._cache.delete(key)
+        for pattern in patterns:
+            for key in self._cache.keys():
+                if fnmatch.fnmatchcase(key, pattern):
+                    self._cache.delete(key)
+    
+    async def publish(self, redis_client, keys: Iterable[str] = (), patterns: Iterable[str] = ()):
+        """清除本地L1并通知其他worker"""
+        await self.bus.publish(redis_client, keys=keys, patterns=patterns)
+    
+    def _on_event(self, event: InvalidationEvent):
+        if event.keys or event.patterns:
+            self.discard(event.keys, event.patterns)
+    
+    def clear(self):
+        self._cache.clear()
+        self.generation += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """按层级报告命中率"""
+        l2_total = self.stats['l2_hits'] + self.stats['l2_misses']
+        return {
+            'l1': {**self._cache.get_stats(), 'enabled': True},
+            'l2': {
+                'hits': self.stats['l2_hits'],
+                'misses': self.stats['l2_misses'],
+                'hit_rate': round(self.stats['l2_hits'] / l2_total, 4) if l2_total else 0.0
+            },
+            'invalidations_published': self.bus.stats['published'],
+            'invalidations_received': self.bus.stats['received'],
+            'listener_running': self.listening
+        }
+
+
+# 批量操作中的缓存键：键（使用调用时给定的命名空间）或 (键, 命名空间)
+CacheKeyEntry = Union[str, Tuple[str, str]]
+
+
+# 进程内L1缓存层实例
+_local_tier: Optional[LocalCacheTier] = None
+
+
+def get_local_cache_tier() -> Optional[LocalCacheTier]:
+    """获取进程内L1缓存层，未启用时返回None"""
+    global _local_tier
+    if _local_tier is None and settings.CACHE_L1_ENABLED:
+        _local_tier = LocalCacheTier(settings.CACHE_L1_MAX_ENTRIES, get_cache_invalidation_bus())
+    return _local_tier
+
+
+def get_cache_tier_stats() -> Dict[str, Any]:
+    """获取本进程L1/L2各层的命中统计及缓存失效总线状态"""
+    stats = _local_tier.get_stats() if _local_tier is not None else {'l1': {'enabled': False}}
+    stats['invalidation_bus'] = get_cache_invalidation_bus().get_stats()
+    return stats
+
+
+# get_or_load 未获得跨worker加载锁时轮询缓存的间隔（秒）
+LOCK_POLL_INTERVAL = 0.05
+# 尚无加载耗时样本时XFetch使用的加载耗时（秒）
+DEFAULT_LOAD_SECONDS = 0.1
+
+# 仅当锁仍由自己持有时删除（避免误删超时后被其他worker获得的锁）
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# 仅当哈希的版本字段仍为读取时的值（缺失时为空串）才整体替换哈希，版本字段原样保留
+_REPLACE_HASH_IF_VERSION_SCRIPT = """
+local current = redis.call('hget', KEYS[1], ARGV[1])
+if (current or '') ~= ARGV[2] then
+    return 0
+end
+redis.call('del', KEYS[1])
+if current then
+    redis.call('hset', KEYS[1], ARGV[1], current)
+end
+for i = 4, #ARGV, 2 do
+    redis.call('hset', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if tonumber(ARGV[3]) > 0 then
+    redis.call('expire', KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+
+class _PendingLoad:
+    """get_or_load 的一次加载请求"""
+    
+    __slots__ = ('key', 'namespace', 'cache_key', 'loader', 'ttl', 'stale_ttl', 'method', 'tags',
+                 'accept', 'timing_key')
+    
+    def __init__(self, key: str, namespace: str, cache_key: str, loader: Callable[[], Awaitable[Any]],
+                 ttl: Optional[int], stale_ttl: int, method: Optional[SerializationMethod],
+                 tags: Optional[Iterable[str]], accept: Optional[Callable[[Any], bool]],
+                 timing_key: Optional[str]):
+        self.key = key
+        self.namespace = namespace
+        self.cache_key = cache_key
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.method = method
+        self.tags = list(tags) if tags else None
+        self.accept = accept
+        # 加载耗时按模板统计，不属于任何模板的键共用一项
+        self.timing_key = timing_key
+
+
+# 本进程内正在加载的完整缓存键 -> 加载结果
+_inflight_loads: Dict[str, asyncio.Future] = {}
+# 后台刷新任务（保持引用直到完成）
+_background_refreshes: Set[asyncio.Task] = set()
+# 各模板加载耗时的指数移动平均（秒）
+_load_seconds: Dict[Optional[str], float] = {}
+_load_stats = {
+    'loads': 0,
+    'coalesced': 0,
+    'lock_waits': 0,
+    'stale_served': 0,
+    'early_refreshes': 0,
+    'refresh_failures': 0
+}
+
+
+def _on_background_refresh_done(task: asyncio.Task):
+    _background_refreshes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        _load_stats['refresh_failures'] += 1
+        logger.warning(f"后台刷新缓存失败: {str(task.exception())}")
+
+
+def get_cache_load_stats() -> Dict[str, Any]:
+    """获取本进程 get_or_load 的加载统计"""
+    stats = dict(_load_stats)
+    stats['inflight'] = len(_inflight_loads)
+    stats['load_ms'] = {
+        name or 'other': round(seconds * 1000, 1) for name, seconds in _load_seconds.items()
+    }
+    return stats
+
+
 class CacheService:
     """Redis缓存服务类"""
     
@@ -28,6 +223,8 @@ class CacheService:
         
         # 使用统一的缓存策略
         self.cache_strategy = get_cache_strategy()
+        self.codec = get_cache_codec()
+        self.local_tier = get_local_cache_tier()
         
         # 保持向后兼容的模板字典（废弃，将逐步移除）
         self.CACHE_KEY_TEMPLATES = {
@@ -76,8 +273,15 @@ class CacheService:
             logger.error(f"Redis缓存服务初始化失败: {str(e)}")
             raise
     
+    async def start_invalidation_listener(self):
+        """监听跨worker的缓存失效事件（由全局实例在初始化后调用）"""
+        self._ensure_initialized()
+        get_cache_invalidation_bus().start_listener(self.redis_client)
+    
     async def close(self):
         """关闭Redis连接"""
+        if _cache_service is self:
+            await get_cache_invalidation_bus().stop_listener()
         if self.redis_client:
             await self.redis_client.close()
         if self.connection_pool:
@@ -95,41 +299,81 @@ class CacheService:
         """生成带命名空间的缓存键"""
         return f"{namespace}:{key}"
     
+    def _tag_key(self, tag: str) -> str:
+        """标签集合的完整键（标签集合统一位于默认命名空间下）"""
+        return self._generate_key(CacheTag.key(tag), self.default_namespace)
+    
+    async def _unlink_keys(self, cache_keys: List[Union[str, bytes]]) -> int:
+        """分批UNLINK完整缓存键（单次往返，Redis在后台释放内存）"""
+        if not cache_keys:
+            return 0
+        batch_size = max(1, settings.CACHE_UNLINK_BATCH)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for start in range(0, len(cache_keys), batch_size):
+                pipe.unlink(*cache_keys[start:start + batch_size])
+            results = await pipe.execute()
+        return sum(results)
+    
+    async def _publish_l1_keys(self, cache_keys: Iterable[Union[str, bytes]]):
+        """通知所有worker清除L1中的键（只包含启用了L1的键）"""
+        if self.local_tier is None:
+            return
+        l1_keys = []
+        for cache_key in cache_keys:
+            if isinstance(cache_key, bytes):
+                cache_key = cache_key.decode('utf-8')
+            if self.cache_strategy.get_l1_ttl_for_cache_key(cache_key):
+                l1_keys.append(cache_key)
+        if l1_keys:
+            await self.local_tier.publish(self.redis_client, keys=l1_keys)
+    
+    def _get_l1_ttl(self, key: str, namespace: str) -> Optional[int]:
+        """缓存键的L1 TTL；未启用L1或失效订阅未运行（无法感知其他worker的变更）时返回None"""
+        if self.local_tier is None or not self.local_tier.listening:
+            return None
+        return self.cache_strategy.get_l1_ttl(key, namespace)
+    
+    def _get_serialization(self, key: str, namespace: str,
+                           method: Optional[SerializationMethod]) -> Optional[SerializationMethod]:
+        """写入时使用的序列化方法：调用方指定的方法优先，其次为缓存键所属模板的方法"""
+        return method or self.cache_strategy.get_key_serialization(key, namespace)
+    
     def _serialize_data(self, data: Any, method=None) -> bytes:
-        """序列化数据"""
+        """序列化数据（带编解码标签）"""
         try:
             if method is None:
-                # 兼容性默认行为
-                if isinstance(data, (str, int, float, bool)):
-                    return json.dumps(data).encode('utf-8')
-                else:
-                    return pickle.dumps(data)
-            else:
-                # 使用统一的序列化策略
-                result = self.cache_strategy.serialize_data(data, method)
-                return result.encode('utf-8') if isinstance(result, str) else result
+                # 未指定方法且不属于任何模板：标量使用JSON，其余使用pickle保留原始类型
+                method = (SerializationMethod.JSON if isinstance(data, (str, int, float, bool))
+                          else SerializationMethod.PICKLE)
+            elif method == SerializationMethod.HASH:
+                # 哈希值不可逆，按原方式存储
+                return self.cache_strategy.serialize_data(data, method).encode('utf-8')
+            return self.codec.encode(data, method)
         except Exception as e:
             logger.warning(f"数据序列化失败: {str(e)}")
-            return pickle.dumps(data)
+            return self.codec.encode(data, SerializationMethod.PICKLE)
     
     def _deserialize_data(self, data: bytes, method=None) -> Any:
-        """反序列化数据"""
+        """反序列化数据：带编解码标签的按标签解码，旧版本写入的数据按原方式解码"""
         try:
-            if method is None:
-                # 兼容性默认行为
-                try:
-                    return json.loads(data.decode('utf-8'))
-                except (json.JSONDecodeError, UnicodeDecodeError):
-                    return pickle.loads(data)
-            else:
-                # 使用统一的反序列化策略
+            if self.codec.is_tagged(data):
+                return self.codec.decode(data)
+            if method is not None:
                 return self.cache_strategy.deserialize_data(data, method)
+            if data[:1] == b'\x80':
+                return pickle.loads(data)
+            try:
+                return json.loads(data.decode('utf-8'))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return pickle.loads(data)
         except Exception as e:
             logger.warning(f"数据反序列化失败: {str(e)}")
             return None
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None, 
-                  namespace: str = "intent_system") -> bool:
+                  namespace: str = "intent_system",
+                  method: Optional[SerializationMethod] = None,
+                  tags: Optional[Iterable[str]] = None) -> bool:
         """
         设置缓存值
         
@@ -138,6 +382,8 @@ class CacheService:
             value: 缓存值
             ttl: 过期时间（秒），None表示永不过期
             namespace: 命名空间
+            method: 序列化方法，None时使用缓存键所属模板的方法（不属于任何模板时沿用兼容性默认行为）
+            tags: 登记的缓存标签（见 CacheTag），可通过 invalidate_tags 按标签失效
             
         Returns:
             bool: 是否设置成功
@@ -146,13 +392,32 @@ class CacheService:
         
         try:
             cache_key = self._generate_key(key, namespace)
-            serialized_data = self._serialize_data(value)
-            
-            if ttl:
+            serialized_data = self._serialize_data(value, self._get_serialization(key, namespace, method))
+            
+            if tags:
+                # 值与标签登记在同一次往返中写入
+                tag_ttl = max(ttl or 0, settings.CACHE_TAG_TTL)
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    if ttl:
+                        pipe.setex(cache_key, ttl, serialized_data)
+                    else:
+                        pipe.set(cache_key, serialized_data)
+                    for tag in tags:
+                        tag_key = self._tag_key(tag)
+                        pipe.sadd(tag_key, cache_key)
+                        pipe.expire(tag_key, tag_ttl)
+                    result = (await pipe.execute())[0]
+            elif ttl:
                 result = await self.redis_client.setex(cache_key, ttl, serialized_data)
             else:
                 result = await self.redis_client.set(cache_key, serialized_data)
             
+            l1_ttl = self._get_l1_ttl(key, namespace)
+            if l1_ttl:
+                # 其他worker的L1中可能是旧值，通知清除后再写入本地L1
+                await self.local_tier.publish(self.redis_client, keys=[cache_key])
+                self.local_tier.set(cache_key, serialized_data, min(l1_ttl, ttl) if ttl else l1_ttl)
+            
             logger.debug(f"缓存设置: {cache_key}, TTL: {ttl}")
             return bool(result)
             
@@ -160,13 +425,15 @@ class CacheService:
             logger.error(f"设置缓存失败: {key}, 错误: {str(e)}")
             return False
     
-    async def get(self, key: str, namespace: str = "intent_system") -> Optional[Any]:
+    async def get(self, key: str, namespace: str = "intent_system",
+                  method: Optional[SerializationMethod] = None) -> Optional[Any]:
         """
         获取缓存值
         
         Args:
             key: 缓存键
             namespace: 命名空间
+            method: 序列化方法，需与写入时一致
             
         Returns:
             Any: 缓存值，不存在时返回None
@@ -175,13 +442,28 @@ class CacheService:
         
         try:
             cache_key = self._generate_key(key, namespace)
+            
+            l1_ttl = self._get_l1_ttl(key, namespace)
+            if l1_ttl:
+                local_data = self.local_tier.get(cache_key)
+                if local_data is not None:
+                    return self._deserialize_data(local_data, method)
+                generation = self.local_tier.generation
+            
             cached_data = await self.redis_client.get(cache_key)
             
             if cached_data is None:
+                if self.local_tier is not None:
+                    self.local_tier.stats['l2_misses'] += 1
                 logger.debug(f"缓存未命中: {cache_key}")
                 return None
             
-            deserialized_data = self._deserialize_data(cached_data)
+            if self.local_tier is not None:
+                self.local_tier.stats['l2_hits'] += 1
+            if l1_ttl:
+                self.local_tier.set(cache_key, cached_data, l1_ttl, generation)
+            
+            deserialized_data = self._deserialize_data(cached_data, method)
             logger.debug(f"缓存命中: {cache_key}")
             return deserialized_data
             
@@ -206,6 +488,9 @@ class CacheService:
             cache_key = self._generate_key(key, namespace)
             result = await self.redis_client.delete(cache_key)
             
+            if self._get_l1_ttl(key, namespace):
+                await self.local_tier.publish(self.redis_client, keys=[cache_key])
+            
             logger.debug(f"缓存删除: {cache_key}")
             return bool(result)
             
@@ -213,6 +498,397 @@ class CacheService:
             logger.error(f"删除缓存失败: {key}, 错误: {str(e)}")
             return False
     
+    async def invalidate_keys(self, keys: List[str], namespace: str = "intent_system") -> int:
+        """
+        批量失效缓存键：分批UNLINK Redis中的键（单次往返），并以一条通知清除所有worker的L1
+        
+        Args:
+            keys: 缓存键列表（不含命名空间）
+            namespace: 命名空间
+            
+        Returns:
+            int: Redis中实际删除的键数量
+        """
+        self._ensure_initialized()
+        
+        if not keys:
+            return 0
+        
+        cache_keys = [self._generate_key(key, namespace) for key in keys]
+        deleted_count = await self._unlink_keys(cache_keys)
+        if self.local_tier is not None:
+            await self.local_tier.publish(self.redis_client, keys=cache_keys)
+        
+        logger.debug(f"批量失效缓存: {len(cache_keys)}个键")
+        return deleted_count
+    
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        按标签失效缓存：删除登记在标签集合中的所有条目及标签集合本身
+        
+        读取并删除标签集合在同一事务中完成，之后写入的条目会登记到新的标签集合，不会丢失登记
+        
+        Args:
+            tags: 缓存标签列表（见 CacheTag）
+            
+        Returns:
+            int: Redis中实际删除的缓存条目数量
+        """
+        self._ensure_initialized()
+        
+        tag_keys = [self._tag_key(tag) for tag in dict.fromkeys(tags)]
+        if not tag_keys:
+            return 0
+        
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            for tag_key in tag_keys:
+                pipe.smembers(tag_key)
+            pipe.unlink(*tag_keys)
+            results = await pipe.execute()
+        
+        cache_keys = list({member for members in results[:-1] for member in members})
+        # 标签集合中可能残留已过期条目的键，UNLINK不存在的键无副作用
+        deleted_count = await self._unlink_keys(cache_keys)
+        await self._publish_l1_keys(cache_keys)
+        
+        logger.debug(f"按标签失效缓存: 标签={len(tag_keys)}, 登记键={len(cache_keys)}, 删除={deleted_count}")
+        return deleted_count
+    
+    def _resolve_entry(self, entry: CacheKeyEntry, namespace: str) -> Tuple[str, str]:
+        """拆分批量操作中的缓存键为 (键, 命名空间)"""
+        if isinstance(entry, tuple):
+            return entry
+        return entry, namespace
+    
+    async def get_many(self, keys: Iterable[CacheKeyEntry], namespace: str = "intent_system",
+                       hash_keys: Iterable[CacheKeyEntry] = (),
+                       method: Optional[SerializationMethod] = None) -> Dict[CacheKeyEntry, Any]:
+        """
+        批量获取缓存值（单次往返：只有字符串键时使用MGET，包含哈希键时使用管道）
+        
+        Args:
+            keys: 字符串值的缓存键，元素为键或 (键, 命名空间)
+            namespace: 未单独指定命名空间的键所用的命名空间
+            hash_keys: 哈希值的缓存键（读取全部字段），格式同keys
+            method: 字符串值的序列化方法，需与写入时一致
+            
+        Returns:
+            Dict: 以传入的元素为键；字符串键未命中时为None，哈希键未命中时为空字典
+        """
+        self._ensure_initialized()
+        
+        keys, hash_keys = list(keys), list(hash_keys)
+        result: Dict[CacheKeyEntry, Any] = {}
+        try:
+            pending = []
+            for entry in keys:
+                key, key_namespace = self._resolve_entry(entry, namespace)
+                cache_key = self._generate_key(key, key_namespace)
+                l1_ttl = self._get_l1_ttl(key, key_namespace)
+                if l1_ttl:
+                    local_data = self.local_tier.get(cache_key)
+                    if local_data is not None:
+                        result[entry] = self._deserialize_data(local_data, method)
+                        continue
+                pending.append((entry, cache_key, l1_ttl))
+            hash_pending = [
+                (entry, self._generate_key(*self._resolve_entry(entry, namespace)))
+                for entry in hash_keys
+            ]
+            if not pending and not hash_pending:
+                return result
+            
+            generation = self.local_tier.generation if self.local_tier is not None else None
+            if hash_pending:
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    for _, cache_key, _ in pending:
+                        pipe.get(cache_key)
+                    for _, cache_key in hash_pending:
+                        pipe.hgetall(cache_key)
+                    values = await pipe.execute()
+            else:
+                values = await self.redis_client.mget([cache_key for _, cache_key, _ in pending])
+            
+            for (entry, cache_key, l1_ttl), cached_data in zip(pending, values):
+                if cached_data is None:
+                    if self.local_tier is not None:
+                        self.local_tier.stats['l2_misses'] += 1
+                    result[entry] = None
+                    continue
+                if self.local_tier is not None:
+                    self.local_tier.stats['l2_hits'] += 1
+                if l1_ttl:
+                    self.local_tier.set(cache_key, cached_data, l1_ttl, generation)
+                result[entry] = self._deserialize_data(cached_data, method)
+            
+            for (entry, _), hash_data in zip(hash_pending, values[len(pending):]):
+                result[entry] = {
+                    field.decode('utf-8'): self._deserialize_data(value)
+                    for field, value in (hash_data or {}).items()
+                }
+            
+            logger.debug(f"批量获取缓存: {len(pending)}个键, {len(hash_pending)}个哈希")
+            return result
+            
+        except Exception as e:
+            logger.error(f"批量获取缓存失败: {str(e)}")
+            for entry in keys:
+                result.setdefault(entry, None)
+            for entry in hash_keys:
+                result.setdefault(entry, {})
+            return result
+    
+    async def set_many(self, items: Dict[CacheKeyEntry, Any], ttl: Optional[int] = None,
+                       namespace: str = "intent_system",
+                       ttls: Optional[Dict[CacheKeyEntry, Optional[int]]] = None,
+                       method: Optional[SerializationMethod] = None) -> bool:
+        """
+        批量设置缓存值（管道，单次往返）
+        
+        Args:
+            items: 缓存键到缓存值的映射，键为键或 (键, 命名空间)
+            ttl: 默认过期时间（秒），None表示永不过期
+            namespace: 未单独指定命名空间的键所用的命名空间
+            ttls: 单独指定过期时间的键
+            method: 序列化方法，None时使用缓存键所属模板的方法
+            
+        Returns:
+            bool: 是否全部设置成功
+        """
+        self._ensure_initialized()
+        
+        if not items:
+            return True
+        
+        try:
+            ttls = ttls or {}
+            local_entries = []
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for entry, value in items.items():
+                    key, key_namespace = self._resolve_entry(entry, namespace)
+                    cache_key = self._generate_key(key, key_namespace)
+                    serialized_data = self._serialize_data(
+                        value, self._get_serialization(key, key_namespace, method)
+                    )
+                    key_ttl = ttls.get(entry, ttl)
+                    if key_ttl:
+                        pipe.setex(cache_key, key_ttl, serialized_data)
+                    else:
+                        pipe.set(cache_key, serialized_data)
+                    
+                    l1_ttl = self._get_l1_ttl(key, key_namespace)
+                    if l1_ttl:
+                        local_entries.append((cache_key, serialized_data, min(l1_ttl, key_ttl) if key_ttl else l1_ttl))
+                results = await pipe.execute()
+            
+            if local_entries:
+                await self.local_tier.publish(self.redis_client, keys=[cache_key for cache_key, _, _ in local_entries])
+                for cache_key, serialized_data, l1_ttl in local_entries:
+                    self.local_tier.set(cache_key, serialized_data, l1_ttl)
+            
+            logger.debug(f"批量设置缓存: {len(items)}个键")
+            return all(results)
+            
+        except Exception as e:
+            logger.error(f"批量设置缓存失败: {str(e)}")
+            return False
+    
+    async def delete_many(self, keys: Iterable[CacheKeyEntry], namespace: str = "intent_system") -> int:
+        """
+        批量删除缓存（分批UNLINK，单次往返），并通知所有worker清除L1中的对应键
+        
+        Args:
+            keys: 缓存键，元素为键或 (键, 命名空间)
+            namespace: 未单独指定命名空间的键所用的命名空间
+            
+        Returns:
+            int: 删除的键数量
+        """
+        self._ensure_initialized()
+        
+        try:
+            cache_keys = [self._generate_key(*self._resolve_entry(entry, namespace)) for entry in keys]
+            deleted_count = await self._unlink_keys(cache_keys)
+            await self._publish_l1_keys(cache_keys)
+            
+            logger.debug(f"批量删除缓存: {len(cache_keys)}个键")
+            return deleted_count
+            
+        except Exception as e:
+            logger.error(f"批量删除缓存失败: {str(e)}")
+            return 0
+    
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          ttl: Optional[int] = None, namespace: str = "intent_system",
+                          method: Optional[SerializationMethod] = None,
+                          tags: Optional[Iterable[str]] = None,
+                          accept: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        读取缓存，未命中时调用loader加载并回填（防缓存击穿）
+        
+        - 单飞：同一进程内同一键的并发未命中只加载一次；跨worker通过Redis锁协调，
+          未获得锁的请求等待持锁者回填，超过 CACHE_LOAD_LOCK_WAIT 秒后自行加载
+        - 按所属模板的 stale_ttl：条目在Redis中多保留stale_ttl秒，逻辑过期后先返回旧值，
+          由一个请求在后台刷新
+        - 按所属模板的 xfetch_beta：逻辑过期前按加载耗时和剩余时间以一定概率提前在后台刷新
+        
+        L1命中时不读取剩余TTL，提前刷新只在读取Redis时判断。
+        
+        Args:
+            key: 缓存键
+            loader: 无参异步加载函数，返回None时不写入缓存
+            ttl: 逻辑过期时间（秒），None表示永不过期
+            namespace: 命名空间
+            method: 序列化方法，None时使用缓存键所属模板的方法
+            tags: 回填时登记的缓存标签
+            accept: 判断缓存值是否可用（如版本校验），不可用时按未命中处理
+            
+        Returns:
+            Any: 缓存值或loader的返回值
+        """
+        self._ensure_initialized()
+        
+        template_name = self.cache_strategy.get_template_name_for_key(key, namespace)
+        template = self.cache_strategy.templates[template_name] if template_name else None
+        stale_ttl = template.stale_ttl if template and ttl else 0
+        beta = template.xfetch_beta if template and ttl else 0.0
+        cache_key = self._generate_key(key, namespace)
+        load = _PendingLoad(key, namespace, cache_key, loader, ttl, stale_ttl, method, tags, accept,
+                            template_name)
+        
+        value, remaining = await self._get_with_remaining_ttl(key, namespace, method)
+        if value is None or (accept is not None and not accept(value)):
+            return await self._load_single_flight(load)
+        
+        if remaining is not None and (stale_ttl or beta):
+            logical_remaining = remaining - stale_ttl
+            if logical_remaining <= 0:
+                _load_stats['stale_served'] += 1
+                self._refresh_in_background(load)
+            elif beta and self._xfetch_due(load.timing_key, beta, logical_remaining):
+                _load_stats['early_refreshes'] += 1
+                self._refresh_in_background(load)
+        return value
+    
+    async def _get_with_remaining_ttl(self, key: str, namespace: str,
+                                      method: Optional[SerializationMethod]) -> Tuple[Any, Optional[float]]:
+        """读取缓存值及剩余TTL（秒）；L1命中或未设置过期时间时剩余TTL为None，读取失败按未命中处理"""
+        cache_key = self._generate_key(key, namespace)
+        try:
+            l1_ttl = self._get_l1_ttl(key, namespace)
+            if l1_ttl:
+                local_data = self.local_tier.get(cache_key)
+                if local_data is not None:
+                    return self._deserialize_data(local_data, method), None
+                generation = self.local_tier.generation
+            
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.get(cache_key)
+                pipe.pttl(cache_key)
+                cached_data, pttl = await pipe.execute()
+            
+            if cached_data is None:
+                if self.local_tier is not None:
+                    self.local_tier.stats['l2_misses'] += 1
+                return None, None
+            
+            if self.local_tier is not None:
+                self.local_tier.stats['l2_hits'] += 1
+            if l1_ttl:
+                self.local_tier.set(cache_key, cached_data, l1_ttl, generation)
+            return self._deserialize_data(cached_data, method), (pttl / 1000 if pttl and pttl > 0 else None)
+            
+        except Exception as e:
+            logger.error(f"获取缓存失败: {key}, 错误: {str(e)}")
+            return None, None
+    
+    @staticmethod
+    def _xfetch_due(timing_key: Optional[str], beta: float, logical_remaining: float) -> bool:
+        """XFetch：加载耗时 × beta × -ln(U) 超过剩余时间时提前刷新，越接近过期、加载越慢，概率越高"""
+        delta = _load_seconds.get(timing_key, DEFAULT_LOAD_SECONDS)
+        return -delta * beta * math.log(1.0 - random.random()) >= logical_remaining
+    
+    def _refresh_in_background(self, load: '_PendingLoad'):
+        """在后台刷新缓存条目（同一键已在加载时不重复发起）"""
+        if load.cache_key in _inflight_loads:
+            return
+        # 在空的上下文中创建任务，刷新不继承触发请求的请求级状态
+        task = contextvars.Context().run(asyncio.ensure_future, self._load_single_flight(load))
+        _background_refreshes.add(task)
+        task.add_done_callback(_on_background_refresh_done)
+    
+    async def _load_single_flight(self, load: '_PendingLoad') -> Any:
+        """同一进程内同一键只有一个加载在执行，其余请求等待其结果"""
+        inflight = _inflight_loads.get(load.cache_key)
+        if inflight is not None:
+            _load_stats['coalesced'] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # 执行加载的请求被取消，由当前请求重新加载
+                return await self._load_single_flight(load)
+        
+        future = asyncio.get_running_loop().create_future()
+        _inflight_loads[load.cache_key] = future
+        try:
+            value = await self._load_with_lock(load)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他请求等待时避免“异常未被获取”的告警
+            future.exception()
+            raise
+        finally:
+            if _inflight_loads.get(load.cache_key) is future:
+                del _inflight_loads[load.cache_key]
+    
+    async def _load_with_lock(self, load: '_PendingLoad') -> Any:
+        """持有跨worker加载锁时调用loader并回填；锁被其他worker持有时等待其回填"""
+        lock_key = self._generate_key(f"lock:{load.key}", load.namespace)
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis_client.set(
+                lock_key, token, nx=True, px=max(1, int(settings.CACHE_LOAD_LOCK_TIMEOUT * 1000))
+            )
+        except Exception as e:
+            logger.warning(f"获取缓存加载锁失败: {load.key}, 错误: {str(e)}")
+            acquired = None
+        
+        if not acquired:
+            _load_stats['lock_waits'] += 1
+            deadline = time.monotonic() + settings.CACHE_LOAD_LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                value, remaining = await self._get_with_remaining_ttl(load.key, load.namespace, load.method)
+                if value is not None and (load.accept is None or load.accept(value)) and (
+                        remaining is None or remaining > load.stale_ttl):
+                    return value
+        
+        try:
+            started_at = time.perf_counter()
+            value = await load.loader()
+            elapsed = time.perf_counter() - started_at
+            previous = _load_seconds.get(load.timing_key)
+            _load_seconds[load.timing_key] = elapsed if previous is None else previous * 0.8 + elapsed * 0.2
+            _load_stats['loads'] += 1
+            
+            if value is not None:
+                await self.set(load.key, value, ttl=load.ttl + load.stale_ttl if load.ttl else None,
+                               namespace=load.namespace, method=load.method, tags=load.tags)
+            return value
+        finally:
+            if acquired:
+                try:
+                    await self.redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    logger.warning(f"释放缓存加载锁失败: {load.key}, 错误: {str(e)}")
+    
     async def exists(self, key: str, namespace: str = "intent_system") -> bool:
         """
         检查缓存是否存在
@@ -309,31 +985,36 @@ class CacheService:
             return None
     
     async def get_keys_by_pattern(self, pattern: str, 
-                                namespace: str = "intent_system") -> List[str]:
+                                namespace: str = "intent_system",
+                                limit: Optional[int] = None) -> List[str]:
         """
-        根据模式获取键列表
+        根据模式获取键列表（SCAN增量遍历，不阻塞Redis）
         
         Args:
             pattern: 键模式
             namespace: 命名空间
+            limit: 最多返回的键数量，None表示不限制
             
         Returns:
-            List[str]: 匹配的键列表
+            List[str]: 匹配的键列表（不含命名空间）
         """
         self._ensure_initialized()
         
         try:
             search_pattern = self._generate_key(pattern, namespace)
-            keys = await self.redis_client.keys(search_pattern)
-            
-            # 移除命名空间前缀
             namespace_prefix = f"{namespace}:"
-            cleaned_keys = [
-                key.decode('utf-8').replace(namespace_prefix, '') 
-                for key in keys
-            ]
             
-            return cleaned_keys
+            # SCAN可能重复返回同一个键，按首次出现去重
+            cleaned_keys: Dict[str, None] = {}
+            async for key in self.redis_client.scan_iter(match=search_pattern,
+                                                         count=settings.CACHE_SCAN_COUNT):
+                key = key.decode('utf-8')
+                # 只移除开头的命名空间前缀
+                cleaned_keys[key[len(namespace_prefix):] if key.startswith(namespace_prefix) else key] = None
+                if limit is not None and len(cleaned_keys) >= limit:
+                    break
+            
+            return list(cleaned_keys)
             
         except Exception as e:
             logger.error(f"根据模式获取键失败: {pattern}, 错误: {str(e)}")
@@ -342,7 +1023,7 @@ class CacheService:
     async def delete_by_pattern(self, pattern: str, 
                               namespace: str = "intent_system") -> int:
         """
-        根据模式删除缓存
+        根据模式删除缓存（SCAN增量遍历，每攒满一批键UNLINK一次）
         
         Args:
             pattern: 键模式
@@ -355,14 +1036,25 @@ class CacheService:
         
         try:
             search_pattern = self._generate_key(pattern, namespace)
-            keys = await self.redis_client.keys(search_pattern)
             
-            if keys:
-                deleted_count = await self.redis_client.delete(*keys)
-                logger.debug(f"批量删除缓存: {len(keys)}个键")
-                return deleted_count
-            
-            return 0
+            if self.local_tier is not None:
+                await self.local_tier.publish(self.redis_client, patterns=[search_pattern])
+            
+            batch_size = max(1, settings.CACHE_UNLINK_BATCH)
+            deleted_count = 0
+            batch = []
+            async for key in self.redis_client.scan_iter(match=search_pattern,
+                                                         count=settings.CACHE_SCAN_COUNT):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted_count += await self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted_count += await self.redis_client.unlink(*batch)
+            
+            if deleted_count:
+                logger.debug(f"批量删除缓存: {deleted_count}个键")
+            return deleted_count
             
         except Exception as e:
             logger.error(f"根据模式删除缓存失败: {pattern}, 错误: {str(e)}")
@@ -386,7 +1078,7 @@ class CacheService:
         
         try:
             cache_key = self._generate_key(key, namespace)
-            serialized_data = self._serialize_data(value)
+            serialized_data = self._serialize_data(value, self._get_serialization(key, namespace, None))
             
             result = await self.redis_client.hset(cache_key, field, serialized_data)
             logger.debug(f"哈希字段设置: {cache_key}.{field}")
@@ -424,6 +1116,89 @@ class CacheService:
             logger.error(f"获取哈希字段失败: {key}.{field}, 错误: {str(e)}")
             return None
     
+    async def set_hash_fields(self, key: str, mapping: Dict[str, Any],
+                              ttl: Optional[int] = None, replace: bool = False,
+                              namespace: str = "intent_system",
+                              version_field: Optional[str] = None) -> bool:
+        """
+        批量设置哈希字段（单次往返）
+        
+        Args:
+            key: 哈希键
+            mapping: 字段名到字段值的映射
+            ttl: 过期时间（秒），None表示不修改过期时间
+            replace: 是否先删除原有哈希（整体替换）
+            namespace: 命名空间
+            version_field: 版本字段，指定时在同一事务中自增1（见 replace_hash_if_version）
+            
+        Returns:
+            bool: 是否设置成功
+        """
+        self._ensure_initialized()
+        
+        try:
+            cache_key = self._generate_key(key, namespace)
+            method = self._get_serialization(key, namespace, None)
+            serialized = {
+                field: self._serialize_data(value, method) for field, value in mapping.items()
+            }
+            
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                if replace:
+                    pipe.delete(cache_key)
+                if serialized:
+                    pipe.hset(cache_key, mapping=serialized)
+                if version_field:
+                    pipe.hincrby(cache_key, version_field, 1)
+                if ttl:
+                    pipe.expire(cache_key, ttl)
+                await pipe.execute()
+            
+            logger.debug(f"哈希字段批量设置: {cache_key}, 字段数: {len(serialized)}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"批量设置哈希字段失败: {key}, 错误: {str(e)}")
+            return False
+    
+    async def replace_hash_if_version(self, key: str, mapping: Dict[str, Any], version_field: str,
+                                      expected_version: Optional[int], ttl: Optional[int] = None,
+                                      namespace: str = "intent_system") -> bool:
+        """
+        仅当哈希版本未变化时整体替换哈希（原子操作）
+        
+        用于从数据源重建哈希：读取时记下版本，重建期间有写入方通过 set_hash_fields(version_field=...)
+        更新过该哈希时放弃写入，避免用旧快照覆盖新数据
+        
+        Args:
+            key: 哈希键
+            mapping: 替换后的字段名到字段值的映射
+            version_field: 版本字段
+            expected_version: 读取时的版本，版本字段不存在时为None
+            ttl: 过期时间（秒）
+            namespace: 命名空间
+            
+        Returns:
+            bool: 是否已替换（版本已变化或出错时返回False）
+        """
+        self._ensure_initialized()
+        
+        try:
+            cache_key = self._generate_key(key, namespace)
+            method = self._get_serialization(key, namespace, None)
+            args: List[Any] = [version_field, '' if expected_version is None else str(expected_version), ttl or 0]
+            for field, value in mapping.items():
+                args.extend((field, self._serialize_data(value, method)))
+            
+            replaced = await self.redis_client.eval(_REPLACE_HASH_IF_VERSION_SCRIPT, 1, cache_key, *args)
+            if not replaced:
+                logger.debug(f"哈希版本已变化，放弃替换: {cache_key}")
+            return bool(replaced)
+            
+        except Exception as e:
+            logger.error(f"按版本替换哈希失败: {key}, 错误: {str(e)}")
+            return False
+    
     async def get_all_hash(self, key: str, 
                           namespace: str = "intent_system") -> Dict[str, Any]:
         """
@@ -495,7 +1270,8 @@ class CacheService:
         """
         cache_key = self.get_cache_key("intent_recognition", input_hash=input_hash, user_id=user_id or "anonymous")
         ttl = self.cache_strategy.get_ttl("intent_recognition")
-        return await self.set(cache_key, result_data, ttl=ttl)
+        tags = [CacheTag.user(user_id)] if user_id else None
+        return await self.set(cache_key, result_data, ttl=ttl, tags=tags)
     
     async def get_nlu_result(self, input_hash: str, user_id: str = "") -> Optional[Dict]:
         """
@@ -511,6 +1287,24 @@ class CacheService:
         cache_key = self.get_cache_key("intent_recognition", input_hash=input_hash, user_id=user_id or "anonymous")
         return await self.get(cache_key)
     
+    async def get_or_load_nlu_result(self, input_hash: str, loader: Callable[[], Awaitable[Optional[Dict]]],
+                                     user_id: str = "") -> Optional[Dict]:
+        """
+        获取NLU识别结果缓存，未命中时调用loader识别并缓存（同一输入的并发请求只识别一次）
+        
+        Args:
+            input_hash: 输入文本的哈希值
+            loader: 识别函数，返回识别结果，返回None时不缓存
+            user_id: 用户ID（可选）
+            
+        Returns:
+            Dict: 识别结果
+        """
+        cache_key = self.get_cache_key("intent_recognition", input_hash=input_hash, user_id=user_id or "anonymous")
+        ttl = self.cache_strategy.get_ttl("intent_recognition")
+        tags = [CacheTag.user(user_id)] if user_id else None
+        return await self.get_or_load(cache_key, loader, ttl=ttl, tags=tags, accept=bool)
+    
     async def cache_session_context(self, session_id: str, context_data: Dict) -> bool:
         """
         缓存会话上下文
@@ -524,7 +1318,7 @@ class CacheService:
         """
         cache_key = self.get_cache_key("session_context", session_id=session_id)
         ttl = self.cache_strategy.get_ttl("session_context")
-        return await self.set(cache_key, context_data, ttl=ttl)
+        return await self.set(cache_key, context_data, ttl=ttl, tags=[CacheTag.session(session_id)])
     
     async def get_session_context(self, session_id: str) -> Optional[Dict]:
         """
@@ -573,12 +1367,19 @@ class CacheService:
             else:
                 stats["hit_rate"] = 0.0
             
+            stats["tiers"] = self.get_tier_stats()
+            stats["codec"] = self.codec.get_stats()
+            stats["loads"] = get_cache_load_stats()
             return stats
             
         except Exception as e:
             logger.error(f"获取缓存统计信息失败: {str(e)}")
             return {}
     
+    def get_tier_stats(self) -> Dict[str, Any]:
+        """获取本进程L1/L2各层的命中统计"""
+        return get_cache_tier_stats()
+    
     async def clear_cache_namespace(self, namespace: str = "intent_system") -> int:
         """
         清空指定命名空间的所有缓存
@@ -589,21 +1390,22 @@ class CacheService:
         Returns:
             int: 删除的键数量
         """
-        pattern = f"{namespace}:*"
-        return await self.delete_by_pattern(pattern, "")
+        return await self.delete_by_pattern("*", namespace)
     
-    def generate_input_hash(self, user_input: str, user_id: str = "") -> str:
+    def generate_input_hash(self, user_input: str, *scopes: Any) -> str:
         """
         生成用户输入的哈希值（用于缓存NLU结果）
         
+        输入先经过归一化，摘要跨进程、跨worker稳定，不受Python hash随机化影响
+        
         Args:
             user_input: 用户输入
-            user_id: 用户ID（可选）
+            *scopes: 附加作用域（如用户ID、意图配置版本号）
             
         Returns:
             str: 哈希值
         """
-        return self.cache_strategy.generate_hash(user_input, user_id)
+        return self.cache_strategy.generate_content_hash(user_input, *scopes)
     
     async def cache_conversation_history(self, session_id: str, history_data: List[Dict], limit: int = 50) -> bool:
         """
@@ -617,9 +1419,9 @@ class CacheService:
         Returns:
             bool: 是否缓存成功
         """
-        cache_key = self.get_cache_key("conversation_history", session_id=session_id, limit=limit)
+        cache_key = self.get_cache_key("conversation_history", session_id=session_id)
         ttl = self.cache_strategy.get_ttl("conversation_history")
-        return await self.set(cache_key, history_data, ttl=ttl)
+        return await self.set_hash_fields(cache_key, {str(limit): history_data}, ttl=ttl)
     
     async def get_conversation_history(self, session_id: str, limit: int = 50) -> Optional[List[Dict]]:
         """
@@ -632,8 +1434,21 @@ class CacheService:
         Returns:
             List[Dict]: 历史对话数据
         """
-        cache_key = self.get_cache_key("conversation_history", session_id=session_id, limit=limit)
-        return await self.get(cache_key)
+        cache_key = self.get_cache_key("conversation_history", session_id=session_id)
+        return await self.get_hash(cache_key, str(limit))
+    
+    async def invalidate_conversation_history(self, session_id: str) -> bool:
+        """
+        失效会话的对话历史缓存（所有limit）
+        
+        Args:
+            session_id: 会话ID
+            
+        Returns:
+            bool: 是否删除成功
+        """
+        cache_key = self.get_cache_key("conversation_history", session_id=session_id)
+        return await self.delete(cache_key)
     
     async def cache_slot_values(self, session_id: str, intent_name: str, slot_values: Dict) -> bool:
         """
@@ -705,6 +1520,7 @@ async def get_cache_service() -> CacheService:
     if _cache_service is None:
         _cache_service = CacheService()
         await _cache_service.initialize()
+        await _cache_service.start_invalidation_listener()
     
     return _cache_service
 
@@ -14,6 +14,7 @@ import time
 from src.schemas.chat import ChatResponse, SessionMetadata
 from src.models.intent import Intent
 from src.utils.logger import get_logger
+from src.utils.request_context import request_memo
 
 logger = get_logger(__name__)
 
@@ -330,7 +331,14 @@ class ConfigDrivenIntentProcessor:
             return self._create_error_response(f"系统错误: {str(e)}", intent, slots, context)
     
     async def _get_handler_config(self, intent_id: int) -> Optional[Dict]:
-        """获取处理器配置"""
+        """获取处理器配置（同一请求内复用）"""
+        return await request_memo(
+            'handler_config', intent_id,
+            lambda: self._load_handler_config(intent_id)
+        )
+    
+    async def _load_handler_config(self, intent_id: int) -> Optional[Dict]:
+        """从数据库加载处理器配置"""
         try:
             from src.models.intent import Intent
             
@@ -495,7 +503,14 @@ class ConfigDrivenIntentProcessor:
         )
     
     async def _get_response_template(self, intent_id: int, template_type: str) -> str:
-        """获取响应模板"""
+        """获取响应模板（同一请求内复用）"""
+        return await request_memo(
+            'response_template', (intent_id, template_type),
+            lambda: self._load_response_template(intent_id, template_type)
+        )
+    
+    async def _load_response_template(self, intent_id: int, template_type: str) -> str:
+        """从数据库加载响应模板"""
         try:
             from src.models.intent import Intent
             
@@ -14,6 +14,7 @@ from src.utils.context_mapper import (
 from src.schemas.chat import ChatContext
 from src.services.user_preference_service import get_user_preference_service
 from src.services.cache_service import CacheService
+from src.core.cache_strategy import CacheTag
 from src.services.ragflow_service import RagflowService
 from src.services.slot_value_service import SlotValueService, get_slot_value_service
 from src.core.fallback_manager import (
@@ -22,6 +23,8 @@ from src.core.fallback_manager import (
 from src.core.intelligent_fallback_decision import (
     IntelligentFallbackDecisionEngine, DecisionContext, get_decision_engine
 )
+from src.utils.db_executor import run_db
+from src.utils.request_context import request_memo, prime_request_memo, peek_request_memo, invalidate_request_memo
 from src.utils.logger import get_logger
 from src.schemas.chat import ChatContext
 
@@ -46,6 +49,33 @@ class ConversationService:
         self.fallback_manager = get_fallback_manager(cache_service)
         self.decision_engine = get_decision_engine(cache_service)
     
+    async def prefetch_session_state(self, session_id: str, history_limit: int = 10) -> None:
+        """会话启动预取：一次往返读取会话缓存、对话历史缓存和物化的槽位状态，写入请求级记忆
+        
+        之后本请求内的 get_or_create_session、get_conversation_history 和 get_current_slot_values
+        直接使用预取结果，未命中的部分仍按原路径加载
+        
+        Args:
+            session_id: 会话ID
+            history_limit: 对话历史的记录数限制（与随后读取历史时的limit一致）
+        """
+        session_key = (self.cache_service.get_cache_key('session_basic', session_id=session_id), self.cache_namespace)
+        history_key = self.cache_service.get_cache_key('conversation_history', session_id=session_id)
+        slot_state_key = self.cache_service.get_cache_key('session_slot_state', session_id=session_id)
+        
+        try:
+            cached = await self.cache_service.get_many([session_key], hash_keys=[history_key, slot_state_key])
+        except Exception as e:
+            logger.warning(f"会话状态预取失败: {session_id}, 错误: {str(e)}")
+            return
+        
+        if cached.get(session_key):
+            prime_request_memo('session_cache', session_id, cached[session_key])
+        history = cached.get(history_key, {}).get(str(history_limit))
+        if history is not None:
+            prime_request_memo('conversation_history', (session_id, history_limit), history)
+        self.slot_value_service.prime_session_slot_state(session_id, cached.get(slot_state_key))
+    
     async def get_or_create_session(self, user_id: str, session_id: Optional[str] = None, context: Optional[ChatContext] = None) -> Dict[str, Any]:
         """获取或创建会话
         
@@ -60,13 +90,16 @@ class ConversationService:
         if session_id:
             # 尝试从缓存获取会话
             cache_key = self.cache_service.get_cache_key('session_basic', session_id=session_id)
-            cached_session = await self.cache_service.get(cache_key, namespace=self.cache_namespace)
+            cached_session = peek_request_memo('session_cache', session_id)
+            if cached_session is None:
+                cached_session = await self.cache_service.get(cache_key, namespace=self.cache_namespace)
             
             if cached_session:
                 logger.debug(f"从缓存获取会话: {session_id}")
                 # 将缓存数据转换为Session对象
                 try:
-                    session = Session.get_by_id(cached_session['id'])
+                    session = await run_db(Session.get_by_id, cached_session['id'])
+                    prime_request_memo('session', session.session_id, session)
                     # V2.2重构: 从slot_values表获取槽位信息
                     current_slots = {}
                     try:
@@ -87,7 +120,8 @@ class ConversationService:
             
             # 从数据库获取会话
             try:
-                session = Session.get(
+                session = await run_db(
+                    Session.get,
                     Session.session_id == session_id,
                     Session.user_id == user_id
                 )
@@ -98,6 +132,8 @@ class ConversationService:
                     # 会话过期，跳转到创建新会话逻辑
                     raise Session.DoesNotExist()
                 
+                prime_request_memo('session', session.session_id, session)
+                
                 # 缓存会话信息
                 session_data = {
                     'id': session.id,
@@ -107,7 +143,8 @@ class ConversationService:
                     'created_at': session.created_at.isoformat()
                 }
                 await self.cache_service.set(cache_key, session_data, 
-                                           ttl=3600, namespace=self.cache_namespace)
+                                           ttl=3600, namespace=self.cache_namespace,
+                                           tags=[CacheTag.session(session.session_id), CacheTag.user(user_id)])
                 
                 # V2.2重构: 从slot_values表获取槽位信息
                 current_slots = {}
@@ -131,13 +168,11 @@ class ConversationService:
         if not session_id:
             try:
                 # 查找用户最近的活跃会话
-                recent_session = Session.select().where(
-                    Session.user_id == user_id,
-                    Session.session_state == 'active'
-                ).order_by(Session.updated_at.desc()).first()
+                recent_session = await run_db(self._find_recent_active_session, user_id)
                 
                 if recent_session and recent_session.is_active():
                     logger.info(f"找到用户最近活跃会话: {recent_session.session_id}")
+                    prime_request_memo('session', recent_session.session_id, recent_session)
                     # 返回现有会话
                     current_slots = {}
                     try:
@@ -168,23 +203,16 @@ class ConversationService:
         )
         
         # 确保用户存在
-        from src.models.conversation import User
-        try:
-            user = User.get(User.user_id == user_id)
-        except User.DoesNotExist:
-            user = User.create(
-                user_id=user_id,
-                user_type='individual',
-                is_active=True
-            )
-            logger.info(f"创建新用户: {user_id}")
+        await run_db(self._ensure_user, user_id)
         
-        session = Session.create(
+        session = await run_db(
+            Session.create,
             session_id=new_session_id,
             user_id=user_id,
             context=json.dumps(initial_context),
             session_state='active'
         )
+        prime_request_memo('session', session.session_id, session)
         
         # 缓存新会话 - 使用标准化数据结构
         cache_key = self.cache_service.get_cache_key('session_basic', session_id=new_session_id)
@@ -197,7 +225,8 @@ class ConversationService:
         ).model_dump()
         
         await self.cache_service.set(cache_key, session_data, 
-                                   ttl=3600, namespace=self.cache_namespace)
+                                   ttl=3600, namespace=self.cache_namespace,
+                                   tags=[CacheTag.session(new_session_id), CacheTag.user(user_id)])
         
         logger.info(f"创建新会话: {new_session_id} for user: {user_id}")
         
@@ -224,6 +253,34 @@ class ConversationService:
             'conversation_history': initial_context.get('conversation_history', [])
         }
     
+    async def _get_session(self, session_id: str) -> Session:
+        """根据会话ID获取会话对象（同一请求内复用），不存在时抛出Session.DoesNotExist"""
+        return await request_memo(
+            'session', session_id,
+            lambda: run_db(Session.get, Session.session_id == session_id)
+        )
+    
+    def _find_recent_active_session(self, user_id: str) -> Optional[Session]:
+        """查找用户最近的活跃会话（同步，在数据库线程池中执行）"""
+        return (Session.select()
+                .where(Session.user_id == user_id, Session.session_state == 'active')
+                .order_by(Session.updated_at.desc())
+                .first())
+    
+    def _ensure_user(self, user_id: str):
+        """确保用户记录存在（同步，在数据库线程池中执行）"""
+        from src.models.conversation import User
+        try:
+            return User.get(User.user_id == user_id)
+        except User.DoesNotExist:
+            user = User.create(
+                user_id=user_id,
+                user_type='individual',
+                is_active=True
+            )
+            logger.info(f"创建新用户: {user_id}")
+            return user
+    
     async def save_conversation(self, session_id: str, user_input: str, intent: Optional[str],
                               slots: Dict[str, Any], response: Dict[str, Any],
                               confidence: float = 0.0) -> Conversation:
@@ -242,13 +299,14 @@ class ConversationService:
         """
         # 获取会话
         try:
-            session = Session.get(Session.session_id == session_id)
+            session = await self._get_session(session_id)
         except Session.DoesNotExist:
             logger.error(f"会话不存在: {session_id}")
             raise ValueError(f"会话不存在: {session_id}")
         
         # V2.2重构: 创建对话记录，不再直接保存slots到JSON字段
-        conversation = Conversation.create(
+        conversation = await run_db(
+            Conversation.create,
             session_id=session.session_id,
             user_id=session.user_id,
             user_input=user_input,
@@ -271,11 +329,18 @@ class ConversationService:
         
         # 更新会话的最后活动时间
         session.updated_at = datetime.now()
-        session.save()
+        await run_db(session.save)
         
-        # 更新缓存中的会话信息
-        cache_key = self.cache_service.get_cache_key('session_basic', session_id=session_id)
-        await self.cache_service.delete(cache_key, namespace=self.cache_namespace)
+        # 失效缓存中的会话信息和对话历史（一次往返）
+        invalidate_request_memo('session_cache', session_id)
+        invalidate_request_memo('conversation_history')
+        try:
+            await self.cache_service.delete_many([
+                (self.cache_service.get_cache_key('session_basic', session_id=session_id), self.cache_namespace),
+                self.cache_service.get_cache_key('conversation_history', session_id=session_id)
+            ])
+        except Exception as e:
+            logger.warning(f"失效会话缓存失败: {session_id}, 错误: {str(e)}")
         
         logger.info(f"保存对话记录: session={session_id}, intent={intent}")
         return conversation
@@ -290,78 +355,88 @@ class ConversationService:
         Returns:
             List[Dict]: 对话历史列表
         """
-        # 暂时跳过缓存，直接从数据库获取以调试问题
-        logger.info(f"直接从数据库获取对话历史: {session_id}")
-        # cache_key = self.cache_service.get_cache_key('conversation_history', session_id=session_id, limit=limit)
-        # cached_history = await self.cache_service.get(cache_key, namespace=self.cache_namespace)
-        # 
-        # if cached_history:
-        #     logger.debug(f"从缓存获取对话历史: {session_id}")
-        #     return cached_history
-        
-        # 从数据库获取
         try:
-            session = Session.get(Session.session_id == session_id)
-            conversations = (Conversation
-                           .select()
-                           .where(Conversation.session_id == session.session_id)
-                           .order_by(Conversation.created_at.desc())
-                           .limit(limit))
-            
-            history = []
-            successful_history = []  # 用于缓存的成功记录
-            
-            for conv in conversations:
-                # V2.2重构: 从slot_values表获取槽位信息
-                slots = {}
-                try:
-                    slots = await self.slot_value_service.get_conversation_slots(conv.id)
-                except Exception as e:
-                    logger.warning(f"获取对话槽位失败: conversation_id={conv.id}, error={str(e)}")
-                
-                # 解析系统响应
-                try:
-                    response = json.loads(conv.system_response) if conv.system_response else {}
-                except (json.JSONDecodeError, AttributeError):
-                    response = conv.system_response or ""
-                
-                # 调试日志：显示从数据库读取到的原始数据
-                logger.info(f"数据库记录 {conv.id}: user_input='{conv.user_input}', intent='{conv.intent_recognized}', status='{conv.status}', response_type='{conv.response_type}'")
-                
-                record = {
-                    'id': conv.id,
-                    'user_input': conv.user_input,
-                    'intent': conv.intent_recognized,
-                    'slots': slots,
-                    'response': response,
-                    'confidence': float(conv.confidence_score) if conv.confidence_score else 0.0,
-                    'status': conv.status,
-                    'response_type': conv.response_type,
-                    'created_at': conv.created_at.isoformat()
-                }
-                
-                history.append(record)
-                
-                # 只有成功的对话记录才添加到缓存中
-                # 排除系统错误、槽位验证错误等
-                if (conv.status not in ['system_error', 'validation_error', 'parsing_error'] and 
-                    conv.response_type not in ['system_error', 'validation_error']):
-                    successful_history.append(record)
-            
-            # 保持时间倒序排列（最新的记录在前面）
-            # history.reverse()
-            # successful_history.reverse()
-            
-            # 暂时跳过缓存以调试问题
-            # cache_key = self.cache_service.get_cache_key('conversation_history', session_id=session_id, limit=limit)
-            # await self.cache_service.set(cache_key, successful_history, 
-            #                            ttl=300, namespace=self.cache_namespace)
-            
-            return history
-            
-        except Session.DoesNotExist:
-            logger.warning(f"会话不存在: {session_id}")
+            cached_history = peek_request_memo('conversation_history', (session_id, limit))
+            if cached_history is None:
+                cached_history = await self.cache_service.get_conversation_history(session_id, limit)
+            if cached_history is not None:
+                logger.debug(f"从缓存获取对话历史: {session_id}")
+                return cached_history
+        except Exception as e:
+            logger.warning(f"读取对话历史缓存失败: {session_id}, 错误: {str(e)}")
+        
+        # 从数据库获取（对话记录与槽位值共两次查询）
+        history = await run_db(self._load_conversation_history, session_id, limit)
+        
+        try:
+            await self.cache_service.cache_conversation_history(session_id, history, limit)
+        except Exception as e:
+            logger.warning(f"写入对话历史缓存失败: {session_id}, 错误: {str(e)}")
+        
+        return history
+    
+    def _load_conversation_history(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """批量加载对话历史及其槽位值（同步，在数据库线程池中执行）"""
+        from src.models.slot_value import SlotValue
+        
+        conversations = list(
+            Conversation
+            .select()
+            .where(Conversation.session_id == session_id)
+            .order_by(Conversation.created_at.desc())
+            .limit(limit)
+        )
+        if not conversations:
             return []
+        
+        # V2.2重构: 从slot_values表获取槽位信息，一次IN查询取回所有对话的槽位
+        slots_by_conversation: Dict[int, Dict[str, Any]] = {}
+        slot_values = (
+            SlotValue
+            .select()
+            .where(SlotValue.conversation.in_([conv.id for conv in conversations]))
+            .where(SlotValue.validation_status.in_(['valid', 'corrected', 'pending']))
+            .order_by(SlotValue.created_at)
+        )
+        for slot_value in slot_values:
+            slots_by_conversation.setdefault(slot_value.conversation_id, {})[slot_value.slot_name] = {
+                'value': slot_value.get_final_value(),
+                'confidence': slot_value.confidence,
+                'status': slot_value.validation_status,
+                'created_at': slot_value.created_at
+            }
+        
+        # 保持时间倒序排列（最新的记录在前面）
+        history = []
+        for conv in conversations:
+            # 解析系统响应
+            try:
+                response = json.loads(conv.system_response) if conv.system_response else {}
+            except (json.JSONDecodeError, AttributeError):
+                response = conv.system_response or ""
+            
+            history.append({
+                'id': conv.id,
+                'user_input': conv.user_input,
+                'intent': conv.intent_recognized,
+                'slots': slots_by_conversation.get(conv.id, {}),
+                'response': response,
+                'confidence': float(conv.confidence_score) if conv.confidence_score else 0.0,
+                'status': conv.status,
+                'response_type': conv.response_type,
+                'created_at': conv.created_at.isoformat()
+            })
+        
+        logger.debug(f"从数据库加载对话历史: session={session_id}, 记录数={len(history)}")
+        return history
+    
+    async def invalidate_conversation_history(self, session_id: str):
+        """失效会话的对话历史缓存（新对话轮次或槽位写入后调用）"""
+        invalidate_request_memo('conversation_history')
+        try:
+            await self.cache_service.invalidate_conversation_history(session_id)
+        except Exception as e:
+            logger.warning(f"失效对话历史缓存失败: {session_id}, 错误: {str(e)}")
     
     async def update_session_context(self, session_id: str, context_updates: Dict[str, Any]) -> bool:
         """更新会话上下文
@@ -374,7 +449,7 @@ class ConversationService:
             bool: 更新是否成功
         """
         try:
-            session = Session.get(Session.session_id == session_id)
+            session = await self._get_session(session_id)
             current_context = session.get_context()
             
             # 合并上下文
@@ -406,7 +481,7 @@ class ConversationService:
             IntentAmbiguity: 歧义记录对象
         """
         try:
-            session = Session.get(Session.session_id == session_id)
+            session = await self._get_session(session_id)
             
             # 查找或创建对话记录
             try:
@@ -429,6 +504,7 @@ class ConversationService:
                 user_input=user_input,
                 candidate_intents=json.dumps(candidates, ensure_ascii=False)
             )
+            await self.invalidate_conversation_history(session_id)
             
             logger.info(f"记录意图歧义: session={session_id}, candidates_count={len(candidates)}")
             return ambiguity
@@ -604,7 +680,7 @@ class ConversationService:
             IntentTransfer: 转换记录对象
         """
         try:
-            session = Session.get(Session.session_id == session_id)
+            session = await self._get_session(session_id)
             
             transfer = IntentTransfer.create(
                 session=session,
@@ -630,7 +706,7 @@ class ConversationService:
             bool: 结束是否成功
         """
         try:
-            session = Session.get(Session.session_id == session_id)
+            session = await self._get_session(session_id)
             session.is_active = False
             session.status = 'ended'
             session.ended_at = datetime.now()
@@ -645,9 +721,11 @@ class ConversationService:
             for key in cache_keys:
                 if '*' in key:
                     # 清除匹配的所有键
-                    await self.cache_service.delete_pattern(key, namespace=self.cache_namespace)
+                    await self.cache_service.delete_by_pattern(key, namespace=self.cache_namespace)
                 else:
                     await self.cache_service.delete(key, namespace=self.cache_namespace)
+            # 登记到会话标签的缓存条目（如会话上下文）一并失效
+            await self.cache_service.invalidate_tags([CacheTag.session(session_id)])
             
             logger.info(f"结束会话: {session_id}")
             return True
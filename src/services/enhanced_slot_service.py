@@ -12,7 +12,9 @@ from src.utils.slot_data_transformer import SlotDataTransformer
 from src.schemas.chat import SlotInfo
 from src.models.intent import Intent
 from src.models.slot_value import SlotValue
+from src.utils.db_executor import run_db
 from src.utils.logger import get_logger
+from src.utils.request_context import request_memo
 
 logger = get_logger(__name__)
 
@@ -576,7 +578,14 @@ class EnhancedSlotService:
             return str(value)
     
     async def _get_slot_definitions(self, intent: Intent) -> Dict[str, Dict[str, Any]]:
-        """获取槽位定义"""
+        """获取槽位定义（同一请求内按意图复用）"""
+        return await request_memo(
+            'slot_definition_map', intent.id,
+            lambda: self._load_slot_definitions(intent)
+        )
+    
+    async def _load_slot_definitions(self, intent: Intent) -> Dict[str, Dict[str, Any]]:
+        """从缓存或数据库加载槽位定义"""
         try:
             # 从缓存或数据库获取槽位定义
             cache_key = self.cache_service.get_cache_key('slot_definitions', intent_name=intent.intent_name)
@@ -585,7 +594,9 @@ class EnhancedSlotService:
             if not definitions:
                 # 从数据库查询
                 from src.models.slot import Slot
-                slots = Slot.select().where(Slot.intent_id == intent.id, Slot.is_active == True)
+                slots = await run_db(
+                    lambda: list(Slot.select().where(Slot.intent_id == intent.id, Slot.is_active == True))
+                )
                 
                 definitions = {}
                 for slot in slots:
@@ -608,10 +619,7 @@ class EnhancedSlotService:
     async def _get_slot_definitions_by_name(self, intent_name: str) -> Dict[str, Dict[str, Any]]:
         """根据意图名称获取槽位定义"""
         try:
-            from src.models.intent import Intent
-            from src.models.slot import Slot
-            
-            intent = Intent.get(Intent.intent_name == intent_name)
+            intent = await self._get_intent_by_name(intent_name)
             return await self._get_slot_definitions(intent)
         except Exception as e:
             logger.error(f"根据意图名获取槽位定义失败: {intent_name}, 错误: {str(e)}")
@@ -620,17 +628,27 @@ class EnhancedSlotService:
     async def _get_slot_id_mapping(self, intent_name: str) -> Dict[str, int]:
         """获取槽位名到ID的映射"""
         try:
-            from src.models.intent import Intent
             from src.models.slot import Slot
             
-            intent = Intent.get(Intent.intent_name == intent_name)
-            slots = Slot.select().where(Slot.intent_id == intent.id, Slot.is_active == True)
+            intent = await self._get_intent_by_name(intent_name)
+            slots = await run_db(
+                lambda: list(Slot.select().where(Slot.intent_id == intent.id, Slot.is_active == True))
+            )
             
             return {slot.slot_name: slot.id for slot in slots}
         except Exception as e:
             logger.error(f"获取槽位ID映射失败: {intent_name}, 错误: {str(e)}")
             return {}
     
+    async def _get_intent_by_name(self, intent_name: str) -> Intent:
+        """根据名称获取活跃意图（与意图服务共享请求内记忆），不存在时抛出Intent.DoesNotExist"""
+        from src.services.intent_service import load_active_intent
+        
+        intent = await request_memo('intent', intent_name, lambda: load_active_intent(intent_name))
+        if intent is None:
+            raise Intent.DoesNotExist(f"意图不存在: {intent_name}")
+        return intent
+    
     async def _update_slot_cache(self, session_id: str, slots: Dict[str, SlotInfo]):
         """更新槽位缓存"""
         try:
@@ -767,15 +785,8 @@ class EnhancedSlotService:
 
 # 服务实例获取函数
 async def get_enhanced_slot_service() -> EnhancedSlotService:
-    """获取增强槽位服务实例"""
-    from src.services.cache_service import get_cache_service
-    from src.services.slot_service import SlotService
-    from src.core.nlu_engine import NLUEngine
-    
-    # 使用异步方式获取已初始化的缓存服务
-    cache_service = await get_cache_service()
-    from src.api.dependencies import get_nlu_engine
-    nlu_engine = await get_nlu_engine()
-    slot_service = SlotService(cache_service, nlu_engine)
+    """获取增强槽位服务实例（使用应用级服务容器中的共享实例）"""
+    from src.api.dependencies import get_services
     
-    return EnhancedSlotService(slot_service, cache_service)
\ No newline at end of file
+    services = await get_services()
+    return services.enhanced_slot_service
\ No newline at end of file
@@ -1020,7 +1020,7 @@ class FunctionService:
                 del self._registered_functions[function_name]
                 del self._function_metadata[function_name]
         else:
-            await self.cache_service.clear_namespace(self.cache_namespace)
+            await self.cache_service.clear_cache_namespace(self.cache_namespace)
             self._registered_functions.clear()
             self._function_metadata.clear()
         
@@ -1,6 +1,8 @@
 """
 意图识别服务
 """
+import os
+import time
 from typing import Dict, List, Optional, Tuple, Any
 from datetime import datetime
 
@@ -8,10 +10,17 @@ from src.models.intent import Intent
 from src.models.conversation import Conversation, IntentAmbiguity
 from src.services.cache_service import CacheService
 from src.services.audit_service import AuditService, AuditAction
-from src.services.cache_invalidation_service import CacheInvalidationService, CacheInvalidationType
+from src.services.cache_invalidation_service import (
+    CacheInvalidationService, INTENT_CONFIG_VERSION_KEY
+)
 from src.services.config_management_service import get_config_management_service
 from src.core.event_system import get_event_system, EventType
 from src.core.nlu_engine import NLUEngine
+from src.core.catalog_snapshot import (
+    IntentSnapshot, build_intent_snapshot, dump_intent_catalog, ensure_catalog_snapshot,
+    get_local_active_intents, parse_intent_catalog, resolve_intent_snapshot, set_local_active_intents
+)
+from src.core.cache_strategy import SerializationMethod
 from src.core.confidence_manager import ConfidenceManager, ThresholdDecision
 from src.core.ambiguity_detector import EnhancedAmbiguityDetector, AmbiguityAnalysis
 from src.core.intelligent_question_generator import IntelligentQuestionGenerator, QuestionContext
@@ -23,11 +32,45 @@ from src.core.intent_confirmation_manager import (
     ConfirmationStrategy, ConfirmationResponse, RiskLevel, get_confirmation_manager
 )
 from src.schemas.intent_recognition import IntentRecognitionResult
+from src.utils.db_executor import run_db
+from src.utils.request_context import request_memo
 from src.utils.logger import get_logger
 from src.config.settings import settings
 
 logger = get_logger(__name__)
 
+# 意图配置版本号在进程内的复用时间（秒），避免每次识别都读取Redis
+CONFIG_VERSION_REFRESH_SECONDS = 5.0
+
+# 活跃意图目录在共享缓存中的键（意图失效时由缓存失效服务删除）
+ACTIVE_INTENTS_CACHE_KEY = "active_intents"
+
+# 进程内（per-worker）状态: 意图配置版本号快照与识别结果缓存命中统计
+_config_version_snapshot: Dict[str, float] = {'version': 0, 'fetched_at': 0.0}
+_recognition_cache_stats: Dict[str, int] = {'hits': 0, 'misses': 0}
+
+
+def get_recognition_cache_stats() -> Dict[str, Any]:
+    """获取当前worker的意图识别结果缓存命中统计"""
+    hits = _recognition_cache_stats['hits']
+    misses = _recognition_cache_stats['misses']
+    total = hits + misses
+    return {
+        'worker_pid': os.getpid(),
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 4) if total else 0.0,
+        'config_version': int(_config_version_snapshot['version'])
+    }
+
+
+async def load_active_intent(intent_name: str) -> Optional[Intent]:
+    """从数据库加载指定名称的活跃意图，不存在时返回None"""
+    try:
+        return await run_db(Intent.get, Intent.intent_name == intent_name, Intent.is_active == True)
+    except Intent.DoesNotExist:
+        return None
+
 
 class IntentService:
     """意图识别服务类"""
@@ -65,47 +108,36 @@ class IntentService:
             IntentRecognitionResult: 意图识别结果
         """
         try:
-            # 1. 检查缓存中是否有相同输入的识别结果
-            input_hash = abs(hash(user_input))
-            cache_key = self.cache_service.get_cache_key('intent_recognition', input_hash=input_hash, user_id=user_id)
-            cached_result = await self.cache_service.get(cache_key)
-            if cached_result:
-                logger.info(f"从缓存获取意图识别结果: {user_input[:50]}")
-                return self._deserialize_result(cached_result)
-            
-            # 2. 获取所有活跃的意图配置
-            active_intents = await self._get_active_intents()
-            if not active_intents:
-                logger.warning("没有找到活跃的意图配置")
+            # 1. 检查缓存中是否有相同输入的识别结果（归一化文本+配置版本的稳定摘要），
+            #    未命中时并发的相同输入只识别一次
+            input_hash = await self._generate_recognition_input_hash(user_input)
+            recognized: Dict[str, IntentRecognitionResult] = {}
+            
+            async def recognize_uncached() -> Optional[Dict]:
+                result, cacheable = await self._recognize_uncached(user_input, context)
+                recognized['result'] = result
+                return self._serialize_result(result) if cacheable else None
+            
+            cached_result = await self.cache_service.get_or_load_nlu_result(
+                input_hash, recognize_uncached, user_id
+            )
+            result = recognized.get('result')
+            if result is not None:
+                _recognition_cache_stats['misses'] += 1
+                # 6. 记录识别日志
+                logger.info(f"意图识别完成: {user_input[:50]} -> {result.intent.intent_name if result.intent else 'None'}")
+                return result
+            
+            if not cached_result:
                 return IntentRecognitionResult.from_intent_service_result(
-                    intent=None, 
+                    intent=None,
                     confidence=0.0,
                     user_input=user_input,
                     context=context
                 )
-            
-            # 3. 使用NLU引擎进行意图识别
-            nlu_result = await self.nlu_engine.recognize_intent(
-                user_input, active_intents=None, context=context
-            )
-            
-            # 将NLU结果转换为标准格式
-            recognition_results = await self._convert_nlu_result(nlu_result, active_intents)
-            
-            # 4. 分析识别结果
-            result = await self._analyze_recognition_results(
-                recognition_results, user_input, context
-            )
-            
-            # 5. 缓存识别结果
-            await self.cache_service.set(
-                cache_key, self._serialize_result(result), ttl=1800
-            )
-            
-            # 6. 记录识别日志
-            logger.info(f"意图识别完成: {user_input[:50]} -> {result.intent.intent_name if result.intent else 'None'}")
-            
-            return result
+            _recognition_cache_stats['hits'] += 1
+            logger.info(f"从缓存获取意图识别结果: {user_input[:50]}")
+            return await self._deserialize_result(cached_result)
             
         except Exception as e:
             logger.error(f"意图识别失败: {str(e)}")
@@ -116,6 +148,39 @@ class IntentService:
                 context=context
             )
     
+    async def _recognize_uncached(self, user_input: str,
+                                  context: Dict = None) -> Tuple[IntentRecognitionResult, bool]:
+        """
+        不经缓存识别意图
+        
+        Returns:
+            Tuple[IntentRecognitionResult, bool]: (识别结果, 是否可以缓存)
+        """
+        # 2. 获取所有活跃的意图配置
+        active_intents = await self._get_active_intents()
+        if not active_intents:
+            logger.warning("没有找到活跃的意图配置")
+            return IntentRecognitionResult.from_intent_service_result(
+                intent=None, 
+                confidence=0.0,
+                user_input=user_input,
+                context=context
+            ), False
+        
+        # 3. 使用NLU引擎进行意图识别
+        nlu_result = await self.nlu_engine.recognize_intent(
+            user_input, active_intents=None, context=context
+        )
+        
+        # 将NLU结果转换为标准格式
+        recognition_results = await self._convert_nlu_result(nlu_result, active_intents)
+        
+        # 4. 分析识别结果
+        result = await self._analyze_recognition_results(
+            recognition_results, user_input, context
+        )
+        return result, True
+    
     async def recognize_intent_with_history(
         self, 
         user_input: str, 
@@ -146,8 +211,8 @@ class IntentService:
             }
             
             # 检查是否存在上下文相关的缓存
-            context_hash = abs(hash(str(enhanced_context)))
-            input_hash = abs(hash(user_input))
+            context_hash = self.cache_service.cache_strategy.generate_context_hash(enhanced_context)
+            input_hash = await self._generate_recognition_input_hash(user_input)
             cache_key = self.cache_service.get_cache_key(
                 'intent_recognition_with_history', 
                 input_hash=input_hash, 
@@ -158,7 +223,7 @@ class IntentService:
             cached_result = await self.cache_service.get(cache_key)
             if cached_result:
                 logger.info(f"从缓存获取历史增强的意图识别结果: {user_input[:50]}")
-                return self._deserialize_result(cached_result)
+                return await self._deserialize_result(cached_result)
             
             # 分析对话历史，提取上下文线索
             historical_context = self._analyze_conversation_history(conversation_history)
@@ -203,6 +268,31 @@ class IntentService:
             # 回退到基础意图识别
             return await self.recognize_intent(user_input, user_id, session_context)
     
+    async def _get_intent_config_version(self) -> int:
+        """获取意图配置版本号（进程内短期复用，意图变更时由缓存失效服务递增）"""
+        now = time.monotonic()
+        if now - _config_version_snapshot['fetched_at'] < CONFIG_VERSION_REFRESH_SECONDS:
+            return int(_config_version_snapshot['version'])
+        
+        try:
+            version = int(await self.cache_service.get(INTENT_CONFIG_VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"获取意图配置版本号失败: {str(e)}")
+            version = int(_config_version_snapshot['version'])
+        
+        _config_version_snapshot['version'] = version
+        _config_version_snapshot['fetched_at'] = now
+        return version
+    
+    async def _generate_recognition_input_hash(self, user_input: str) -> str:
+        """生成意图识别结果缓存使用的输入摘要（包含意图配置版本号）"""
+        config_version = await self._get_intent_config_version()
+        return self.cache_service.generate_input_hash(user_input, f"v{config_version}")
+    
+    def get_recognition_cache_stats(self) -> Dict[str, Any]:
+        """获取当前worker的意图识别结果缓存命中统计"""
+        return get_recognition_cache_stats()
+    
     def _analyze_conversation_history(self, conversation_history: List[Dict[str, Any]]) -> Dict[str, Any]:
         """分析对话历史，提取上下文线索"""
         if not conversation_history:
@@ -372,18 +462,43 @@ class IntentService:
             
         return potential_slots
     
-    async def _get_active_intents(self) -> List[Intent]:
-        """获取所有活跃的意图配置"""
-        # 首先尝试从缓存获取
-        cached_intents = await self.cache_service.get("active_intents")
-        if cached_intents:
-            return cached_intents
+    async def _get_active_intents(self) -> List[IntentSnapshot]:
+        """获取所有活跃的意图配置（同一请求内只加载一次）"""
+        return await request_memo('active_intents', None, self._load_active_intents)
+    
+    async def _load_active_intents(self) -> List[IntentSnapshot]:
+        """
+        加载活跃意图：进程内副本 -> 共享缓存（版本化的紧凑格式） -> 数据库
+        
+        三级数据都以意图配置版本号校验，配置变更后自动重新加载
+        """
+        config_version = await self._get_intent_config_version()
         
-        # 从数据库查询活跃意图
-        intents = list(Intent.select().where(Intent.is_active == True).order_by(Intent.priority.desc()))
+        local_intents = get_local_active_intents(config_version)
+        if local_intents is not None:
+            return list(local_intents)
         
-        # 缓存结果
-        await self.cache_service.set("active_intents", intents, ttl=3600)
+        # 共享缓存（旧格式或版本不一致的数据按未命中处理），未命中时并发请求只查询一次数据库
+        catalog = await self.cache_service.get_or_load(
+            ACTIVE_INTENTS_CACHE_KEY,
+            lambda: self._query_active_intents(config_version),
+            ttl=3600,
+            method=SerializationMethod.JSON,
+            accept=lambda cached: parse_intent_catalog(cached, config_version) is not None
+        )
+        intents = parse_intent_catalog(catalog, config_version)
+        if intents is None:
+            return []
+        # 配置版本变化后同步更新目录快照，NLU引擎据此重新编译规则匹配器和提示词前缀
+        await ensure_catalog_snapshot(config_version)
+        return list(set_local_active_intents(config_version, intents))
+    
+    async def _query_active_intents(self, config_version: int) -> Dict[str, Any]:
+        """从数据库查询活跃意图，返回共享缓存使用的紧凑格式"""
+        intent_models = await run_db(
+            lambda: list(Intent.select().where(Intent.is_active == True).order_by(Intent.priority.desc()))
+        )
+        intents = [build_intent_snapshot(intent) for intent in intent_models]
         
         # 记录审计日志 - 系统查询活跃意图
         try:
@@ -398,7 +513,7 @@ class IntentService:
         except Exception as e:
             logger.warning(f"记录意图查询审计日志失败: {str(e)}")
         
-        return intents
+        return dump_intent_catalog(intents, config_version)
     
     async def _analyze_recognition_results(self, results: List[Dict], 
                                          user_input: str, context: Dict = None) -> IntentRecognitionResult:
@@ -580,11 +695,8 @@ class IntentService:
         )
     
     async def _get_intent_by_name(self, intent_name: str) -> Optional[Intent]:
-        """根据名称获取意图对象"""
-        try:
-            return Intent.get(Intent.intent_name == intent_name, Intent.is_active == True)
-        except Intent.DoesNotExist:
-            return None
+        """根据名称获取意图对象（同一请求内按名称记忆）"""
+        return await request_memo('intent', intent_name, lambda: load_active_intent(intent_name))
     
     async def resolve_ambiguity(self, conversation_id: int, candidates: List[Dict], 
                               user_choice: str, user_id: Optional[str] = None,
@@ -840,7 +952,7 @@ class IntentService:
             logger.error(f"意图转移检测失败: {str(e)}")
             return False, None, 0.0
     
-    async def _convert_nlu_result(self, nlu_result, active_intents: List[Intent]) -> List[Dict]:
+    async def _convert_nlu_result(self, nlu_result, active_intents: List[IntentSnapshot]) -> List[Dict]:
         """
         将NLU引擎结果转换为标准格式
         
@@ -902,6 +1014,9 @@ class IntentService:
             float: 置信度值 (0.0 - 1.0)
         """
         try:
+            # 确保意图目录快照与当前配置版本一致，打分优先使用快照中预先分词的结果
+            await ensure_catalog_snapshot(await self._get_intent_config_version())
+            
             # 基础置信度计算
             base_confidence = 0.0
             
@@ -933,6 +1048,14 @@ class IntentService:
         """计算关键词匹配得分"""
         try:
             user_words = set(user_input.lower().split())
+            
+            snapshot = resolve_intent_snapshot(intent)
+            if snapshot is not None:
+                intent_words = snapshot.keyword_words
+                if not intent_words:
+                    return 0.0
+                return min(1.0, len(intent_words.intersection(user_words)) / len(intent_words))
+            
             intent_words = set()
             
             # 从意图名称提取关键词
@@ -962,6 +1085,10 @@ class IntentService:
     async def _calculate_example_similarity(self, user_input: str, intent: Intent) -> float:
         """计算与示例的相似度得分"""
         try:
+            snapshot = resolve_intent_snapshot(intent)
+            if snapshot is not None:
+                return self._calculate_snapshot_example_similarity(user_input, snapshot)
+            
             examples = intent.get_examples()
             if not examples:
                 return 0.0
@@ -982,6 +1109,22 @@ class IntentService:
             logger.error(f"示例相似度计算失败: {str(e)}")
             return 0.0
     
+    @staticmethod
+    def _calculate_snapshot_example_similarity(user_input: str, snapshot: IntentSnapshot) -> float:
+        """使用快照中预先分词的示例计算相似度（与逐条计算的Jaccard相似度结果一致）"""
+        user_words = frozenset(user_input.lower().split())
+        if not user_words:
+            return 0.0
+        
+        max_similarity = 0.0
+        for example_words in snapshot.example_word_sets:
+            if not example_words:
+                continue
+            intersection = len(user_words & example_words)
+            if intersection:
+                max_similarity = max(max_similarity, intersection / len(user_words | example_words))
+        return max_similarity
+    
     def _calculate_string_similarity(self, str1: str, str2: str) -> float:
         """计算两个字符串的相似度（简单版本）"""
         try:
@@ -1228,13 +1371,13 @@ class IntentService:
         """序列化识别结果用于缓存"""
         return result.to_legacy_intent_service_format()
     
-    def _deserialize_result(self, data: Dict) -> IntentRecognitionResult:
+    async def _deserialize_result(self, data: Dict) -> IntentRecognitionResult:
         """从缓存数据反序列化识别结果"""
         intent = None
         if data.get('intent_name') or data.get('intent'):
             intent_name = data.get('intent_name') or data.get('intent')
             try:
-                intent = Intent.get(Intent.intent_name == intent_name)
+                intent = await run_db(Intent.get, Intent.intent_name == intent_name)
             except:
                 pass
         
@@ -1935,8 +2078,8 @@ class IntentService:
             )
             
             # 失效相关缓存
-            await self.cache_invalidation_service.invalidate_intent_caches(
-                intent.id, intent.intent_name, CacheInvalidationType.CONFIG_CHANGE
+            await self.cache_invalidation_service.invalidate_intent_cache(
+                intent.id, intent.intent_name, "INSERT"
             )
             
             logger.info(f"意图创建成功: {intent.intent_name} by {operator_id}")
@@ -1999,8 +2142,8 @@ class IntentService:
             )
             
             # 失效相关缓存
-            await self.cache_invalidation_service.invalidate_intent_caches(
-                intent_id, updated_intent.intent_name, CacheInvalidationType.CONFIG_CHANGE
+            await self.cache_invalidation_service.invalidate_intent_cache(
+                intent_id, updated_intent.intent_name, "UPDATE"
             )
             
             logger.info(f"意图更新成功: {intent_id} by {operator_id}")
@@ -2048,8 +2191,8 @@ class IntentService:
             )
             
             # 失效相关缓存
-            await self.cache_invalidation_service.invalidate_intent_caches(
-                intent_id, intent.intent_name, CacheInvalidationType.CONFIG_CHANGE
+            await self.cache_invalidation_service.invalidate_intent_cache(
+                intent_id, intent.intent_name, "DELETE"
             )
             
             logger.info(f"意图删除成功: {intent_id} by {operator_id}")
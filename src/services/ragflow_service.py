@@ -19,6 +19,9 @@ from src.core.fallback_manager import (
 from src.core.intelligent_fallback_decision import (
     IntelligentFallbackDecisionEngine, DecisionContext, get_decision_engine
 )
+from src.config.settings import settings
+from src.utils.concurrency_limiter import ConcurrencyLimitExceeded, upstream_permit
+from src.utils.hedging import get_hedge_policy
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -276,6 +279,25 @@ class RagflowService:
                     response_time=response_time
                 )
                 
+        except ConcurrencyLimitExceeded as e:
+            response_time = (datetime.now() - start_time).total_seconds()
+            logger.warning(f"RAGFLOW查询被拒绝: {e.reason}")
+            
+            # 上游过载时不重试，直接按限流错误回退（缓存或默认响应）
+            fallback_response = await self._handle_advanced_fallback(
+                query, config_name, context, filters, str(e), response_time,
+                error_type=FallbackType.RATE_LIMIT_ERROR
+            )
+            
+            if fallback_response.success:
+                return fallback_response
+            
+            return RagflowResponse(
+                False,
+                error=str(e),
+                response_time=response_time
+            )
+                
         except Exception as e:
             response_time = (datetime.now() - start_time).total_seconds()
             error_message = str(e)
@@ -364,12 +386,30 @@ class RagflowService:
     
     async def _send_request(self, config: RagflowConfig, endpoint: str, 
                           data: Dict) -> Optional[Dict]:
-        """发送HTTP请求"""
+        """发送HTTP请求
+        
+        启用对冲时，查询请求超过观测p95仍未返回会向备用端点（配置元数据中的 hedge_endpoint，
+        未配置时为同一端点）补发一份，取先成功者；上传、删除等写操作不对冲。
+        """
+        if not settings.HEDGING_ENABLED or endpoint != 'query':
+            return await self._post_request(config, config.api_endpoint, endpoint, data)
+        
+        hedge_endpoint = config.get_config_metadata().get('hedge_endpoint') or config.api_endpoint
+        return await get_hedge_policy('ragflow').run(
+            lambda attempt: self._post_request(
+                config, hedge_endpoint if attempt else config.api_endpoint, endpoint, data
+            ),
+            lambda response_data: response_data is not None
+        )
+    
+    async def _post_request(self, config: RagflowConfig, api_endpoint: str, endpoint: str,
+                            data: Dict) -> Optional[Dict]:
+        """向指定端点发送一次HTTP请求"""
         if not self._session:
             await self.initialize()
         
         try:
-            url = f"{config.api_endpoint.rstrip('/')}/{endpoint}"
+            url = f"{api_endpoint.rstrip('/')}/{endpoint}"
             headers = config.get_headers()
             
             # 添加API密钥到请求头
@@ -379,8 +419,8 @@ class RagflowService:
             # 设置内容类型
             headers['Content-Type'] = 'application/json'
             
-            # 发送POST请求
-            async with self._session.post(
+            # 发送POST请求（受上游并发限制约束）
+            async with upstream_permit('ragflow') as permit, self._session.post(
                 url,
                 json=data,
                 headers=headers,
@@ -392,10 +432,15 @@ class RagflowService:
                     logger.debug(f"RAGFLOW请求成功: {url}")
                     return response_data
                 else:
+                    if response.status == 429 or response.status >= 500:
+                        permit.mark_dropped()
                     error_text = await response.text()
                     logger.error(f"RAGFLOW请求失败: {response.status}, {error_text}")
                     return None
                     
+        except ConcurrencyLimitExceeded:
+            # 快速拒绝交由调用方进入回退流程
+            raise
         except asyncio.TimeoutError:
             logger.error(f"RAGFLOW请求超时: {config.config_name}")
             return None
@@ -432,12 +477,13 @@ class RagflowService:
                                        context: Optional[Dict], 
                                        filters: Optional[Dict],
                                        error_message: str,
-                                       initial_response_time: float) -> RagflowResponse:
+                                       initial_response_time: float,
+                                       error_type: FallbackType = FallbackType.RAGFLOW_QUERY) -> RagflowResponse:
         """处理高级回退逻辑 (TASK-032)"""
         try:
             # 构建回退上下文
             fallback_context = FallbackContext(
-                error_type=FallbackType.RAGFLOW_QUERY,
+                error_type=error_type,
                 error_message=error_message,
                 original_request={
                     'query': query,
@@ -457,7 +503,7 @@ class RagflowService:
             # 使用智能决策引擎选择最佳回退策略
             decision_context = DecisionContext(
                 fallback_context=fallback_context,
-                available_strategies=self.fallback_manager.fallback_rules[FallbackType.RAGFLOW_QUERY].strategies,
+                available_strategies=self.fallback_manager.fallback_rules[error_type].strategies,
                 historical_performance={},
                 system_metrics={},
                 user_profile={},
@@ -718,7 +764,7 @@ class RagflowService:
             else:
                 # 清除所有配置缓存
                 self._config_cache.clear()
-                await self.cache_service.clear_namespace(self.cache_namespace)
+                await self.cache_service.clear_cache_namespace(self.cache_namespace)
                 
                 # 重新加载所有配置
                 await self._load_configurations()
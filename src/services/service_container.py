@@ -0,0 +1,147 @@
+"""
+应用级服务容器
+在应用启动(lifespan)时一次性构建服务对象图，所有请求共享，关闭时统一释放资源
+"""
+from typing import Optional, Dict, Any
+
+from src.services.cache_service import CacheService
+from src.services.intent_service import IntentService
+from src.services.slot_service import SlotService
+from src.services.enhanced_slot_service import EnhancedSlotService
+from src.services.ragflow_service import RagflowService
+from src.services.conversation_service import ConversationService
+from src.services.function_service import FunctionService
+from src.services.service_factory import ServiceFactory, initialize_service_factory
+from src.core.nlu_engine import NLUEngine
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ServiceContainer:
+    """
+    应用级服务容器
+
+    取代按请求构造服务的方式: IntentService/SlotService 内部的歧义检测器、选择解析器、
+    审计与缓存失效服务，基于共享SlotService的 EnhancedSlotService，
+    以及 RagflowService 的 aiohttp 会话和配置只在启动时创建一次
+    """
+
+    def __init__(self, cache_service: CacheService, nlu_engine: NLUEngine):
+        self.cache_service = cache_service
+        self.nlu_engine = nlu_engine
+        self.factory: Optional[ServiceFactory] = None
+
+        self.intent_service: Optional[IntentService] = None
+        self.slot_service: Optional[SlotService] = None
+        self.enhanced_slot_service: Optional[EnhancedSlotService] = None
+        self.ragflow_service: Optional[RagflowService] = None
+        self.conversation_service: Optional[ConversationService] = None
+        self.function_service: Optional[FunctionService] = None
+
+        self._initialized = False
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._initialized
+
+    async def initialize(self):
+        """构建服务对象图"""
+        if self._initialized:
+            return
+
+        try:
+            # 共享的审计服务和缓存失效服务由服务工厂持有
+            self.factory = initialize_service_factory(self.cache_service, self.nlu_engine)
+
+            self.intent_service = self.factory.create_intent_service()
+            self.slot_service = self.factory.create_slot_service()
+            self.enhanced_slot_service = EnhancedSlotService(self.slot_service, self.cache_service)
+
+            # RAGFLOW服务: 启动时创建HTTP会话并加载配置，整个进程复用
+            self.ragflow_service = RagflowService(self.cache_service)
+            try:
+                await self.ragflow_service.initialize()
+            except Exception as e:
+                # 初始化失败时保持惰性初始化行为，首次请求时重试
+                logger.warning(f"RAGFLOW服务预初始化失败，将在首次调用时重试: {str(e)}")
+
+            self.conversation_service = ConversationService(self.cache_service, self.ragflow_service)
+            self.function_service = FunctionService(self.cache_service)
+
+            self._initialized = True
+            logger.info("服务容器初始化完成")
+
+        except Exception as e:
+            logger.error(f"服务容器初始化失败: {str(e)}")
+            raise
+
+    async def shutdown(self):
+        """释放服务持有的外部资源"""
+        if self.ragflow_service:
+            try:
+                await self.ragflow_service.cleanup()
+            except Exception as e:
+                logger.warning(f"关闭RAGFLOW服务失败: {str(e)}")
+
+        if self.function_service:
+            try:
+                await self.function_service.api_wrapper_manager.close_all()
+            except Exception as e:
+                logger.warning(f"关闭API包装器失败: {str(e)}")
+
+        self._initialized = False
+        logger.info("服务容器已关闭")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取容器状态"""
+        return {
+            'initialized': self._initialized,
+            'services': {
+                'intent_service': self.intent_service is not None,
+                'slot_service': self.slot_service is not None,
+                'enhanced_slot_service': self.enhanced_slot_service is not None,
+                'ragflow_service': self.ragflow_service is not None,
+                'conversation_service': self.conversation_service is not None,
+                'function_service': self.function_service is not None
+            }
+        }
+
+
+# 全局服务容器实例
+_service_container: Optional[ServiceContainer] = None
+
+
+async def initialize_service_container(cache_service: CacheService,
+                                       nlu_engine: NLUEngine) -> ServiceContainer:
+    """
+    初始化全局服务容器（在应用lifespan中调用）
+
+    Args:
+        cache_service: 缓存服务实例
+        nlu_engine: NLU引擎实例
+
+    Returns:
+        ServiceContainer: 服务容器实例
+    """
+    global _service_container
+
+    if _service_container is None or not _service_container.is_initialized:
+        _service_container = ServiceContainer(cache_service, nlu_engine)
+        await _service_container.initialize()
+
+    return _service_container
+
+
+def get_service_container() -> Optional[ServiceContainer]:
+    """获取全局服务容器实例，未初始化时返回None"""
+    return _service_container
+
+
+async def shutdown_service_container():
+    """关闭全局服务容器"""
+    global _service_container
+
+    if _service_container is not None:
+        await _service_container.shutdown()
+        _service_container = None
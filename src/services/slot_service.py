@@ -16,10 +16,13 @@ from src.services.cache_invalidation_service import CacheInvalidationService, Ca
 from src.services.config_management_service import get_config_management_service
 from src.core.event_system import get_event_system, EventType
 from src.core.nlu_engine import NLUEngine
+from src.core.catalog_snapshot import resolve_slot_snapshot
+from src.core.cache_strategy import CacheTag
 from src.core.dependency_graph import dependency_graph_manager, DependencyGraph
 from src.core.slot_inheritance import inheritance_manager, InheritanceResult
 from src.core.clarification_question_generator import ClarificationQuestionGenerator, ClarificationType
 from src.utils.logger import get_logger
+from src.utils.request_context import request_memo
 
 logger = get_logger(__name__)
 
@@ -160,14 +163,25 @@ class SlotService:
             return SlotExtractionResult({}, [])
     
     async def _get_slot_definitions(self, intent: Intent) -> List[Dict[str, Any]]:
-        """获取意图的槽位定义"""
-        # 首先尝试从缓存获取
-        cache_key = f"slot_definitions:{intent.intent_name}"
-        cached_slots = await self.cache_service.get(cache_key)
-        if cached_slots and isinstance(cached_slots, list) and cached_slots and isinstance(cached_slots[0], dict):
-            return cached_slots
-        
-        # 从数据库查询槽位定义
+        """获取意图的槽位定义（同一请求内按意图复用）"""
+        return await request_memo(
+            'slot_definitions', intent.id,
+            lambda: self._load_slot_definitions(intent)
+        )
+    
+    async def _load_slot_definitions(self, intent: Intent) -> List[Dict[str, Any]]:
+        """从缓存或数据库加载意图的槽位定义（缓存未命中时并发请求只查询一次数据库）"""
+        return await self.cache_service.get_or_load(
+            f"slot_definitions:{intent.intent_name}",
+            lambda: self._query_slot_definitions(intent),
+            ttl=3600,
+            # 登记到意图标签，意图或槽位变更时失效
+            tags=[CacheTag.intent(intent.id)],
+            accept=lambda cached: isinstance(cached, list) and bool(cached) and isinstance(cached[0], dict)
+        )
+    
+    async def _query_slot_definitions(self, intent: Intent) -> List[Dict[str, Any]]:
+        """从数据库查询意图的槽位定义"""
         slot_objects = list(intent.slots.order_by(Slot.sort_order))
         
         # 转换为字典格式，供NLU引擎使用
@@ -187,9 +201,6 @@ class SlotService:
             }
             slots.append(slot_dict)
         
-        # 缓存结果
-        await self.cache_service.set(cache_key, slots, ttl=3600)
-        
         # 记录槽位定义查询审计日志（可选，用于调试）
         try:
             await self.audit_service.log_config_change(
@@ -345,7 +356,7 @@ class SlotService:
     
     async def _normalize_enum_value(self, slot_def: Slot, value: Any) -> str:
         """标准化枚举值"""
-        rules = slot_def.get_validation_rules()
+        rules = (resolve_slot_snapshot(slot_def) or slot_def).get_validation_rules()
         options = rules.get('options', [])
         
         if not options:
@@ -809,6 +820,11 @@ class SlotService:
             except Exception as cache_error:
                 logger.warning(f"失效槽位缓存失败: {str(cache_error)}")
             
+            # 失效所属会话的物化槽位状态
+            if saved_slots or updated_slots:
+                from src.services.slot_value_service import get_slot_value_service
+                await get_slot_value_service().invalidate_conversation_slot_state(conversation_id)
+            
             logger.info(f"槽位值保存完成: {conversation_id}, {len(slots)}个槽位")
             
         except Exception as e:
@@ -855,8 +871,11 @@ class SlotService:
             tuple: (是否有效, 错误信息, 标准化值)
         """
         try:
+            # 规则读取优先使用目录快照（验证规则已预先解析、正则已预编译）
+            slot_spec = resolve_slot_snapshot(slot) or slot
+            
             # 基本验证
-            is_valid, error_msg = slot.validate_value(value)
+            is_valid, error_msg = slot_spec.validate_value(value)
             if not is_valid:
                 return False, error_msg, value
             
@@ -874,7 +893,7 @@ class SlotService:
             # 额外的上下文验证
             if context:
                 context_valid, context_error = self._validate_with_context(
-                    slot, normalized_value, context
+                    slot_spec, normalized_value, context
                 )
                 if not context_valid:
                     return False, context_error, normalized_value
@@ -1042,7 +1061,7 @@ class SlotService:
             )
             
             # 缓存结果
-            await self.cache_service.set(cache_key, dependencies, ttl=3600)
+            await self.cache_service.set(cache_key, dependencies, ttl=3600, tags=[CacheTag.intent(intent.id)])
             
             return dependencies
             
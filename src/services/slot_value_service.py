@@ -9,10 +9,21 @@ from src.models.conversation import Conversation
 from src.models.slot import Slot
 from src.models.slot_value import SlotValue
 from src.models.intent import Intent
+from src.core.catalog_snapshot import resolve_slot_snapshot
+from src.utils.db_executor import run_db
+from src.utils.request_context import request_memo, prime_request_memo, invalidate_request_memo
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# 物化槽位状态哈希中的标记字段：为真表示哈希是完整的会话槽位状态，缺失或为假时需从数据库重建
+SLOT_STATE_MARKER_FIELD = "__materialized__"
+# 物化槽位状态哈希中的代数字段：每次增量写入或失效时自增，从数据库重建时用于检测并发写入
+SLOT_STATE_GENERATION_FIELD = "__generation__"
+
+# 参与会话当前槽位状态的验证状态
+ACTIVE_SLOT_STATUSES = ('valid', 'pending', 'corrected')
+
 
 class SlotValueService:
     """槽位值管理服务类"""
@@ -97,6 +108,9 @@ class SlotValueService:
                     error_count += 1
                     self.logger.error(f"处理槽位失败: {slot_name}, 错误: {str(e)}")
             
+            if stored_count or updated_count:
+                await self.invalidate_session_slot_state(conversation.session_id)
+            
             result = {
                 'stored_count': stored_count,
                 'updated_count': updated_count,
@@ -127,23 +141,26 @@ class SlotValueService:
             Dict: 槽位信息字典
         """
         try:
-            from src.models.conversation import Conversation
-            conversation = Conversation.get_by_id(conversation_id)
-            slot_values = SlotValue.get_conversation_slots(conversation, include_invalid)
-            
-            slots = {}
-            for slot_value in slot_values:
-                slots[slot_value.slot_name] = {
-                    'value': slot_value.get_final_value(),
-                    'confidence': slot_value.confidence,
-                    'status': slot_value.validation_status,
-                    'created_at': slot_value.created_at
-                }
-            return slots
+            return await run_db(self._load_conversation_slots, conversation_id, include_invalid)
         except Exception as e:
             self.logger.error(f"获取对话槽位失败: conversation_id={conversation_id}, error={str(e)}")
             return {}
     
+    def _load_conversation_slots(self, conversation_id: int, include_invalid: bool) -> Dict[str, Any]:
+        """从数据库加载对话槽位（同步，在数据库线程池中执行）"""
+        conversation = Conversation.get_by_id(conversation_id)
+        slot_values = SlotValue.get_conversation_slots(conversation, include_invalid)
+        
+        slots = {}
+        for slot_value in slot_values:
+            slots[slot_value.slot_name] = {
+                'value': slot_value.get_final_value(),
+                'confidence': slot_value.confidence,
+                'status': slot_value.validation_status,
+                'created_at': slot_value.created_at
+            }
+        return slots
+    
     async def get_conversation_slots_status(
         self,
         conversation: Conversation,
@@ -260,6 +277,7 @@ class SlotValueService:
             
             # 设置修正值
             slot_value.set_corrected(corrected_value)
+            await self.invalidate_conversation_slot_state(slot_value.conversation_id)
             
             self.logger.info(
                 f"槽位值修正成功: {slot_value.slot_name} "
@@ -301,6 +319,9 @@ class SlotValueService:
                     slot_value.confirm()
                     confirmed_count += 1
             
+            if confirmed_count:
+                await self.invalidate_session_slot_state(conversation.session_id)
+            
             result = {
                 'total_slots': len(slot_values),
                 'confirmed_count': confirmed_count,
@@ -435,10 +456,10 @@ class SlotValueService:
             # 先进行标准化处理
             slot_value.normalize_value()
             
-            # 获取槽位的验证规则
-            validation_rules = slot.get_validation_rules()
+            # 获取槽位的验证规则（优先使用目录快照，合并额外规则时复制，不修改共享的规则）
+            validation_rules = (resolve_slot_snapshot(slot) or slot).get_validation_rules()
             if additional_rules:
-                validation_rules.update(additional_rules)
+                validation_rules = {**validation_rules, **additional_rules}
             
             # 基础类型验证 - 使用标准化后的值
             if slot.slot_type == 'number':
@@ -574,70 +595,175 @@ class SlotValueService:
         """
         获取会话的所有槽位值
         
+        优先读取Redis中物化的会话槽位状态（单次HGETALL，O(槽位数)），
+        未物化时从数据库重建并回写；同一请求内的重复调用复用首次结果
+        
         Args:
             session_id: 会话ID
             
         Returns:
             Dict: 槽位值字典
         """
+        slot_values = await request_memo(
+            'session_slots', session_id,
+            lambda: self._fetch_session_slot_values(session_id)
+        )
+        # 返回浅拷贝，调用方增删槽位不影响请求内共享的结果
+        return dict(slot_values)
+    
+    async def _fetch_session_slot_values(self, session_id: str) -> Dict[str, Any]:
+        """读取物化的会话槽位状态，未物化时从数据库重建"""
         try:
-            from src.models.conversation import Session
-            
-            # 获取会话
-            session = Session.get(Session.session_id == session_id)
-            
-            # 获取会话下的所有对话
-            conversations = list(
-                Conversation.select()
-                .where(Conversation.session_id == session.session_id)
-                .order_by(Conversation.created_at.desc())
-            )
-            
-            if not conversations:
-                return {}
+            cache_service = await self._get_cache_service()
+            generation = None
+            if cache_service:
+                slot_state, generation = await self._read_slot_state(cache_service, session_id)
+                if slot_state is not None:
+                    return slot_state
             
-            # 获取会话中所有对话的槽位值
-            slot_values = {}
+            slot_values = await run_db(self._load_session_slot_values, session_id)
             
-            # 查询该会话所有对话的有效槽位值
-            conversation_ids = [conv.id for conv in conversations]
-            values = list(
-                SlotValue.select()
-                .join(Slot)
-                .where(SlotValue.conversation.in_(conversation_ids))
-                .where(SlotValue.validation_status.in_(['valid', 'pending', 'corrected']))
-                .order_by(SlotValue.created_at.desc())
-            )
-            
-            # 只保留每个槽位的最新值，避免重复，返回字典格式（兼容JSON序列化）
-            processed_slots = set()
-            for slot_value in values:
-                slot_name = slot_value.slot.slot_name
-                if slot_name not in processed_slots:
-                    # 返回字典格式，避免SlotInfo对象的JSON序列化问题
-                    slot_info_dict = {
-                        'name': slot_name,
-                        'original_text': slot_value.original_text or '',
-                        'extracted_value': slot_value.extracted_value,
-                        'normalized_value': slot_value.normalized_value,
-                        'confidence': float(slot_value.confidence) if slot_value.confidence else 0.0,
-                        'extraction_method': slot_value.extraction_method or 'unknown',
-                        'validation': None,
-                        'is_confirmed': True,
-                        'value': slot_value.get_final_value(),
-                        'source': slot_value.extraction_method or 'unknown',
-                        'is_validated': slot_value.validation_status in ['valid', 'pending'],
-                        'validation_error': slot_value.validation_error
-                    }
-                    slot_values[slot_name] = slot_info_dict
-                    processed_slots.add(slot_name)
+            if cache_service:
+                # 读取数据库期间有写入或失效时代数已变化，放弃回写，下次读取重新构建
+                await self._rebuild_slot_state(cache_service, session_id, slot_values, generation)
             
             return slot_values
-            
         except Exception as e:
             self.logger.error(f"获取会话槽位值失败: {str(e)}")
             return {}
     
+    def _load_session_slot_values(self, session_id: str) -> Dict[str, Any]:
+        """从数据库加载会话槽位值（同步，在数据库线程池中执行）"""
+        # 单次查询: 通过对话表按会话过滤，同时取出槽位定义，避免逐行懒加载
+        values = (
+            SlotValue.select(SlotValue, Slot)
+            .join(Slot)
+            .switch(SlotValue)
+            .join(Conversation)
+            .where(Conversation.session_id == session_id)
+            .where(SlotValue.validation_status.in_(ACTIVE_SLOT_STATUSES))
+            .order_by(SlotValue.created_at.desc())
+        )
+        
+        # 只保留每个槽位的最新值，避免重复，返回字典格式（兼容JSON序列化）
+        slot_values = {}
+        for slot_value in values:
+            slot_name = slot_value.slot.slot_name
+            if slot_name not in slot_values:
+                slot_values[slot_name] = self._build_slot_state_entry(slot_name, slot_value)
+        
+        return slot_values
+    
+    def _build_slot_state_entry(self, slot_name: str, slot_value: SlotValue) -> Dict[str, Any]:
+        """构建会话槽位状态条目（字典格式，避免SlotInfo对象的JSON序列化问题）"""
+        return {
+            'name': slot_name,
+            'original_text': slot_value.original_text or '',
+            'extracted_value': slot_value.extracted_value,
+            'normalized_value': slot_value.normalized_value,
+            'confidence': float(slot_value.confidence) if slot_value.confidence else 0.0,
+            'extraction_method': slot_value.extraction_method or 'unknown',
+            'validation': None,
+            'is_confirmed': True,
+            'value': slot_value.get_final_value(),
+            'source': slot_value.extraction_method or 'unknown',
+            'is_validated': slot_value.validation_status in ['valid', 'pending'],
+            'validation_error': slot_value.validation_error
+        }
+    
+    async def _get_cache_service(self):
+        """获取缓存服务，不可用时返回None（退化为直接查询数据库）"""
+        try:
+            from src.services.cache_service import get_cache_service
+            return await get_cache_service()
+        except Exception as e:
+            self.logger.warning(f"缓存服务不可用，槽位状态将直接从数据库读取: {str(e)}")
+            return None
+    
+    async def _read_slot_state(self, cache_service, session_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+        """读取物化的会话槽位状态及其代数，未物化时状态为None"""
+        cache_key = cache_service.get_cache_key('session_slot_state', session_id=session_id)
+        slot_state = await cache_service.get_all_hash(cache_key)
+        generation = slot_state.get(SLOT_STATE_GENERATION_FIELD) if slot_state else None
+        return self._parse_slot_state(slot_state), generation
+    
+    @staticmethod
+    def _parse_slot_state(slot_state: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """解析物化的会话槽位状态哈希，未物化时返回None"""
+        if not slot_state or not slot_state.get(SLOT_STATE_MARKER_FIELD):
+            return None
+        
+        slot_state = dict(slot_state)
+        slot_state.pop(SLOT_STATE_MARKER_FIELD, None)
+        slot_state.pop(SLOT_STATE_GENERATION_FIELD, None)
+        return slot_state
+    
+    def prime_session_slot_state(self, session_id: str, slot_state: Optional[Dict[str, Any]]) -> bool:
+        """
+        用批量预取到的物化槽位状态哈希填充请求级记忆，本请求内读取槽位值时不再访问Redis
+        
+        Args:
+            session_id: 会话ID
+            slot_state: 会话槽位状态哈希的全部字段
+            
+        Returns:
+            bool: 槽位状态已物化并写入记忆时返回True
+        """
+        slot_values = self._parse_slot_state(slot_state)
+        if slot_values is None:
+            return False
+        prime_request_memo('session_slots', session_id, slot_values)
+        return True
+    
+    async def _rebuild_slot_state(self, cache_service, session_id: str, slot_values: Dict[str, Any],
+                                  generation: Optional[int]) -> bool:
+        """用数据库快照整体替换会话槽位状态并标记为已物化，仅当代数仍为读取时的值"""
+        cache_key = cache_service.get_cache_key('session_slot_state', session_id=session_id)
+        mapping = dict(slot_values)
+        mapping[SLOT_STATE_MARKER_FIELD] = True
+        
+        return await cache_service.replace_hash_if_version(
+            cache_key, mapping, SLOT_STATE_GENERATION_FIELD, generation,
+            ttl=cache_service.cache_strategy.get_ttl('session_slot_state')
+        )
+    
+    async def _write_slot_state(self, cache_service, session_id: str, slot_values: Dict[str, Any]) -> bool:
+        """
+        增量写入会话槽位状态并递增代数
+        
+        若哈希尚未物化，增量字段不会被读取，下次读取时会整体重建
+        """
+        cache_key = cache_service.get_cache_key('session_slot_state', session_id=session_id)
+        return await cache_service.set_hash_fields(
+            cache_key, slot_values,
+            ttl=cache_service.cache_strategy.get_ttl('session_slot_state'),
+            version_field=SLOT_STATE_GENERATION_FIELD
+        )
+    
+    async def invalidate_session_slot_state(self, session_id: str) -> bool:
+        """失效会话的物化槽位状态，下次读取时从数据库重建"""
+        invalidate_request_memo('session_slots', session_id)
+        try:
+            cache_service = await self._get_cache_service()
+            if not cache_service:
+                return False
+            # 清除物化标记并递增代数（保留代数字段），使正在进行的重建放弃回写
+            return await self._write_slot_state(cache_service, session_id, {SLOT_STATE_MARKER_FIELD: False})
+        except Exception as e:
+            self.logger.warning(f"失效会话槽位状态失败: {session_id}, 错误: {str(e)}")
+            return False
+    
+    async def invalidate_conversation_slot_state(self, conversation_id: int) -> bool:
+        """根据对话ID失效其所属会话的物化槽位状态"""
+        try:
+            session_id = await run_db(
+                lambda: Conversation.get_by_id(conversation_id).session_id
+            )
+            return await self.invalidate_session_slot_state(session_id)
+        except Exception as e:
+            self.logger.warning(f"失效对话槽位状态失败: conversation_id={conversation_id}, 错误: {str(e)}")
+            return False
+    
     async def update_session_slots(self, session_id: str, intent_name: str, slots: Dict[str, Any]) -> bool:
         """
         更新会话槽位值
@@ -675,68 +801,17 @@ class SlotValueService:
             if not slots:
                 return True
             
-            from src.models.intent import Intent
-            from src.models.slot import Slot
-            from src.models.conversation import Conversation
-            
-            # 获取意图和对话对象
-            try:
-                intent_obj = Intent.get(Intent.intent_name == intent)
-                conversation_obj = Conversation.get(Conversation.id == conversation_id)
-            except Exception as e:
-                self.logger.error(f"获取意图或对话对象失败: {str(e)}")
-                return False
-            
-            saved_count = 0
-            
             self.logger.info(f"准备保存槽位值: {slots}")
+            saved_entries = await run_db(self._store_conversation_slots, conversation_id, intent, slots)
             
-            # 保存每个槽位值
-            for slot_name, slot_data in slots.items():
-                try:
-                    # 获取槽位定义
-                    slot_def = Slot.get(
-                        (Slot.intent == intent_obj) & 
-                        (Slot.slot_name == slot_name)
-                    )
-                    
-                    # 提取槽位值数据 - 处理SlotInfo对象
-                    if hasattr(slot_data, 'value'):  # SlotInfo对象
-                        extracted_value = slot_data.value or slot_data.extracted_value
-                        original_text = slot_data.original_text or ''
-                        confidence = slot_data.confidence or 0.0
-                        extraction_method = slot_data.source or slot_data.extraction_method or 'llm'
-                    else:  # 字典格式
-                        extracted_value = slot_data.get('value') or slot_data.get('extracted_value')
-                        original_text = slot_data.get('original_text', '')
-                        confidence = slot_data.get('confidence', 0.0)
-                        extraction_method = slot_data.get('source', 'llm')
-                    
-                    if extracted_value is not None:
-                        # 更新或创建槽位值
-                        slot_value = SlotValue.update_or_create_slot_value(
-                            conversation=conversation_obj,
-                            slot=slot_def,
-                            extracted_value=str(extracted_value),
-                            original_text=original_text,
-                            confidence=confidence,
-                            extraction_method=extraction_method
-                        )
-                        
-                        # 调用标准化方法
-                        slot_value.normalize_value()
-                        slot_value.save()
-                        
-                        saved_count += 1
-                        self.logger.debug(f"保存槽位值成功: {slot_name} = {extracted_value}")
-                        
-                except Slot.DoesNotExist:
-                    self.logger.warning(f"槽位定义不存在: {slot_name}")
-                    continue
-                except Exception as e:
-                    self.logger.error(f"保存槽位值失败: {slot_name}, 错误: {str(e)}")
-                    continue
+            # 增量更新物化的会话槽位状态
+            if saved_entries:
+                invalidate_request_memo('session_slots', session_id)
+                await self._apply_slot_state_changes(session_id, saved_entries)
+                # 对话历史包含每轮的槽位值，需同步失效
+                await self._invalidate_conversation_history(session_id)
             
+            saved_count = len(saved_entries)
             self.logger.info(f"保存对话槽位完成: conversation_id={conversation_id}, 成功={saved_count}/{len(slots)}")
             return saved_count > 0
             
@@ -744,6 +819,102 @@ class SlotValueService:
             self.logger.error(f"保存对话槽位失败: {str(e)}")
             return False
     
+    async def _invalidate_conversation_history(self, session_id: str):
+        """失效会话的对话历史缓存"""
+        try:
+            cache_service = await self._get_cache_service()
+            if cache_service:
+                await cache_service.invalidate_conversation_history(session_id)
+        except Exception as e:
+            self.logger.warning(f"失效对话历史缓存失败: session={session_id}, error={str(e)}")
+    
+    async def _apply_slot_state_changes(self, session_id: str,
+                                        saved_entries: Dict[str, Optional[Dict[str, Any]]]):
+        """将新写入的槽位值增量应用到物化状态；出现非活跃状态的值时整体失效"""
+        try:
+            if any(entry is None for entry in saved_entries.values()):
+                # 新值未通过验证，会话当前值需回退到更早的有效值，交由下次读取重建
+                await self.invalidate_session_slot_state(session_id)
+                return
+            
+            cache_service = await self._get_cache_service()
+            if cache_service:
+                await self._write_slot_state(cache_service, session_id, saved_entries)
+        except Exception as e:
+            self.logger.warning(f"更新会话槽位状态失败: {session_id}, 错误: {str(e)}")
+            await self.invalidate_session_slot_state(session_id)
+    
+    def _store_conversation_slots(self, conversation_id: int, intent: str,
+                                  slots: Dict[str, Any]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        写入对话槽位值（同步，在数据库线程池中执行）
+        
+        Returns:
+            Dict: 成功保存的槽位名 -> 槽位状态条目（验证状态非活跃时为None）
+        """
+        # 获取意图和对话对象
+        try:
+            intent_obj = Intent.get(Intent.intent_name == intent)
+            conversation_obj = Conversation.get(Conversation.id == conversation_id)
+        except Exception as e:
+            self.logger.error(f"获取意图或对话对象失败: {str(e)}")
+            return {}
+        
+        saved_entries = {}
+        
+        # 保存每个槽位值
+        for slot_name, slot_data in slots.items():
+            try:
+                # 获取槽位定义
+                slot_def = Slot.get(
+                    (Slot.intent == intent_obj) & 
+                    (Slot.slot_name == slot_name)
+                )
+                
+                # 提取槽位值数据 - 处理SlotInfo对象
+                if hasattr(slot_data, 'value'):  # SlotInfo对象
+                    extracted_value = slot_data.value or slot_data.extracted_value
+                    original_text = slot_data.original_text or ''
+                    confidence = slot_data.confidence or 0.0
+                    extraction_method = slot_data.source or slot_data.extraction_method or 'llm'
+                else:  # 字典格式
+                    extracted_value = slot_data.get('value') or slot_data.get('extracted_value')
+                    original_text = slot_data.get('original_text', '')
+                    confidence = slot_data.get('confidence', 0.0)
+                    extraction_method = slot_data.get('source', 'llm')
+                
+                if extracted_value is not None:
+                    # 更新或创建槽位值
+                    slot_value = SlotValue.update_or_create_slot_value(
+                        conversation=conversation_obj,
+                        slot=slot_def,
+                        extracted_value=str(extracted_value),
+                        original_text=original_text,
+                        confidence=confidence,
+                        extraction_method=extraction_method
+                    )
+                    
+                    # 调用标准化方法
+                    slot_value.normalize_value()
+                    slot_value.save()
+                    
+                    if slot_value.validation_status in ACTIVE_SLOT_STATUSES:
+                        saved_entries[slot_def.slot_name] = self._build_slot_state_entry(
+                            slot_def.slot_name, slot_value
+                        )
+                    else:
+                        saved_entries[slot_def.slot_name] = None
+                    self.logger.debug(f"保存槽位值成功: {slot_name} = {extracted_value}")
+                    
+            except Slot.DoesNotExist:
+                self.logger.warning(f"槽位定义不存在: {slot_name}")
+                continue
+            except Exception as e:
+                self.logger.error(f"保存槽位值失败: {slot_name}, 错误: {str(e)}")
+                continue
+        
+        return saved_entries
+    
     async def initialize_session_slots(self, session_id: str, initial_slots: Dict[str, Any]) -> bool:
         """
         初始化会话槽位
@@ -7,6 +7,7 @@ from datetime import datetime
 
 from src.models.conversation import UserContext
 from src.services.cache_service import get_cache_service
+from src.core.cache_strategy import CacheTag
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -72,7 +73,8 @@ class UserPreferenceService:
             await self.cache_service.set(
                 cache_key, preferences, 
                 ttl=self.default_ttl, 
-                namespace=self.cache_namespace
+                namespace=self.cache_namespace,
+                tags=[CacheTag.user(user_id)]
             )
             
             logger.info(f"获取用户偏好成功: {user_id}, 项目数: {len(preferences)}")
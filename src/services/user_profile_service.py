@@ -12,6 +12,7 @@ from collections import defaultdict
 from ..models.conversation import Conversation, Session
 from ..models.slot_value import SlotValue
 from ..services.cache_service import CacheService
+from ..core.cache_strategy import CacheTag
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -57,7 +58,8 @@ class UserProfileService:
         await self.cache_service.set(
             cache_key, 
             profile, 
-            ttl=self.profile_cache_ttl
+            ttl=self.profile_cache_ttl,
+            tags=[CacheTag.user(user_id)]
         )
         
         return profile
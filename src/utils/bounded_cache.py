@@ -0,0 +1,380 @@
+"""
+有界内存缓存引擎
+按条目数和字节数双重限制容量，淘汰策略为W-TinyLFU：新条目先进入小的LRU窗口，
+被挤出窗口时与主区（SLRU：试用段 + 保护段）的淘汰候选比较访问频率（Count-Min Sketch估计），
+频率更高者留下，偶发的一次性键不会冲掉热点数据。过期时间由最小堆管理，读写时顺带清理到期条目，
+不需要周期性全量扫描。非线程安全，面向单个事件循环内的使用场景。
+"""
+import heapq
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+_MISSING = object()
+
+# 段标识
+_WINDOW = 0
+_PROBATION = 1
+_PROTECTED = 2
+
+# 估算对象大小时的最大递归深度
+_MAX_SIZE_DEPTH = 6
+
+# Count-Min Sketch 每个键的哈希种子（每行一个）
+_SKETCH_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+_UINT64_MASK = 0xFFFFFFFFFFFFFFFF
+_MAX_COUNTER = 15
+
+
+def estimate_size(obj: Any, _depth: int = 0, _seen: Optional[set] = None) -> int:
+    """
+    估算对象占用的内存字节数（递归计入容器元素和对象属性，同一对象只计一次）
+
+    Args:
+        obj: 任意对象
+
+    Returns:
+        int: 字节数
+    """
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return sys.getsizeof(obj)
+
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if _depth >= _MAX_SIZE_DEPTH:
+        return size
+
+    _depth += 1
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += estimate_size(key, _depth, _seen) + estimate_size(value, _depth, _seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += estimate_size(item, _depth, _seen)
+    else:
+        attributes = getattr(obj, '__dict__', None)
+        if attributes is not None:
+            size += estimate_size(attributes, _depth, _seen)
+        for name in getattr(type(obj), '__slots__', ()):
+            value = getattr(obj, name, _MISSING)
+            if value is not _MISSING:
+                size += estimate_size(value, _depth, _seen)
+    return size
+
+
+class FrequencySketch:
+    """访问频率估计（4行Count-Min Sketch，计数上限15，累计增量达到采样数后整体减半以淡化历史）"""
+
+    def __init__(self, capacity: int):
+        width = 16
+        while width < capacity:
+            width <<= 1
+        self._width = width
+        self._mask = width - 1
+        self._table = [0] * (width * len(_SKETCH_SEEDS))
+        self._sample_size = 10 * max(capacity, 16)
+        self._additions = 0
+
+    def _indexes(self, key: Hashable) -> List[int]:
+        h = hash(key)
+        return [
+            row * self._width + ((((h ^ seed) * 0x9E3779B97F4A7C15) & _UINT64_MASK) >> 32 & self._mask)
+            for row, seed in enumerate(_SKETCH_SEEDS)
+        ]
+
+    def increment(self, key: Hashable):
+        table = self._table
+        added = False
+        for index in self._indexes(key):
+            if table[index] < _MAX_COUNTER:
+                table[index] += 1
+                added = True
+        if added:
+            self._additions += 1
+            if self._additions >= self._sample_size:
+                self._table = [count >> 1 for count in table]
+                self._additions //= 2
+
+    def frequency(self, key: Hashable) -> int:
+        table = self._table
+        return min(table[index] for index in self._indexes(key))
+
+
+class _Entry:
+    """缓存条目"""
+
+    __slots__ = ('value', 'size', 'expires_at', 'segment')
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float], segment: int):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.segment = segment
+
+
+class BoundedCache:
+    """按条目数和字节数限制容量的W-TinyLFU缓存，条目可带过期时间"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, sizer: Callable[[Any], int] = estimate_size,
+                 window_ratio: float = 0.01, protected_ratio: float = 0.8):
+        """
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 最大字节数（按sizer估算键和值），None表示不限制（也不统计字节数）
+            ttl: 默认过期时间（秒），None表示不过期
+            sizer: 估算值大小的函数
+            window_ratio: LRU窗口占总条目数的比例
+            protected_ratio: 保护段占主区的比例
+        """
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        self.ttl = ttl
+        self._sizer = sizer
+
+        self._window_capacity = max(1, int(self.max_entries * window_ratio))
+        main_capacity = self.max_entries - self._window_capacity
+        self._protected_capacity = int(main_capacity * protected_ratio)
+
+        self._entries: Dict[Hashable, _Entry] = {}
+        # 各段按访问顺序排列（末尾为最近使用）
+        self._segments: Tuple["OrderedDict[Hashable, None]", ...] = (OrderedDict(), OrderedDict(), OrderedDict())
+        self._sketch = FrequencySketch(self.max_entries)
+        # (过期时间, 键)，条目更新或删除后旧记录在出堆时跳过
+        self._expiry_heap: List[Tuple[float, int, Hashable]] = []
+        self._expiry_sequence = 0
+        self._bytes = 0
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'deletes': 0,
+            'evictions': 0,
+            'evictions_by_bytes': 0,
+            'admission_rejections': 0,
+            'oversize_rejections': 0,
+            'expirations': 0
+        }
+
+    # === 读取 ===
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取缓存值，不存在或已过期时返回默认值"""
+        self._sketch.increment(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return default
+
+        now = time.monotonic()
+        if entry.expires_at is not None and entry.expires_at <= now:
+            self._remove(key, entry)
+            self.stats['expirations'] += 1
+            self.stats['misses'] += 1
+            return default
+
+        self._on_access(key, entry)
+        self.stats['hits'] += 1
+        self._expire_due(now)
+        return entry.value
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and (entry.expires_at is None or entry.expires_at > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self) -> List[Hashable]:
+        """当前所有键的快照（可能包含已过期但尚未清理的键）"""
+        return list(self._entries)
+
+    # === 写入 ===
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """
+        写入缓存值
+
+        Args:
+            key: 键
+            value: 值
+            ttl: 过期时间（秒），None时使用默认过期时间
+
+        Returns:
+            bool: 是否写入（超过字节上限的单个值不写入）
+        """
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        expires_at = now + ttl if ttl is not None else None
+        # 未设置字节上限时不估算大小（估算需要遍历整个值）
+        size = self._sizer(key) + self._sizer(value) if self.max_bytes is not None else 0
+        self.stats['sets'] += 1
+
+        entry = self._entries.get(key)
+        if self.max_bytes is not None and size > self.max_bytes:
+            if entry is not None:
+                self._remove(key, entry)
+            self.stats['oversize_rejections'] += 1
+            return False
+
+        if entry is not None:
+            self._bytes += size - entry.size
+            entry.value = value
+            entry.size = size
+            entry.expires_at = expires_at
+            self._on_access(key, entry)
+        else:
+            self._sketch.increment(key)
+            entry = _Entry(value, size, expires_at, _WINDOW)
+            self._entries[key] = entry
+            self._segments[_WINDOW][key] = None
+            self._bytes += size
+            if len(self._segments[_WINDOW]) > self._window_capacity:
+                self._evict_from_window()
+
+        if expires_at is not None:
+            self._expiry_sequence += 1
+            heapq.heappush(self._expiry_heap, (expires_at, self._expiry_sequence, key))
+        self._expire_due(now)
+        self._enforce_bytes(key)
+        return key in self._entries
+
+    def delete(self, key: Hashable) -> bool:
+        """删除缓存值"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        self._remove(key, entry)
+        self.stats['deletes'] += 1
+        return True
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        for segment in self._segments:
+            segment.clear()
+        self._expiry_heap.clear()
+        self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """清理所有已到期的条目，返回清理数量"""
+        return self._expire_due(time.monotonic())
+
+    # === 内部实现 ===
+
+    def _on_access(self, key: Hashable, entry: _Entry):
+        """命中后调整段内顺序：窗口、保护段移到末尾，试用段晋升到保护段"""
+        segments = self._segments
+        if entry.segment == _PROBATION:
+            self._move(key, entry, _PROTECTED)
+            # 保护段超出容量时把最久未用的条目降回试用段
+            while len(segments[_PROTECTED]) > self._protected_capacity:
+                demoted = next(iter(segments[_PROTECTED]))
+                self._move(demoted, self._entries[demoted], _PROBATION)
+        else:
+            segments[entry.segment].move_to_end(key)
+
+    def _evict_from_window(self):
+        """窗口已满：最久未用的窗口条目进入主区，主区已满时与主区的淘汰候选按频率决定去留"""
+        segments = self._segments
+        candidate = next(iter(segments[_WINDOW]))
+        candidate_entry = self._entries[candidate]
+
+        main_size = len(segments[_PROBATION]) + len(segments[_PROTECTED])
+        if main_size < self.max_entries - self._window_capacity:
+            self._move(candidate, candidate_entry, _PROBATION)
+            return
+
+        victim_segment = segments[_PROBATION] if segments[_PROBATION] else segments[_PROTECTED]
+        if not victim_segment:
+            # 主区容量为0（条目上限过小），窗口条目直接淘汰
+            self._remove(candidate, candidate_entry)
+            self.stats['evictions'] += 1
+            return
+
+        victim = next(iter(victim_segment))
+        if self._sketch.frequency(candidate) > self._sketch.frequency(victim):
+            self._remove(victim, self._entries[victim])
+            self._move(candidate, candidate_entry, _PROBATION)
+        else:
+            self._remove(candidate, candidate_entry)
+            self.stats['admission_rejections'] += 1
+        self.stats['evictions'] += 1
+
+    def _enforce_bytes(self, protected_key: Hashable):
+        """超过字节上限时依次从试用段、窗口、保护段的最久未用端淘汰（刚写入的键最后考虑）"""
+        if self.max_bytes is None:
+            return
+        segments = self._segments
+        while self._bytes > self.max_bytes:
+            victim = None
+            for segment_id in (_PROBATION, _WINDOW, _PROTECTED):
+                for key in segments[segment_id]:
+                    if key != protected_key:
+                        victim = key
+                        break
+                if victim is not None:
+                    break
+            if victim is None:
+                victim = protected_key
+            self._remove(victim, self._entries[victim])
+            self.stats['evictions_by_bytes'] += 1
+
+    def _expire_due(self, now: float) -> int:
+        """清理堆顶已到期的条目"""
+        heap = self._expiry_heap
+        expired = 0
+        while heap and heap[0][0] <= now:
+            expires_at, _, key = heapq.heappop(heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at == expires_at:
+                self._remove(key, entry)
+                expired += 1
+        self.stats['expirations'] += expired
+        # 条目被频繁更新时堆中会积累失效记录，超过条目数的数倍时重建
+        if len(heap) > 4 * max(len(self._entries), 16):
+            self._rebuild_expiry_heap()
+        return expired
+
+    def _rebuild_expiry_heap(self):
+        heap = [
+            (entry.expires_at, index, key)
+            for index, (key, entry) in enumerate(self._entries.items())
+            if entry.expires_at is not None
+        ]
+        heapq.heapify(heap)
+        self._expiry_heap = heap
+        self._expiry_sequence = len(heap)
+
+    def _move(self, key: Hashable, entry: _Entry, segment: int):
+        del self._segments[entry.segment][key]
+        entry.segment = segment
+        self._segments[segment][key] = None
+
+    def _remove(self, key: Hashable, entry: _Entry):
+        del self._entries[key]
+        del self._segments[entry.segment][key]
+        self._bytes -= entry.size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        stats = dict(self.stats)
+        total = stats['hits'] + stats['misses']
+        stats.update({
+            'size': len(self._entries),
+            'max_size': self.max_entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hit_rate': round(stats['hits'] / total, 4) if total else 0.0,
+            'window': len(self._segments[_WINDOW]),
+            'probation': len(self._segments[_PROBATION]),
+            'protected': len(self._segments[_PROTECTED])
+        })
+        return stats
@@ -0,0 +1,265 @@
+"""
+上游自适应并发限制器
+按上游服务（LLM、Duckling、RAGFLOW）分别维护并发上限，采用AIMD根据观测延迟调整：
+延迟接近基线时每个往返加性增长，延迟超过基线容忍倍数、超时或服务端过载时乘性下降。
+LLM调用的延迟主要取决于输出长度而非负载（短意图提示与长槽位/融合生成共用一个限制器），
+默认只以超时和429/5xx作为LLM的过载信号。
+超过并发上限的请求进入有界等待队列，队列已满或等待超时立即拒绝，由调用方走回退逻辑。
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+from src.config.settings import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """上游并发已满，请求被快速拒绝"""
+
+    def __init__(self, upstream: str, reason: str):
+        self.upstream = upstream
+        self.reason = reason
+        super().__init__(f"上游并发已满({upstream}): {reason}")
+
+
+class _Permit:
+    """一次获准的上游调用，调用方可标记过载信号"""
+
+    __slots__ = ('started_at', 'dropped')
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.dropped = False
+
+    def mark_dropped(self):
+        """标记本次调用出现过载信号（超时、429/5xx、连接失败等）"""
+        self.dropped = True
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD自适应并发限制器"""
+
+    def __init__(self, name: str, initial_limit: int = 20, min_limit: int = 2, max_limit: int = 100,
+                 max_queue: int = 50, queue_timeout: float = 2.0,
+                 latency_tolerance: float = 2.0, backoff_ratio: float = 0.9,
+                 baseline_window: int = 200, latency_signal: bool = True):
+        """
+        Args:
+            name: 上游名称
+            initial_limit: 初始并发上限
+            min_limit: 并发上限下界
+            max_limit: 并发上限上界
+            max_queue: 等待队列长度上限，超出立即拒绝
+            queue_timeout: 排队等待超时（秒），超时拒绝
+            latency_tolerance: 延迟超过基线的倍数视为过载
+            backoff_ratio: 乘性下降系数
+            baseline_window: 基线延迟的统计窗口（样本数），窗口结束时以窗口内最小延迟更新基线
+            latency_signal: 是否把延迟超过基线视为过载，为False时只有超时和标记的过载信号触发下降
+        """
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.baseline_window = max(1, baseline_window)
+        self.latency_signal = latency_signal
+
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._baseline: Optional[float] = None
+        self._window_min: Optional[float] = None
+        self._window_samples = 0
+        self._last_decrease = 0.0
+        self._last_latency: Optional[float] = None
+
+        self.stats = {
+            'accepted': 0,
+            'queued': 0,
+            'rejected_queue_full': 0,
+            'rejected_timeout': 0,
+            'dropped': 0,
+            'increases': 0,
+            'decreases': 0
+        }
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        获取一个并发许可
+
+        Yields:
+            _Permit: 许可对象，调用方可通过 mark_dropped() 上报过载信号
+
+        Raises:
+            ConcurrencyLimitExceeded: 队列已满或排队超时
+        """
+        await self._acquire_slot()
+        permit = _Permit()
+        # 取消、提前关闭的生成器（GeneratorExit）等情况不产生延迟样本，但名额必须归还
+        sample: Optional[_Permit] = None
+        dropped = False
+        try:
+            yield permit
+        except asyncio.TimeoutError:
+            sample, dropped = permit, True
+            raise
+        except Exception:
+            sample, dropped = permit, permit.dropped
+            raise
+        else:
+            sample, dropped = permit, permit.dropped
+        finally:
+            self._release(sample, dropped)
+
+    async def _acquire_slot(self):
+        if self._in_flight < int(self.limit) and not self._waiters:
+            self._in_flight += 1
+            self.stats['accepted'] += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.stats['rejected_queue_full'] += 1
+            raise ConcurrencyLimitExceeded(self.name, f"等待队列已满({self.max_queue})")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats['queued'] += 1
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.done() and not waiter.cancelled()):
+                self.stats['rejected_timeout'] += 1
+                raise ConcurrencyLimitExceeded(self.name, f"排队超过{self.queue_timeout}秒")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已被分配名额但调用方取消，归还名额
+                self._in_flight -= 1
+                self._wake_waiters()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+        self.stats['accepted'] += 1
+
+    def _release(self, permit: Optional[_Permit], dropped: bool):
+        self._in_flight -= 1
+        if permit is not None:
+            self._on_sample(time.perf_counter() - permit.started_at, dropped)
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        """按当前上限把名额分配给排队中的请求（名额在唤醒时即已占用）"""
+        while self._waiters and self._in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def _on_sample(self, latency: float, dropped: bool):
+        """根据一次调用的延迟和结果调整并发上限"""
+        self._last_latency = latency
+
+        if not dropped:
+            self._window_min = latency if self._window_min is None else min(self._window_min, latency)
+            self._window_samples += 1
+            if self._baseline is None:
+                self._baseline = latency
+            elif self._window_samples >= self.baseline_window:
+                # 每个窗口结束时以窗口内最小延迟重置基线，使上游整体变慢后基线能随之上移
+                self._baseline = self._window_min
+                self._window_min = None
+                self._window_samples = 0
+            else:
+                self._baseline = min(self._baseline, latency)
+
+        overloaded = dropped or (
+            self.latency_signal and self._baseline is not None and
+            latency > self._baseline * self.latency_tolerance
+        )
+
+        if overloaded:
+            if dropped:
+                self.stats['dropped'] += 1
+            # 每个基线往返内最多下降一次，避免同一批慢请求把上限连续压到底
+            now = time.monotonic()
+            if now - self._last_decrease >= (self._baseline or 0.0):
+                new_limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                if new_limit < self.limit:
+                    self.limit = new_limit
+                    self.stats['decreases'] += 1
+                self._last_decrease = now
+        elif self._in_flight + 1 >= int(self.limit):
+            # 仅在上限被用满时增长：每个往返约增加1
+            new_limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            if int(new_limit) > int(self.limit):
+                self.stats['increases'] += 1
+            self.limit = new_limit
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限制器状态"""
+        stats = dict(self.stats)
+        stats.update({
+            'limit': int(self.limit),
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'in_flight': self._in_flight,
+            'queue_depth': len(self._waiters),
+            'max_queue': self.max_queue,
+            'latency_signal': self.latency_signal,
+            'baseline_latency_ms': round(self._baseline * 1000, 1) if self._baseline is not None else None,
+            'last_latency_ms': round(self._last_latency * 1000, 1) if self._last_latency is not None else None
+        })
+        return stats
+
+
+# 各上游的限制器实例
+_limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+
+
+def get_concurrency_limiter(upstream: str) -> AdaptiveConcurrencyLimiter:
+    """获取指定上游的并发限制器"""
+    limiter = _limiters.get(upstream)
+    if limiter is None:
+        limiter = AdaptiveConcurrencyLimiter(
+            upstream,
+            initial_limit=settings.UPSTREAM_LIMIT_INITIAL,
+            min_limit=settings.UPSTREAM_LIMIT_MIN,
+            max_limit=settings.UPSTREAM_LIMIT_MAX,
+            max_queue=settings.UPSTREAM_QUEUE_MAX,
+            queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT,
+            latency_tolerance=settings.UPSTREAM_LATENCY_TOLERANCE,
+            backoff_ratio=settings.UPSTREAM_LIMIT_BACKOFF,
+            latency_signal=settings.UPSTREAM_LLM_LATENCY_SIGNAL if upstream == 'llm' else True
+        )
+        _limiters[upstream] = limiter
+    return limiter
+
+
+@asynccontextmanager
+async def upstream_permit(upstream: str):
+    """
+    便捷函数：在上游并发限制内执行调用，未启用限制时不做任何约束
+
+    Yields:
+        _Permit: 许可对象
+    """
+    if not settings.UPSTREAM_LIMITER_ENABLED:
+        yield _Permit()
+        return
+
+    async with get_concurrency_limiter(upstream).acquire() as permit:
+        yield permit
+
+
+def get_concurrency_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有上游限制器的状态"""
+    return {name: limiter.get_stats() for name, limiter in _limiters.items()}
@@ -0,0 +1,180 @@
+"""
+异步数据库访问层
+Peewee为同步ORM，直接在async处理函数中调用会阻塞事件循环。
+本模块提供一个有界线程池执行器，每个工作线程持有一条来自 PooledMySQLDatabase 的连接，
+并提供可等待的查询辅助函数及连接池等待指标。
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from src.config.database import database
+from src.config.settings import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+
+class DatabaseExecutor:
+    """有界数据库线程池执行器"""
+
+    def __init__(self, max_workers: Optional[int] = None, db=None, window_size: int = 1000):
+        self.max_workers = max_workers or settings.DB_EXECUTOR_MAX_WORKERS
+        self.database = db or database
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="db-worker"
+        )
+
+        # 指标（仅在事件循环线程与工作线程间做简单计数，使用锁保护）
+        self._lock = threading.Lock()
+        self._wait_times = deque(maxlen=window_size)
+        self._exec_times = deque(maxlen=window_size)
+        self._pending = 0
+        self._running = 0
+        self._total_calls = 0
+        self._failed_calls = 0
+        self._max_wait = 0.0
+        self._closed = False
+
+    def _invoke(self, func: Callable[..., T], submitted_at: float) -> T:
+        """在工作线程中执行数据库调用"""
+        started_at = time.perf_counter()
+        wait_time = started_at - submitted_at
+        with self._lock:
+            self._pending -= 1
+            self._running += 1
+            self._wait_times.append(wait_time)
+            self._max_wait = max(self._max_wait, wait_time)
+
+        try:
+            # Peewee连接状态按线程隔离，每个工作线程复用自己的池化连接
+            self.database.connect(reuse_if_open=True)
+            return func()
+        except Exception:
+            with self._lock:
+                self._failed_calls += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._exec_times.append(time.perf_counter() - started_at)
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        在线程池中执行同步数据库调用
+
+        Args:
+            func: 同步函数（可包含多条查询或事务）
+            *args: 位置参数
+            **kwargs: 关键字参数
+
+        Returns:
+            函数返回值，异常原样抛出
+        """
+        if self._closed:
+            raise RuntimeError("数据库执行器已关闭")
+
+        with self._lock:
+            self._pending += 1
+            self._total_calls += 1
+
+        loop = asyncio.get_running_loop()
+        call = partial(func, *args, **kwargs)
+        return await loop.run_in_executor(
+            self._executor, self._invoke, call, time.perf_counter()
+        )
+
+    async def run_atomic(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """在线程池中以事务方式执行同步数据库调用"""
+        def _atomic_call():
+            with self.database.atomic():
+                return func(*args, **kwargs)
+
+        return await self.run(_atomic_call)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取执行器与连接池等待指标"""
+        with self._lock:
+            wait_times = sorted(self._wait_times)
+            exec_times = sorted(self._exec_times)
+            stats = {
+                'max_workers': self.max_workers,
+                'pending': self._pending,
+                'running': self._running,
+                'total_calls': self._total_calls,
+                'failed_calls': self._failed_calls,
+                'max_wait_ms': round(self._max_wait * 1000, 3)
+            }
+
+        stats['pool_wait_ms'] = _percentiles(wait_times)
+        stats['execution_ms'] = _percentiles(exec_times)
+
+        in_use = getattr(self.database, '_in_use', None)
+        connections = getattr(self.database, '_connections', None)
+        stats['connection_pool'] = {
+            'max_connections': getattr(self.database, '_max_connections', None),
+            'in_use': len(in_use) if in_use is not None else None,
+            'idle': len(connections) if connections is not None else None
+        }
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        self._closed = True
+        self._executor.shutdown(wait=wait)
+        logger.info("数据库执行器已关闭")
+
+
+def _percentiles(samples) -> Dict[str, float]:
+    """计算有序样本的均值与分位数（毫秒）"""
+    if not samples:
+        return {'avg': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+
+    count = len(samples)
+
+    def pick(ratio: float) -> float:
+        return round(samples[min(count - 1, int(count * ratio))] * 1000, 3)
+
+    return {
+        'avg': round(sum(samples) / count * 1000, 3),
+        'p50': pick(0.50),
+        'p95': pick(0.95),
+        'p99': pick(0.99)
+    }
+
+
+# 全局数据库执行器实例
+_db_executor: Optional[DatabaseExecutor] = None
+
+
+def get_db_executor() -> DatabaseExecutor:
+    """获取数据库执行器实例（单例模式）"""
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = DatabaseExecutor()
+    return _db_executor
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """便捷函数：在数据库线程池中执行同步查询"""
+    return await get_db_executor().run(func, *args, **kwargs)
+
+
+async def run_db_atomic(func: Callable[..., T], *args, **kwargs) -> T:
+    """便捷函数：在数据库线程池中以事务方式执行同步查询"""
+    return await get_db_executor().run_atomic(func, *args, **kwargs)
+
+
+def shutdown_db_executor():
+    """关闭全局数据库执行器"""
+    global _db_executor
+    if _db_executor is not None:
+        _db_executor.shutdown()
+        _db_executor = None
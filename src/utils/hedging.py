@@ -0,0 +1,169 @@
+"""
+对冲请求
+主请求在观测到的延迟分位数（默认p95）内未返回时，向同一或备用端点再发一份相同请求，取先成功者。
+对冲次数受预算约束：每个主请求积累 budget_ratio 个令牌，每次对冲消耗1个，
+因此额外负载不超过预算比例。
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from src.config.settings import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar('T')
+
+# 预算令牌上限，避免长时间空闲后突发大量对冲
+MAX_HEDGE_TOKENS = 10.0
+
+
+class HedgePolicy:
+    """单个上游的对冲策略与统计"""
+
+    def __init__(self, name: str, budget_ratio: float = 0.05, percentile: float = 95.0,
+                 min_delay_ms: float = 50.0, min_samples: int = 20, window: int = 500):
+        """
+        Args:
+            name: 上游名称
+            budget_ratio: 对冲预算，占主请求数量的比例
+            percentile: 触发对冲的延迟分位数
+            min_delay_ms: 对冲等待时间下限（毫秒）
+            min_samples: 样本不足时不对冲
+            window: 延迟样本窗口大小
+        """
+        self.name = name
+        self.budget_ratio = budget_ratio
+        self.percentile = percentile
+        self.min_delay = min_delay_ms / 1000
+        self.min_samples = min_samples
+
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._delay: Optional[float] = None
+        self._samples_since_refresh = 0
+        self._tokens = 0.0
+
+        self.stats = {
+            'requests': 0,
+            'hedges_fired': 0,
+            'hedges_won': 0,
+            'budget_exhausted': 0
+        }
+
+    def record_latency(self, latency: float):
+        """记录一次成功调用的延迟"""
+        self._latencies.append(latency)
+        self._samples_since_refresh += 1
+        # 分位数按样本增量刷新，避免每次请求都排序
+        if self._delay is None or self._samples_since_refresh >= 20:
+            self._refresh_delay()
+
+    def _refresh_delay(self):
+        self._samples_since_refresh = 0
+        if len(self._latencies) < self.min_samples:
+            self._delay = None
+            return
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        self._delay = max(self.min_delay, ordered[index])
+
+    def hedge_delay(self) -> Optional[float]:
+        """对冲等待时间（秒），样本不足时返回None"""
+        return self._delay
+
+    def _take_token(self) -> bool:
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        self.stats['budget_exhausted'] += 1
+        return False
+
+    async def run(self, attempt: Callable[[int], Awaitable[T]],
+                  is_success: Callable[[T], bool]) -> T:
+        """
+        执行一次带对冲的调用
+
+        Args:
+            attempt: 发起第n次尝试的函数（0为主请求，1为对冲请求）
+            is_success: 判断结果是否成功
+
+        Returns:
+            先成功的结果；都失败时返回主请求的结果（或抛出主请求的异常）
+        """
+        self.stats['requests'] += 1
+        self._tokens = min(MAX_HEDGE_TOKENS, self._tokens + self.budget_ratio)
+
+        async def timed(index: int) -> T:
+            started_at = time.perf_counter()
+            result = await attempt(index)
+            if is_success(result):
+                self.record_latency(time.perf_counter() - started_at)
+            return result
+
+        primary = asyncio.ensure_future(timed(0))
+        delay = self.hedge_delay()
+        if delay is None:
+            return await primary
+
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._take_token():
+                return await primary
+
+            self.stats['hedges_fired'] += 1
+            logger.debug(f"{self.name} 请求超过 {delay * 1000:.0f}ms 未返回，发起对冲请求")
+            hedge = asyncio.ensure_future(timed(1))
+            tasks.append(hedge)
+
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and is_success(task.result()):
+                        if task is hedge:
+                            self.stats['hedges_won'] += 1
+                        return task.result()
+
+            # 两次尝试都失败，以主请求的结果为准
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取对冲统计"""
+        stats = dict(self.stats)
+        requests = stats['requests']
+        stats['hedge_rate'] = round(stats['hedges_fired'] / requests, 4) if requests else 0.0
+        stats['budget_ratio'] = self.budget_ratio
+        stats['hedge_delay_ms'] = round(self._delay * 1000, 1) if self._delay is not None else None
+        stats['samples'] = len(self._latencies)
+        return stats
+
+
+# 各上游的对冲策略实例
+_hedge_policies: Dict[str, HedgePolicy] = {}
+
+
+def get_hedge_policy(upstream: str) -> HedgePolicy:
+    """获取指定上游的对冲策略"""
+    policy = _hedge_policies.get(upstream)
+    if policy is None:
+        policy = HedgePolicy(
+            upstream,
+            budget_ratio=settings.HEDGE_BUDGET_RATIO,
+            percentile=settings.HEDGE_PERCENTILE,
+            min_delay_ms=settings.HEDGE_MIN_DELAY_MS,
+            min_samples=settings.HEDGE_MIN_SAMPLES
+        )
+        _hedge_policies[upstream] = policy
+    return policy
+
+
+def get_hedging_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有上游的对冲统计"""
+    return {name: policy.get_stats() for name, policy in _hedge_policies.items()}
@@ -0,0 +1,206 @@
+"""
+请求级上下文
+单次对话轮次内，会话、意图、槽位等数据会被多个服务重复读取。
+本模块通过 contextvar 携带一个请求级上下文对象，在该轮次生命周期内记忆这些查询结果，
+各服务通过 request_memo 透明地复用；不在请求范围内调用时直接执行加载函数。
+"""
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MemoKey = Tuple[str, Hashable]
+
+
+class RequestContext:
+    """请求级记忆上下文"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self._memo: Dict[MemoKey, asyncio.Future] = {}
+        self.fetches: Dict[str, int] = {}
+        self.eliminated: Dict[str, int] = {}
+
+    async def get_or_load(self, kind: str, key: Hashable,
+                          loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        获取记忆值，不存在时调用加载函数
+
+        并发的相同查询共享同一个Future，只有首个调用者真正执行加载；
+        加载失败时不记忆，异常原样抛给所有等待者。
+
+        Args:
+            kind: 数据类别（session/intent/active_intents/session_slots等）
+            key: 类别内的键
+            loader: 无参异步加载函数
+
+        Returns:
+            加载结果
+        """
+        memo_key = (kind, key)
+        future = self._memo.get(memo_key)
+        if future is not None:
+            self.eliminated[kind] = self.eliminated.get(kind, 0) + 1
+            _record_eliminated(kind)
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._memo[memo_key] = future
+        self.fetches[kind] = self.fetches.get(kind, 0) + 1
+
+        try:
+            result = await loader()
+        except asyncio.CancelledError:
+            if self._memo.get(memo_key) is future:
+                del self._memo[memo_key]
+            future.cancel()
+            raise
+        except Exception as e:
+            if self._memo.get(memo_key) is future:
+                del self._memo[memo_key]
+            future.set_exception(e)
+            # 标记异常已被读取，避免无等待者时的告警日志
+            future.exception()
+            raise
+
+        future.set_result(result)
+        return result
+
+    def peek(self, kind: str, key: Hashable, default: Any = None) -> Any:
+        """读取已完成的记忆值，不存在、加载中或加载失败时返回默认值"""
+        future = self._memo.get((kind, key))
+        if future is None or not future.done() or future.cancelled() or future.exception():
+            return default
+        return future.result()
+
+    def prime(self, kind: str, key: Hashable, value: Any):
+        """写入已知的值（例如刚从数据库加载或创建的对象）"""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._memo[(kind, key)] = future
+
+    def invalidate(self, kind: str, key: Hashable = None):
+        """
+        失效记忆值
+
+        Args:
+            kind: 数据类别
+            key: 类别内的键，为None时失效该类别全部条目
+        """
+        if key is None:
+            for memo_key in [k for k in self._memo if k[0] == kind]:
+                del self._memo[memo_key]
+        else:
+            self._memo.pop((kind, key), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取本次请求的记忆统计"""
+        return {
+            'request_id': self.request_id,
+            'fetches': dict(self.fetches),
+            'eliminated': dict(self.eliminated),
+            'eliminated_total': sum(self.eliminated.values())
+        }
+
+
+_current_request_context: ContextVar[Optional[RequestContext]] = ContextVar(
+    'request_context', default=None
+)
+
+# 进程级调试计数器：各类别被消除的重复查询次数
+_eliminated_totals: Dict[str, int] = {}
+_request_count = 0
+_stats_lock = threading.Lock()
+
+
+def _record_eliminated(kind: str):
+    with _stats_lock:
+        _eliminated_totals[kind] = _eliminated_totals.get(kind, 0) + 1
+
+
+def get_request_context() -> Optional[RequestContext]:
+    """获取当前请求上下文，不在请求范围内时返回None"""
+    return _current_request_context.get()
+
+
+def begin_request_context(request_id: str) -> Token:
+    """开启请求上下文，返回用于复位的Token"""
+    global _request_count
+    with _stats_lock:
+        _request_count += 1
+    return _current_request_context.set(RequestContext(request_id))
+
+
+def end_request_context(token: Token):
+    """结束请求上下文并输出调试统计"""
+    context = _current_request_context.get()
+    _current_request_context.reset(token)
+
+    if context is not None and context.eliminated:
+        logger.debug(f"请求级记忆统计: {context.get_stats()}")
+
+
+@asynccontextmanager
+async def request_scope(request_id: str):
+    """请求上下文的异步上下文管理器"""
+    token = begin_request_context(request_id)
+    try:
+        yield get_request_context()
+    finally:
+        end_request_context(token)
+
+
+async def request_memo(kind: str, key: Hashable,
+                       loader: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    便捷函数：在当前请求范围内记忆查询结果
+
+    Args:
+        kind: 数据类别
+        key: 类别内的键
+        loader: 无参异步加载函数
+
+    Returns:
+        加载结果
+    """
+    context = _current_request_context.get()
+    if context is None:
+        return await loader()
+    return await context.get_or_load(kind, key, loader)
+
+
+def prime_request_memo(kind: str, key: Hashable, value: Any):
+    """便捷函数：向当前请求上下文写入已知值"""
+    context = _current_request_context.get()
+    if context is not None:
+        context.prime(kind, key, value)
+
+
+def peek_request_memo(kind: str, key: Hashable, default: Any = None) -> Any:
+    """便捷函数：读取当前请求上下文中已有的记忆值，不触发加载"""
+    context = _current_request_context.get()
+    if context is None:
+        return default
+    return context.peek(kind, key, default)
+
+
+def invalidate_request_memo(kind: str, key: Hashable = None):
+    """便捷函数：失效当前请求上下文中的记忆值（数据写入后调用）"""
+    context = _current_request_context.get()
+    if context is not None:
+        context.invalidate(kind, key)
+
+
+def get_request_memo_stats() -> Dict[str, Any]:
+    """获取进程级的重复查询消除统计"""
+    with _stats_lock:
+        return {
+            'requests': _request_count,
+            'eliminated_fetches': dict(_eliminated_totals),
+            'eliminated_total': sum(_eliminated_totals.values())
+        }
@@ -0,0 +1,109 @@
+"""
+缓存服务测试：批量删除和按标签失效时向其他worker发布L1清除
+"""
+import asyncio
+
+from src.core.cache_strategy import get_cache_strategy
+from src.services.cache_service import CacheService
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def smembers(self, key):
+        self.commands.append(('smembers', key))
+
+    def unlink(self, *keys):
+        self.commands.append(('unlink', keys))
+
+    async def execute(self):
+        results = []
+        for command, arg in self.commands:
+            if command == 'smembers':
+                results.append(set(self.redis_client.sets.get(arg, set())))
+            else:
+                results.append(sum(1 for key in arg if self.redis_client.sets.pop(key, None) is not None
+                                   or self.redis_client.values.pop(key, None) is not None))
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class RecordingLocalTier:
+    listening = True
+
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, redis_client, keys=(), patterns=()):
+        self.published.extend(keys)
+
+
+def _build_service():
+    service = CacheService()
+    service.redis_client = FakeRedis()
+    service._initialized = True
+    service.local_tier = RecordingLocalTier()
+    return service
+
+
+def _template_keys(service):
+    strategy = get_cache_strategy()
+    return [
+        strategy.get_cache_key('intent_config', intent_name='book_flight'),
+        strategy.get_cache_key('slot_definitions', intent_name='book_flight'),
+        strategy.get_cache_key('ragflow_config', config_name='default'),
+    ]
+
+
+def test_l1_ttl_matches_full_cache_keys():
+    service = _build_service()
+    strategy = get_cache_strategy()
+    for key in _template_keys(service):
+        full_key = service._generate_key(key)
+        assert strategy.get_l1_ttl_for_cache_key(full_key) == strategy.get_l1_ttl(key)
+        assert strategy.get_l1_ttl_for_cache_key(full_key)
+
+    # 旧版完整键前缀同样适用
+    assert strategy.get_l1_ttl_for_cache_key('intent_system:active_intents')
+    assert strategy.get_l1_ttl_for_cache_key('intent_system:session:basic:s1') is None
+
+
+def test_delete_many_publishes_l1_evictions_for_template_keys():
+    service = _build_service()
+    keys = _template_keys(service)
+    for key in keys:
+        service.redis_client.values[service._generate_key(key)] = b'x'
+
+    deleted = asyncio.run(service.delete_many(keys + ['unrelated:key']))
+
+    assert deleted == len(keys)
+    assert service.local_tier.published == [service._generate_key(key) for key in keys]
+
+
+def test_invalidate_tags_publishes_l1_evictions_for_template_keys():
+    service = _build_service()
+    keys = [service._generate_key(key) for key in _template_keys(service)]
+    service.redis_client.sets[service._tag_key('intent:book_flight')] = set(keys)
+    for key in keys:
+        service.redis_client.values[key] = b'x'
+
+    deleted = asyncio.run(service.invalidate_tags(['intent:book_flight']))
+
+    assert deleted == len(keys)
+    assert sorted(service.local_tier.published) == sorted(keys)
@@ -0,0 +1,140 @@
+"""
+上游自适应并发限制器测试
+"""
+import asyncio
+
+import pytest
+
+from src.utils.concurrency_limiter import AdaptiveConcurrencyLimiter, ConcurrencyLimitExceeded
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_permit_released_when_generator_closed_early():
+    """持有许可的异步生成器被提前关闭（GeneratorExit）时归还名额"""
+    limiter = AdaptiveConcurrencyLimiter('test', initial_limit=2, min_limit=1, max_queue=0)
+
+    async def stream():
+        async with limiter.acquire():
+            for i in range(10):
+                yield i
+
+    async def main():
+        for _ in range(5):
+            gen = stream()
+            assert await gen.__anext__() == 0
+            await gen.aclose()
+        return limiter.get_stats()
+
+    stats = _run(main())
+    assert stats['in_flight'] == 0
+    assert stats['accepted'] == 5
+    assert stats['rejected_queue_full'] == 0
+
+
+def test_permit_released_on_cancel_and_error():
+    limiter = AdaptiveConcurrencyLimiter('test', initial_limit=1, min_limit=1, max_queue=0)
+
+    async def hold():
+        async with limiter.acquire():
+            await asyncio.sleep(10)
+
+    async def fail():
+        async with limiter.acquire():
+            raise ValueError('boom')
+
+    async def main():
+        task = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        with pytest.raises(ValueError):
+            await fail()
+        return limiter.get_stats()
+
+    assert _run(main())['in_flight'] == 0
+
+
+def test_timeout_counts_as_drop():
+    limiter = AdaptiveConcurrencyLimiter('test', initial_limit=4, min_limit=1, max_queue=0)
+
+    async def main():
+        async with limiter.acquire():
+            pass
+        with pytest.raises(asyncio.TimeoutError):
+            async with limiter.acquire():
+                raise asyncio.TimeoutError()
+        return limiter.get_stats()
+
+    stats = _run(main())
+    assert stats['in_flight'] == 0
+    assert stats['dropped'] == 1
+
+
+def test_rejects_when_queue_full():
+    limiter = AdaptiveConcurrencyLimiter('test', initial_limit=1, min_limit=1, max_queue=0)
+
+    async def main():
+        async with limiter.acquire():
+            with pytest.raises(ConcurrencyLimitExceeded):
+                async with limiter.acquire():
+                    pass
+
+    _run(main())
+
+
+async def _mixed_latency_load(limiter, requests=200, interval=0.002, latencies=(0.005, 0.02)):
+    """容量无限的上游：按固定间隔到达，短/长调用交替（延迟差异来自输出长度而非负载）"""
+    rejected = 0
+
+    async def call(latency):
+        nonlocal rejected
+        try:
+            async with limiter.acquire():
+                await asyncio.sleep(latency)
+        except ConcurrencyLimitExceeded:
+            rejected += 1
+
+    tasks = []
+    for i in range(requests):
+        tasks.append(asyncio.create_task(call(latencies[i % len(latencies)])))
+        await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+    return rejected
+
+
+def test_mixed_latency_without_overload_keeps_limit():
+    limiter = AdaptiveConcurrencyLimiter('llm', initial_limit=16, min_limit=2, max_queue=0,
+                                         latency_signal=False)
+
+    rejected = _run(_mixed_latency_load(limiter))
+    stats = limiter.get_stats()
+    assert rejected == 0
+    assert stats['decreases'] == 0
+    assert stats['limit'] >= 16
+
+
+def test_drop_signal_still_backs_off_without_latency_signal():
+    limiter = AdaptiveConcurrencyLimiter('llm', initial_limit=16, min_limit=2, max_queue=0,
+                                         latency_signal=False)
+
+    async def main():
+        async with limiter.acquire() as permit:
+            permit.mark_dropped()
+
+    _run(main())
+    assert limiter.get_stats()['decreases'] == 1
+    assert limiter.get_stats()['limit'] < 16
+
+
+def test_llm_limiter_ignores_latency_by_default():
+    from src.utils import concurrency_limiter
+
+    try:
+        assert not concurrency_limiter.get_concurrency_limiter('llm').latency_signal
+        assert concurrency_limiter.get_concurrency_limiter('duckling').latency_signal
+    finally:
+        concurrency_limiter._limiters.clear()
@@ -0,0 +1,137 @@
+"""
+融合NLU模式测试：一轮意图识别 + 槽位提取只调用一次LLM
+"""
+import asyncio
+import json
+
+from src.config.settings import settings
+from src.core.nlu_engine import NLUEngine
+from src.models.intent import Intent
+from src.utils.request_context import request_scope
+
+SLOT_DEFINITIONS = [
+    {'slot_name': 'departure_city', 'slot_type': 'TEXT', 'is_required': True, 'description': '出发城市'},
+    {'slot_name': 'arrival_city', 'slot_type': 'TEXT', 'is_required': True, 'description': '到达城市'},
+]
+
+
+class CountingLLM:
+    """按提示词类型返回固定结果并记录调用次数"""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def _acall(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        slots = {
+            'departure_city': {'value': '北京', 'confidence': 0.9, 'source': 'text', 'original_text': '北京'},
+            'arrival_city': {'value': '上海', 'confidence': 0.9, 'source': 'text', 'original_text': '上海'},
+        }
+        if '"slots"' in prompt and '"entities"' in prompt:
+            return json.dumps({'intent': 'book_flight', 'confidence': 0.93, 'reasoning': 'fused',
+                               'alternatives': [], 'entities': [], 'slots': slots}, ensure_ascii=False)
+        if '提取相关实体信息' in prompt:
+            return '[]'
+        if '提取指定的槽位信息' in prompt:
+            return json.dumps(slots, ensure_ascii=False)
+        return json.dumps({'intent': 'book_flight', 'confidence': 0.93, 'reasoning': 'split',
+                           'alternatives': []}, ensure_ascii=False)
+
+    async def cleanup(self):
+        pass
+
+
+def _build_engine():
+    engine = NLUEngine()
+    intent = Intent(intent_name='book_flight', display_name='预订机票', description='预订机票',
+                    examples=['帮我订机票', '订从北京到广州的航班'], is_active=True)
+    engine._intent_cache['book_flight'] = intent
+    engine._slot_definitions_cache['book_flight'] = SLOT_DEFINITIONS
+    engine._keywords_cache = {}
+    engine.duckling_url = None
+    engine.llm = CountingLLM()
+    engine._initialized = True
+    return engine
+
+
+def _run_turn(engine, fused):
+    async def turn():
+        async with request_scope('test_fused'):
+            result = await engine.recognize_intent('帮我订明天从北京到上海的机票')
+            slots = await engine.extract_slots('帮我订明天从北京到上海的机票',
+                                               engine._slot_definitions_cache[result.intent_name])
+            return result, slots
+
+    original_mode = settings.NLU_FUSED_MODE
+    settings.NLU_FUSED_MODE = fused
+    try:
+        return asyncio.run(turn())
+    finally:
+        settings.NLU_FUSED_MODE = original_mode
+
+
+def test_fused_mode_makes_one_llm_call_per_turn():
+    engine = _build_engine()
+    result, slots = _run_turn(engine, fused=True)
+
+    assert result.intent_name == 'book_flight'
+    assert len(engine.llm.prompts) == 1
+    assert slots['departure_city']['value'] == '北京'
+    assert slots['arrival_city']['value'] == '上海'
+
+
+def test_fused_slots_not_reused_outside_candidate_intent():
+    engine = _build_engine()
+    _run_turn(engine, fused=True)
+
+    async def other_slots():
+        async with request_scope('test_fused_other'):
+            return await engine.extract_slots('帮我订明天从北京到上海的机票', SLOT_DEFINITIONS)
+
+    # 新的请求范围内没有融合结果，走独立的槽位提取调用
+    engine.llm.prompts.clear()
+    asyncio.run(other_slots())
+    assert len(engine.llm.prompts) >= 1
+
+
+def test_base_entities_extracted_alongside_llm_call():
+    engine = _build_engine()
+    city = {'entity': 'CITY', 'value': '上海', 'text': '上海', 'start': 8, 'end': 10,
+            'confidence': 0.9, 'source': 'rule'}
+    observed = []
+    llm_started = asyncio.Event()
+    llm_call = engine.llm._acall
+
+    async def tracking_acall(prompt, **kwargs):
+        llm_started.set()
+        await asyncio.sleep(0.01)
+        return await llm_call(prompt, **kwargs)
+
+    async def base_extraction(text, entity_types=None, use_duckling=True, use_llm=True, deadline=None):
+        # 串行执行时LLM调用尚未开始，这里会等待超时
+        try:
+            await asyncio.wait_for(llm_started.wait(), timeout=1.0)
+            observed.append(True)
+        except asyncio.TimeoutError:
+            observed.append(False)
+        return {'entities': [dict(city)], 'metadata': {}}
+
+    engine.llm._acall = tracking_acall
+    engine.extract_entities_with_metadata = base_extraction
+
+    async def turn():
+        async with request_scope('test_fused_entities'):
+            await engine.recognize_intent('帮我订明天从北京到上海的机票')
+            return await engine.extract_entities('帮我订明天从北京到上海的机票')
+
+    original_mode = settings.NLU_FUSED_MODE
+    settings.NLU_FUSED_MODE = True
+    try:
+        entities = asyncio.run(turn())
+    finally:
+        settings.NLU_FUSED_MODE = original_mode
+
+    # 同一轮次的实体提取复用融合结果，不再重复提取或调用LLM
+    assert observed == [True]
+    assert len(engine.llm.prompts) == 1
+    assert [entity['value'] for entity in entities] == ['上海']
@@ -0,0 +1,160 @@
+"""
+编译型规则意图匹配器测试：与原逐意图、逐示例扫描的打分实现逐项比对
+"""
+import random
+from datetime import datetime
+
+from src.core.intent_matcher import CompiledIntentMatcher, build_intent_version_key
+
+
+class FakeIntent:
+    def __init__(self, intent_name, description, examples, updated_at=None):
+        self.intent_name = intent_name
+        self.description = description
+        self.examples = list(examples)
+        self.updated_at = updated_at
+
+    def get_examples(self):
+        return self.examples
+
+
+KEYWORDS = {
+    '机票': ['book_flight'],
+    '航班': ['book_flight', 'check_flight'],
+    '火车票': ['book_train'],
+    '余额': ['check_balance'],
+    '订': ['book_flight', 'book_train'],
+    '查': ['check_balance', 'check_flight'],
+    'flight': ['book_flight'],
+}
+
+INTENTS = [
+    FakeIntent('book_flight', 'book a flight ticket 订 机票',
+               ['我想订一张机票', '订 机票 去 北京', '帮我买 明天 的 航班', 'book flight to shanghai']),
+    FakeIntent('book_train', 'book train tickets',
+               ['订火车票', '买 一张 火车票 去 上海', '高铁 票 预订']),
+    FakeIntent('check_balance', '查询 账户 余额 balance',
+               ['查余额', '我的 余额 是 多少', '银行卡 还有 多少 钱', 'check my balance']),
+    FakeIntent('check_flight', 'check flight status',
+               ['查 航班 状态', 'CA1234 航班 延误 了 吗', 'flight status']),
+    FakeIntent('greeting', None, ['你好', 'hello there', '早上好']),
+]
+
+
+def baseline_scores(user_input, intents, keywords_mapping):
+    """原 _rule_based_intent_recognition 的打分循环"""
+    user_input_lower = user_input.lower()
+    scores = {}
+    for intent_name, intent in intents.items():
+        score = 0.0
+        if intent_name.lower() in user_input_lower:
+            score += 0.8
+        if intent.description:
+            for word in intent.description.lower().split():
+                if len(word) > 2 and word in user_input_lower:
+                    score += 0.2
+        for example_text in intent.get_examples()[:10]:
+            example_lower = example_text.lower()
+            if user_input_lower == example_lower:
+                score += 1.0
+            elif user_input_lower in example_lower or example_lower in user_input_lower:
+                if user_input_lower in example_lower:
+                    score += 0.3
+                else:
+                    score += 0.6
+            else:
+                example_words = example_lower.split()
+                user_words = user_input_lower.split()
+                core_nouns = {}
+                action_verbs = []
+                for keyword, targets in (keywords_mapping or {}).items():
+                    core_nouns[keyword] = targets
+                    if keyword in ['订', '预订', '购买', '买', '查询', '查', '看']:
+                        if keyword not in action_verbs:
+                            action_verbs.append(keyword)
+                common_words = ['我', '想', '要', '帮', '的', '了', '吗', '呢', '吧', '一张', '一个']
+                for core_noun, target_intents in core_nouns.items():
+                    if core_noun in user_input_lower:
+                        if intent_name in target_intents:
+                            score += 2.0
+                        else:
+                            score -= 1.0
+                for word in example_words:
+                    if len(word) > 1 and word in user_words and word not in common_words:
+                        if word in core_nouns:
+                            if intent_name in core_nouns[word]:
+                                score += 0.8
+                            else:
+                                score -= 0.3
+                        elif word in action_verbs:
+                            score += 0.2
+                        else:
+                            score += 0.1
+        scores[intent_name] = score
+    return scores
+
+
+def baseline_best_match(user_input, intents, keywords_mapping):
+    best_match = None
+    best_score = 0.0
+    scores = baseline_scores(user_input, intents, keywords_mapping)
+    for name, score in scores.items():
+        if score > best_score:
+            best_score = score
+            best_match = name
+    return best_match, best_score
+
+
+FIXED_INPUTS = [
+    '我想订一张机票', '订 机票 去 北京', '查余额', '余额', '查 航班 状态', '你好', 'Hello there friend',
+    'book_flight please', '帮我 订 火车票 和 机票', 'flight', '', '   ', '我的 余额 是 多少 呢',
+    'check my balance now', '高铁', 'CA1234 航班 延误 了 吗 ?', '订', '早上好 查 余额',
+]
+
+
+def _intent_dict(intents):
+    return {intent.intent_name: intent for intent in intents}
+
+
+def test_scores_match_baseline_on_fixture_catalogue():
+    intents = _intent_dict(INTENTS)
+    for keywords in (KEYWORDS, None):
+        matcher = CompiledIntentMatcher(intents, keywords)
+        for user_input in FIXED_INPUTS:
+            assert matcher.score(user_input) == baseline_scores(user_input, intents, keywords), user_input
+            best_match, best_score, _ = matcher.best_match(user_input)
+            assert (best_match, best_score) == baseline_best_match(user_input, intents, keywords), user_input
+
+
+def test_scores_match_baseline_on_random_inputs():
+    rng = random.Random(20261016)
+    vocabulary = ['订', '机票', '航班', '火车票', '余额', '查', '北京', '上海', '我', '想', '的', 'flight',
+                  'book', 'status', '你好', '一张', '多少', 'check', 'balance', '票', 'CA1234']
+    examples = [example for intent in INTENTS for example in intent.examples]
+
+    for _ in range(300):
+        subset = rng.sample(INTENTS, rng.randint(1, len(INTENTS)))
+        intents = _intent_dict(subset)
+        keywords = dict(rng.sample(sorted(KEYWORDS.items()), rng.randint(0, len(KEYWORDS))))
+        matcher = CompiledIntentMatcher(intents, keywords)
+        for _ in range(20):
+            if rng.random() < 0.2:
+                example = rng.choice(examples)
+                start = rng.randint(0, len(example))
+                user_input = example[start:rng.randint(start, len(example))]
+            else:
+                user_input = rng.choice([' ', '']).join(rng.choice(vocabulary) for _ in range(rng.randint(1, 6)))
+            assert matcher.score(user_input) == baseline_scores(user_input, intents, keywords), user_input
+
+
+def test_version_key_uses_updated_at():
+    updated_at = datetime(2026, 1, 1)
+    first = {'a': FakeIntent('a', 'desc', ['x'], updated_at)}
+    same = {'a': FakeIntent('a', 'desc', ['x'], updated_at)}
+    edited = {'a': FakeIntent('a', 'desc', ['x', 'y'], datetime(2026, 1, 2))}
+    assert build_intent_version_key(first) == build_intent_version_key(same)
+    assert build_intent_version_key(first) != build_intent_version_key(edited)
+
+    # 没有更新时间的对象按内容计算
+    plain = {'a': FakeIntent('a', 'desc', ['x'])}
+    assert build_intent_version_key(plain) != build_intent_version_key({'a': FakeIntent('a', 'desc', ['y'])})
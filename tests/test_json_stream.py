@@ -0,0 +1,70 @@
+"""
+增量JSON字段扫描器测试
+"""
+import json
+
+from src.core.json_stream import IncrementalJSONFieldScanner
+
+
+def _scan(chunks):
+    scanner = IncrementalJSONFieldScanner()
+    for chunk in chunks:
+        scanner.feed(chunk)
+    return scanner.fields
+
+
+def _all_splits(text):
+    """在每个位置把文本切成两块，外加逐字符输入"""
+    yield [text]
+    yield list(text)
+    for position in range(1, len(text)):
+        yield [text[:position], text[position:]]
+
+
+def test_fields_split_across_chunk_boundaries():
+    text = '{"intent": "book_flight", "confidence": 0.93, "ambiguous": false, "note": null, "reasoning": "订票"}'
+    expected = json.loads(text)
+    for chunks in _all_splits(text):
+        assert _scan(chunks) == expected, chunks
+
+
+def test_scalar_not_reported_until_complete():
+    scanner = IncrementalJSONFieldScanner()
+    scanner.feed('{"intent": "book_fl')
+    assert 'intent' not in scanner.fields
+    scanner.feed('ight", "confidence": 0')
+    assert scanner.fields == {'intent': 'book_flight'}
+    # 0 之后仍可能是 0.95，直到出现分隔符才确定
+    scanner.feed('.95')
+    assert 'confidence' not in scanner.fields
+    scanner.feed(',')
+    assert scanner.fields == {'intent': 'book_flight', 'confidence': 0.95}
+
+
+def test_escaped_quotes_in_values():
+    text = r'{"reasoning": "用户说 \"订票\" \\ 然后\n换行", "intent": "book_flight", "confidence": 0.9}'
+    expected = json.loads(text)
+    for chunks in _all_splits(text):
+        assert _scan(chunks) == expected, chunks
+
+
+def test_nested_values_before_intent_are_skipped():
+    text = ('{"alternatives": [{"intent": "book_train", "confidence": 0.99}, "x]y"], '
+            '"meta": {"intent": "wrong", "nested": {"confidence": 1.0}}, '
+            '"intent": "book_flight", "confidence": 0.8}')
+    for chunks in _all_splits(text):
+        assert _scan(chunks) == {'intent': 'book_flight', 'confidence': 0.8}, chunks
+
+
+def test_confidence_before_intent():
+    scanner = IncrementalJSONFieldScanner()
+    scanner.feed('{"confidence": 0.97, ')
+    assert scanner.fields == {'confidence': 0.97}
+    scanner.feed('"intent": "check_balance"')
+    assert scanner.fields == {'confidence': 0.97, 'intent': 'check_balance'}
+
+
+def test_leading_json_fence_is_ignored():
+    text = '```json\n{"intent": "book_flight", "confidence": 0.9, "alternatives": []}\n```'
+    for chunks in _all_splits(text):
+        assert _scan(chunks) == {'intent': 'book_flight', 'confidence': 0.9}, chunks